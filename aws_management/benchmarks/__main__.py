@@ -0,0 +1,5 @@
+import sys
+
+from aws_management.benchmarks.suite import main
+
+sys.exit(main())
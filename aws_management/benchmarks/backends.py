@@ -0,0 +1,209 @@
+import base64
+import io
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import boto3
+from botocore.awsrequest import AWSResponse
+from moto import mock_aws
+
+from aws_management.src.utils import config
+from aws_management.src.utils.config import ClientRegistry
+from aws_management.src.utils.metrics import Instrumentation
+
+BENCH_REGION = 'us-east-1'
+
+MODEL_SUMMARIES = [
+    {
+        'modelArn': f'arn:aws:bedrock:{BENCH_REGION}::foundation-model/anthropic.claude-v2',
+        'modelId': 'anthropic.claude-v2',
+        'providerName': 'Anthropic',
+        'inputModalities': ['TEXT'],
+        'outputModalities': ['TEXT'],
+        'responseStreamingSupported': True,
+    },
+]
+
+
+@dataclass
+class LatencyProfile:
+    """
+    Simulated service behaviour: per-call latency and a throttling rate.
+
+    Args:
+        base (float): Minimum seconds per call.
+        jitter (float): Extra seconds drawn uniformly per call.
+        throttle_rate (float): Fraction of calls rejected with ThrottlingException.
+        seed (int): Seed for the latency and throttle draws, so runs are repeatable.
+    """
+
+    base: float = 0.02
+    jitter: float = 0.01
+    throttle_rate: float = 0.0
+    seed: int = 0
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)  # noqa: S311
+        self._lock = threading.Lock()
+
+    def draw(self) -> tuple:
+        """Returns (delay in seconds, whether to throttle) for one call."""
+        with self._lock:
+            delay = self.base + self._random.uniform(0, self.jitter)
+            throttle = self._random.random() < self.throttle_rate
+        return delay, throttle
+
+
+def _response(status: int, parsed: dict) -> tuple:
+    return AWSResponse(f'https://bench.invalid/{status}', status, {}, None), parsed
+
+
+def _throttled() -> tuple:
+    return _response(429, {
+        'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'},
+        'ResponseMetadata': {'HTTPStatusCode': 429, 'HTTPHeaders': {}},
+    })
+
+
+class StubBackend:
+    """
+    Answers a real boto3 client's calls in-process after a simulated delay.
+
+    Responders are registered on the client's ``before-call`` event, the
+    hook Stubber uses, so serialization, parameter validation and the
+    package's instrumentation all run as they would against AWS. Unlike
+    Stubber, responses are produced per call, so the backend serves any
+    number of concurrent calls.
+
+    Args:
+        client: The boto3 client to answer for.
+        profile (LatencyProfile): Delay and throttling applied to every call.
+    """
+
+    def __init__(self, client, profile: LatencyProfile):
+        self.client = client
+        self.profile = profile
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def respond(self, operation: str, handler) -> None:
+        """
+        Serves ``operation`` with ``handler(params)``, which returns the parsed response.
+
+        Args:
+            operation (str): API operation name, e.g. 'InvokeModel'.
+            handler (callable): Builds the response dict from the request parameters.
+        """
+        service_id = self.client.meta.service_model.service_id.hyphenize()
+
+        def before_call(params, **kwargs):
+            with self._lock:
+                self.calls += 1
+            delay, throttle = self.profile.draw()
+            time.sleep(delay)
+            if throttle:
+                return _throttled()
+            parsed = handler(params)
+            parsed.setdefault('ResponseMetadata', {'HTTPStatusCode': 200, 'HTTPHeaders': {}, 'RetryAttempts': 0})
+            return _response(200, parsed)
+
+        self.client.meta.events.register(f'before-call.{service_id}.{operation}', before_call)
+
+
+def _completion(params) -> dict:
+    return {'body': io.BytesIO(json.dumps({'completion': 'x' * 256}).encode()), 'contentType': 'application/json'}
+
+
+# One ~1 MB PNG-like image, base64-encoded once and returned by every image request.
+_IMAGE_B64 = base64.b64encode(b'\x89PNG\r\n\x1a\n' + random.Random(0).randbytes(1024 * 1024)).decode()  # noqa: S311
+
+
+def _invoke(params) -> dict:
+    # before-call sees the serialized request, whose path names the model.
+    if '/model/stability.' in params['url_path'] or '/model/amazon.titan-image' in params['url_path']:
+        return {'body': io.BytesIO(json.dumps({'images': [_IMAGE_B64]}).encode()), 'contentType': 'application/json'}
+    return _completion(params)
+
+
+def _stream(chunks: int, chunk_delay: float):
+    def handler(params):
+        def events():
+            for n in range(chunks):
+                time.sleep(chunk_delay)
+                yield {'chunk': {'bytes': json.dumps({'completion': f'token{n} '}).encode()}}
+            metrics = {'amazon-bedrock-invocationMetrics': {'outputTokenCount': chunks}}
+            yield {'chunk': {'bytes': json.dumps({'completion': '', **metrics}).encode()}}
+        return {'body': events(), 'contentType': 'application/json'}
+    return handler
+
+
+@contextmanager
+def isolated_registry(instrumentation: Instrumentation | None = None):
+    """Swaps in a fresh ClientRegistry for the duration of a benchmark."""
+    previous = config.registry
+    config.registry = ClientRegistry(instrumentation=instrumentation or Instrumentation())
+    try:
+        yield config.registry
+    finally:
+        config.registry = previous
+
+
+@contextmanager
+def bedrock_backend(profile: LatencyProfile, stream_chunks: int = 32, chunk_delay: float = 0.002):
+    """
+    Serves Bedrock control-plane and runtime calls from StubBackends.
+
+    Yields:
+        StubBackend: The runtime backend, whose ``calls`` counts attempts.
+    """
+    from aws_management.src.services import bedrock_ops
+
+    with isolated_registry() as registry:
+        control = boto3.client('bedrock', region_name=BENCH_REGION)
+        StubBackend(control, LatencyProfile(base=0.0, jitter=0.0)).respond(
+            'ListFoundationModels', lambda params: {'modelSummaries': MODEL_SUMMARIES},
+        )
+        runtime = boto3.client('bedrock-runtime', region_name=BENCH_REGION)
+        backend = StubBackend(runtime, profile)
+        backend.respond('InvokeModel', _invoke)
+        backend.respond('InvokeModelWithResponseStream', _stream(stream_chunks, chunk_delay))
+        for client in (control, runtime):
+            registry.instrumentation.attach(client)
+        registry.register('bedrock', control)
+        registry.register('bedrock-runtime', runtime)
+        previous_catalog, previous_limiters = bedrock_ops.model_catalog, bedrock_ops.rate_limiters
+        bedrock_ops.model_catalog = bedrock_ops.ModelCatalog()
+        bedrock_ops.rate_limiters = {}
+        try:
+            yield backend
+        finally:
+            bedrock_ops.model_catalog, bedrock_ops.rate_limiters = previous_catalog, previous_limiters
+
+
+@contextmanager
+def moto_backend(profile: LatencyProfile, services=('s3',)):
+    """
+    Runs moto with ``profile``'s latency added to every request of ``services``.
+
+    Yields:
+        ClientRegistry: The isolated registry whose clients talk to moto.
+    """
+    with mock_aws(), isolated_registry() as registry:
+        for service in services:
+            registry.register(service, _delayed_client(service, profile))
+        yield registry
+
+
+def _delayed_client(service: str, profile: LatencyProfile):
+    client = boto3.client(service, region_name=BENCH_REGION, config=config.DEFAULT_CLIENT_CONFIG)
+    config.registry.instrumentation.attach(client)
+
+    def before_send(**kwargs):
+        time.sleep(profile.draw()[0])
+
+    client.meta.events.register_first(f'before-send.{client.meta.service_model.service_id.hyphenize()}', before_send)
+    return client
@@ -0,0 +1,425 @@
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+from aws_management.benchmarks.backends import (
+    BENCH_REGION,
+    LatencyProfile,
+    StubBackend,
+    bedrock_backend,
+    moto_backend,
+)
+from aws_management.src.utils.logging import configure_logging
+
+MB = 1024 * 1024
+
+# Result fields compared against a baseline, and whether higher is better.
+COMPARED_FIELDS = {'throughput': True, 'p50_ms': False, 'p99_ms': False}
+
+
+def percentile(samples, q: float) -> float:
+    """Returns the nearest-rank ``q``-th percentile (0-100) of ``samples``."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, round(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class BenchResult:
+    """
+    Measurements from one benchmark.
+
+    Attributes:
+        name (str): Benchmark name.
+        ops (int): Operations completed.
+        seconds (float): Wall-clock duration.
+        latencies (list): Per-operation latencies in seconds, if the benchmark has them.
+        extra (dict): Benchmark-specific figures, e.g. MB/s or retries.
+    """
+
+    name: str
+    ops: int
+    seconds: float
+    latencies: list = field(default_factory=list)
+    extra: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        """Returns the JSON-ready summary: throughput, latency percentiles and the extra figures."""
+        result = {
+            'ops': self.ops,
+            'seconds': round(self.seconds, 4),
+            'throughput': round(self.ops / self.seconds, 2) if self.seconds else 0.0,
+        }
+        if self.latencies:
+            result['p50_ms'] = round(percentile(self.latencies, 50) * 1000, 3)
+            result['p99_ms'] = round(percentile(self.latencies, 99) * 1000, 3)
+        result.update(self.extra)
+        return result
+
+
+def _api_latency(registry, service: str, operation: str) -> dict:
+    """p50/p99 of one AWS operation as recorded by the registry's instrumentation."""
+    stats = registry.instrumentation.snapshot().get(service, {}).get(operation, {})
+    prefix = ''.join('_' + c.lower() if c.isupper() else c for c in operation).lstrip('_')
+    return {f'{prefix}_p50_ms': round(stats.get('p50_ms', 0.0), 3), f'{prefix}_p99_ms': round(stats.get('p99_ms', 0.0), 3)}
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_invoke_single(scale: float) -> BenchResult:
+    """Sequential ``invoke_model`` calls: per-call overhead on top of service latency."""
+    from aws_management.src.services.bedrock_ops import invoke_model
+
+    n = max(10, int(50 * scale))
+    with bedrock_backend(LatencyProfile(base=0.02, jitter=0.01)):
+        async def run():
+            await invoke_model('warm up')
+            latencies = []
+            start = time.perf_counter()
+            for i in range(n):
+                call = time.perf_counter()
+                await invoke_model(f'prompt {i}')
+                latencies.append(time.perf_counter() - call)
+            return latencies, time.perf_counter() - start
+        latencies, seconds = asyncio.run(run())
+    return BenchResult('bedrock.invoke_single', n, seconds, latencies)
+
+
+def bench_invoke_batched(scale: float) -> BenchResult:
+    """``invoke_many`` over a throttling backend: throughput and completion latency."""
+    from aws_management.src.services.bedrock_ops import iter_invoke_many
+
+    n = max(50, int(400 * scale))
+    with bedrock_backend(LatencyProfile(base=0.02, jitter=0.02, throttle_rate=0.02, seed=1)) as backend:
+        async def run():
+            latencies = []
+            failed = 0
+            start = time.perf_counter()
+            async for result in iter_invoke_many(
+                [f'prompt {i}' for i in range(n)], requests_per_minute=60_000, max_in_flight=64,
+            ):
+                latencies.append(time.perf_counter() - start)
+                failed += not result.ok
+            return latencies, failed, time.perf_counter() - start
+        latencies, failed, seconds = asyncio.run(run())
+    return BenchResult('bedrock.invoke_batched', n, seconds, latencies,
+                       {'attempts': backend.calls, 'failed': failed})
+
+
+def bench_stream(scale: float) -> BenchResult:
+    """Concurrent ``stream_model`` calls: time to first token and tokens per second."""
+    from aws_management.src.services.bedrock_ops import StreamMetrics, stream_model
+
+    n = max(8, int(32 * scale))
+    chunks = 32
+    with bedrock_backend(LatencyProfile(base=0.02, jitter=0.01), stream_chunks=chunks, chunk_delay=0.001):
+        async def consume(i):
+            metrics = StreamMetrics(model='anthropic.claude-v2')
+            async for _ in stream_model(f'prompt {i}', metrics=metrics):
+                pass
+            return metrics
+
+        async def run():
+            start = time.perf_counter()
+            results = await asyncio.gather(*(consume(i) for i in range(n)))
+            return results, time.perf_counter() - start
+        results, seconds = asyncio.run(run())
+    ttft = [m.time_to_first_token for m in results if m.time_to_first_token is not None]
+    return BenchResult('bedrock.stream', n, seconds, ttft, {
+        'tokens_per_second': round(n * chunks / seconds, 1),
+        'ttft_p50_ms': round(percentile(ttft, 50) * 1000, 3),
+    })
+
+
+def bench_s3_upload(scale: float) -> BenchResult:
+    """``upload_directory`` of many small files against moto with per-request latency."""
+    from aws_management.src.services.s3_ops import upload_directory
+
+    files = max(8, int(64 * scale))
+    size = 256 * 1024
+    with tempfile.TemporaryDirectory() as root, moto_backend(LatencyProfile(base=0.005, jitter=0.005)) as registry:
+        registry.client('s3').create_bucket(Bucket='bench')
+        for i in range(files):
+            with open(os.path.join(root, f'file{i:04d}.bin'), 'wb') as f:
+                f.write(os.urandom(size))
+        report, seconds = _timed(upload_directory, root, 'bench', max_workers=16)
+        api = _api_latency(registry, 's3', 'PutObject')
+    return BenchResult('s3.upload_directory', files, seconds, extra={
+        'mb_per_s': round(files * size / MB / seconds, 2),
+        'failed': len(report.failed),
+        **api,
+    })
+
+
+def bench_s3_download(scale: float) -> BenchResult:
+    """``download_ranged`` of one large object, then ``cached_download`` hits."""
+    from aws_management.src.services.s3_ops import cached_download, download_ranged
+
+    size = max(4, int(32 * scale)) * MB
+    hits = 50
+    with tempfile.TemporaryDirectory() as root, moto_backend(LatencyProfile(base=0.005, jitter=0.005)) as registry:
+        s3 = registry.client('s3')
+        s3.create_bucket(Bucket='bench')
+        s3.put_object(Bucket='bench', Key='large.bin', Body=os.urandom(size))
+        _, seconds = _timed(download_ranged, 'bench', 'large.bin', os.path.join(root, 'large.bin'),
+                            part_size=4 * MB, max_workers=8)
+        cache_dir = os.path.join(root, 'cache')
+        cached_download('bench', 'large.bin', cache_dir, part_size=4 * MB)
+        latencies = []
+        for _ in range(hits):
+            _, elapsed = _timed(cached_download, 'bench', 'large.bin', cache_dir)
+            latencies.append(elapsed)
+    return BenchResult('s3.download', hits, sum(latencies), latencies, {
+        'ranged_mb_per_s': round(size / MB / seconds, 2),
+    })
+
+
+def bench_provision(scale: float) -> BenchResult:
+    """Bulk Identity Center provisioning, then an idempotent re-run."""
+    from aws_management.src.services.conf_ops import (
+        DesiredState,
+        GroupSpec,
+        UserSpec,
+        provision,
+    )
+
+    users = max(20, int(100 * scale))
+    desired = DesiredState(
+        users=[UserSpec(f'user{i}', f'user{i}@example.com', 'Bench', f'User{i}') for i in range(users)],
+        groups=[GroupSpec('everyone'), GroupSpec('engineering')],
+        memberships={('everyone', f'user{i}') for i in range(users)} | {('engineering', 'user0')},
+    )
+    store_id = 'd-1234567890'
+    with moto_backend(LatencyProfile(base=0.01, jitter=0.005), services=('identitystore',)) as registry:
+        client = registry.client('identitystore', BENCH_REGION)
+        report, seconds = _timed(provision, client, store_id, desired, max_workers=16, requests_per_second=500)
+        _, noop_seconds = _timed(provision, client, store_id, desired, max_workers=16, requests_per_second=500)
+        api = _api_latency(registry, 'identitystore', 'CreateUser')
+    return BenchResult('identitystore.provision', len(report.results), seconds, extra={
+        'failed': len(report.failed),
+        'noop_seconds': round(noop_seconds, 4),
+        **api,
+    })
+
+
+def _vector_bench(name: str, scale: float, prepare) -> BenchResult:
+    """Top-10 search over clustered vectors: queries per second and recall against exact search."""
+    import numpy as np
+
+    from aws_management.src.utils.vector_index import VectorIndex
+
+    n, dim, queries = max(5_000, int(100_000 * scale)), 256, 200
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(256, dim)).astype(np.float32)
+    data = centers[rng.integers(len(centers), size=n)] + rng.normal(size=(n, dim)).astype(np.float32)
+    probes = centers[rng.integers(len(centers), size=queries)] + rng.normal(size=(queries, dim)).astype(np.float32)
+    index = VectorIndex(dim, capacity=n)
+    index.add([str(i) for i in range(n)], data)
+    exact, _ = index.search(probes, k=10)
+    _, build_seconds = _timed(prepare, index)
+    latencies = []
+    found = []
+    for query in probes:
+        (ids, _), elapsed = _timed(index.search, query, 10)
+        found.extend(ids)
+        latencies.append(elapsed)
+    recall = float(np.mean([len(set(f) & set(e)) / 10 for f, e in zip(found, exact, strict=True)]))
+    return BenchResult(name, queries, sum(latencies), latencies, {
+        'vectors': n, 'recall_at_10': round(recall, 4), 'build_seconds': round(build_seconds, 3),
+    })
+
+
+def bench_vector_exact(scale: float) -> BenchResult:
+    """Exact single-query search: the matrix-product baseline."""
+    return _vector_bench('vector.search_exact', scale, lambda index: None)
+
+
+def bench_vector_ivf(scale: float) -> BenchResult:
+    """IVF search probing 8 of sqrt(n) clusters."""
+    return _vector_bench('vector.search_ivf', scale,
+                         lambda index: index.build_ivf(nlist=int(len(index) ** 0.5), nprobe=8))
+
+
+def bench_vector_ivf_int8(scale: float) -> BenchResult:
+    """IVF search with int8 scoring and full-precision re-ranking."""
+    def prepare(index):
+        index.build_ivf(nlist=int(len(index) ** 0.5), nprobe=8)
+        index.quantize()
+    return _vector_bench('vector.search_ivf_int8', scale, prepare)
+
+
+def bench_chat_rolling_summary(scale: float) -> BenchResult:
+    """A long chat with rolling summarization: per-turn prompt size against the full transcript."""
+    from aws_management.src.services.chat_ops import ChatMemory, count_tokens
+
+    turns = max(100, int(1000 * scale))
+    with bedrock_backend(LatencyProfile(base=0.002, jitter=0.001)):
+        async def run():
+            memory = ChatMemory(token_budget=1000)
+            sizes, latencies = [], []
+            transcript = 0
+            start = time.perf_counter()
+            for i in range(turns):
+                message = f'question {i}: ' + 'words ' * 30
+                call = time.perf_counter()
+                prompt = await memory.prompt('bench', message)
+                latencies.append(time.perf_counter() - call)
+                sizes.append(count_tokens(prompt))
+                transcript += count_tokens(message)
+                reply = await memory.chat('bench', message)
+                transcript += count_tokens(reply)
+            await memory.flush()
+            return memory, sizes, latencies, transcript, time.perf_counter() - start
+        memory, sizes, latencies, transcript, seconds = asyncio.run(run())
+    return BenchResult('chat.rolling_summary', turns, seconds, latencies, {
+        'max_prompt_tokens': max(sizes),
+        'p99_prompt_tokens': percentile(sizes, 99),
+        'last_prompt_tokens': sizes[-1],
+        'transcript_tokens': transcript,
+        'folds': memory.folds,
+        'stored_bytes': memory.store.size('bench'),
+    })
+
+
+def bench_image_generation(scale: float) -> BenchResult:
+    """``generate_images`` of ~1 MB images: images per minute, and peak RSS against the images' total size."""
+    import boto3
+
+    from aws_management.src.services.bedrock_ops import generate_images
+    from aws_management.src.utils import config
+
+    n = max(20, int(200 * scale))
+    with bedrock_backend(LatencyProfile(base=0.05, jitter=0.02)):
+        # PutObject is stubbed rather than served by moto, which would hold every image in memory.
+        s3 = boto3.client('s3', region_name=BENCH_REGION)
+        StubBackend(s3, LatencyProfile(base=0.005, jitter=0.005)).respond('PutObject', lambda params: {'ETag': '"0"'})
+        config.registry.register('s3', s3)
+        (_, metrics), seconds = _timed(asyncio.run, generate_images(
+            (f'prompt {i}' for i in range(n)), 'bench', requests_per_minute=60_000, max_in_flight=16,
+        ))
+    return BenchResult('bedrock.image_generation', metrics.images, seconds, extra={
+        'images_per_minute': round(metrics.images_per_minute, 1),
+        'failed': metrics.failed,
+        'image_mb': round(metrics.bytes / MB, 1),
+        'peak_rss_mb': round((metrics.peak_rss_bytes or 0) / MB, 1),
+        'rss_growth_mb': round((metrics.rss_growth_bytes or 0) / MB, 1),
+    })
+
+
+BENCHMARKS = {
+    'bedrock.invoke_single': bench_invoke_single,
+    'bedrock.invoke_batched': bench_invoke_batched,
+    'bedrock.stream': bench_stream,
+    'bedrock.image_generation': bench_image_generation,
+    's3.upload_directory': bench_s3_upload,
+    's3.download': bench_s3_download,
+    'identitystore.provision': bench_provision,
+    'vector.search_exact': bench_vector_exact,
+    'vector.search_ivf': bench_vector_ivf,
+    'vector.search_ivf_int8': bench_vector_ivf_int8,
+    'chat.rolling_summary': bench_chat_rolling_summary,
+}
+
+
+def run_benchmarks(patterns=('*',), scale: float = 1.0) -> dict:
+    """
+    Runs the benchmarks whose names match any of ``patterns``.
+
+    Args:
+        patterns (iterable): fnmatch patterns, e.g. 'bedrock.*'.
+        scale (float): Multiplier on each benchmark's workload size.
+
+    Returns:
+        dict: A report with a 'meta' section and one 'results' entry per benchmark.
+    """
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            results[name] = bench(scale).as_dict()
+    return {
+        'meta': {
+            'created_at': datetime.now(UTC).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': scale,
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.15) -> list:
+    """
+    Lists regressions of ``current`` against ``baseline``.
+
+    Throughput is a regression when it falls more than ``tolerance`` below the
+    baseline; p50 and p99 latency when they rise more than ``tolerance`` above
+    it. Benchmarks missing from either report are ignored.
+
+    Args:
+        current (dict): Report from ``run_benchmarks``.
+        baseline (dict): Stored report to compare against.
+        tolerance (float): Allowed relative change, e.g. 0.15 for 15%.
+
+    Returns:
+        list: Human-readable regression descriptions; empty if none.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None:
+            continue
+        for key, higher_is_better in COMPARED_FIELDS.items():
+            old, new = reference.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f"{name} {key}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    """Runs the selected benchmarks, prints the report and fails on regressions against a baseline."""
+    parser = argparse.ArgumentParser(description="Offline benchmarks over stubbed and moto-backed AWS services.")
+    parser.add_argument('--only', nargs='+', default=['*'], help="fnmatch patterns of benchmarks to run")
+    parser.add_argument('--scale', type=float, default=1.0, help="workload size multiplier")
+    parser.add_argument('--output', help="write the JSON report here")
+    parser.add_argument('--baseline', help="compare against this stored report")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    # Keep expected throttling notices out of the report output.
+    configure_logging(level=os.environ.get('LOG_LEVEL', 'WARNING'))
+    report = run_benchmarks(args.only, args.scale)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
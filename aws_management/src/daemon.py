@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+# Imported once when the daemon starts, so forwarded commands find them warm.
+WARM_MODULES = (
+    'aws_management.src.services.bedrock_ops',
+    'aws_management.src.services.s3_ops',
+    'aws_management.src.services.conf_ops',
+    'aws_management.src.services.ec2_ops',
+    'aws_management.src.services.rds_ops',
+)
+
+# Environment that selects the account, credentials and region. Clients and
+# sessions in the daemon were built from its own values, so it only serves
+# callers whose values match.
+IDENTITY_ENV_PREFIXES = ('AWS_',)
+IDENTITY_ENV_NAMES = ('USERS',)
+
+# Event loop shared by every command while the daemon is serving; see run_coroutine.
+_loop = None
+
+
+def identity_digest(environ=None) -> str:
+    """Returns a digest of the AWS identity environment, without exposing its values."""
+    environ = os.environ if environ is None else environ
+    items = sorted(
+        (name, value) for name, value in environ.items()
+        if name.startswith(IDENTITY_ENV_PREFIXES) or name in IDENTITY_ENV_NAMES
+    )
+    return hashlib.sha256(json.dumps(items).encode()).hexdigest()
+
+
+def run_coroutine(coro):
+    """
+    Runs ``coro`` to completion and returns its result.
+
+    Inside the daemon every command's coroutines run on one shared event loop,
+    so the Bedrock engine's global and per-model limits hold across concurrent
+    requests; elsewhere a new loop is used, as with ``asyncio.run``.
+    """
+    if _loop is None:
+        return asyncio.run(coro)
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+def _request(path: str, message: dict, timeout: float | None = None) -> dict | None:
+    """Sends one JSON request over the socket; returns the reply, or None if nothing is listening."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError:
+            return None
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        with sock.makefile('rb') as reader:
+            line = reader.readline()
+    return json.loads(line) if line else None
+
+
+def forward(path: str, argv: list) -> int | None:
+    """
+    Runs ``argv`` in the daemon listening on ``path`` and relays its output.
+
+    The caller's working directory is sent along, so relative paths resolve as
+    they would locally. The daemon refuses callers whose AWS environment
+    (profile, region, credentials, USERS) differs from its own.
+
+    Returns:
+        int | None: The command's exit status, or None if no daemon answered
+        or it refused the command, in which case the caller should run it itself.
+    """
+    reply = _request(path, {'argv': argv, 'cwd': os.getcwd(), 'identity': identity_digest()})
+    if reply is None or reply.get('refused'):
+        return None
+    sys.stdout.write(reply['stdout'])
+    sys.stderr.write(reply['stderr'])
+    return reply['status']
+
+
+def ping(path: str) -> bool:
+    """Returns True if a daemon is answering on ``path``."""
+    reply = _request(path, {'ping': True}, timeout=1.0)
+    return bool(reply and reply.get('ok'))
+
+
+def stop(path: str) -> bool:
+    """Asks the daemon on ``path`` to exit; returns False if none was running."""
+    return _request(path, {'shutdown': True}, timeout=5.0) is not None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict) or not (
+                request.get('ping') or request.get('shutdown') or isinstance(request.get('argv'), list)):
+            reply = {'status': 2, 'stdout': '', 'stderr': "Error: malformed daemon request\n"}
+        elif 'argv' in request and request.get('identity') != identity_digest():
+            reply = {'refused': "the caller's AWS environment differs from the daemon's"}
+        elif request.get('ping'):
+            reply = {'ok': True, 'pid': os.getpid()}
+        elif request.get('shutdown'):
+            reply = {'ok': True}
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            out, err = io.StringIO(), io.StringIO()
+            try:
+                status = self.server.run(request['argv'], out, err, cwd=request.get('cwd'))
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else 2
+            reply = {'status': status, 'stdout': out.getvalue(), 'stderr': err.getvalue()}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+DAEMON_RUNNING_ERROR = "A daemon is already listening on {path}"
+
+
+def serve(path: str, run) -> None:
+    """
+    Serves CLI commands on the Unix socket ``path`` until asked to stop.
+
+    Service modules are imported up front and every command runs in this
+    process, so boto3 clients, the model catalog and other caches stay warm
+    between invocations. Commands run their coroutines on one shared event
+    loop through ``run_coroutine``. The socket is only accessible to the
+    current user.
+
+    Args:
+        path (str): Socket path.
+        run (callable): ``run(argv, out, err, cwd=None) -> int`` executing one command,
+            resolving relative paths against ``cwd``.
+    """
+    global _loop
+    import importlib
+
+    from aws_management.src.utils.logging import configure_logging
+
+    configure_logging()
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+    if os.path.exists(path):
+        if ping(path):
+            raise RuntimeError(DAEMON_RUNNING_ERROR.format(path=path))
+        os.unlink(path)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    old_umask = os.umask(0o177)
+    try:
+        server = _Server(path, _Handler)
+    finally:
+        os.umask(old_umask)
+    server.run = run
+    _loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=_loop.run_forever, name='daemon-loop', daemon=True)
+    loop_thread.start()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        _loop.call_soon_threadsafe(_loop.stop)
+        loop_thread.join()
+        _loop.close()
+        _loop = None
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def spawn(path: str, timeout: float = 15.0) -> bool:
+    """
+    Starts a detached daemon on ``path`` and waits until it answers.
+
+    Returns:
+        bool: True once the daemon is answering, False if it did not come up in ``timeout`` seconds.
+    """
+    if ping(path):
+        return True
+    subprocess.Popen(  # noqa: S603
+        [sys.executable, '-m', 'aws_management.src.main', 'daemon', 'start', '--foreground', '--socket', path],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if ping(path):
+            return True
+        time.sleep(0.05)
+    return False
@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Only the standard library is imported at module level: boto3 and the service
+# modules take hundreds of milliseconds to import, so each command imports
+# what it needs when it runs, and `--help` or a cached `models` lookup never
+# pays for them.
+
+# Seconds the on-disk model list stays valid; shares the catalog's TTL setting.
+MODELS_CACHE_TTL = float(os.environ.get("BEDROCK_MODEL_CATALOG_TTL", "300"))
+
+# Parsed arguments holding local file or directory paths.
+PATH_ARGUMENTS = ('directory', 'file')
+
+
+def cache_dir() -> str:
+    """Returns the CLI's cache directory (BEDROCK_K_CACHE_DIR, or bedrock-k under XDG_CACHE_HOME)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("BEDROCK_K_CACHE_DIR") or os.path.join(base, "bedrock-k")
+
+
+def socket_path() -> str:
+    """Returns the warm daemon's Unix socket path (BEDROCK_K_SOCKET, or daemon.sock in cache_dir)."""
+    return os.environ.get("BEDROCK_K_SOCKET") or os.path.join(cache_dir(), "daemon.sock")
+
+
+def _models_cache_file() -> str:
+    return os.path.join(cache_dir(), "models.json")
+
+
+def read_models_cache(ttl: float = MODELS_CACHE_TTL) -> list | None:
+    """Returns the cached model summaries, or None if missing or older than ``ttl`` seconds."""
+    try:
+        with open(_models_cache_file()) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - cached.get('fetched_at', 0) > ttl:
+        return None
+    return cached['models']
+
+
+def write_models_cache(models: list) -> None:
+    """Stores model summaries for later invocations, replacing the file atomically."""
+    path = _models_cache_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'fetched_at': time.time(), 'models': models}, f)
+    os.replace(tmp, path)
+
+
+def _print_json(value, out) -> None:
+    out.write(json.dumps(value, default=str) + "\n")
+
+
+def cmd_models(args, out) -> int:
+    """Lists foundation models, from the on-disk cache when it is fresh."""
+    models = None if args.refresh else read_models_cache()
+    if models is None:
+        from aws_management.src.daemon import run_coroutine
+        from aws_management.src.services.bedrock_ops import model_catalog
+
+        models = list(run_coroutine(model_catalog.refresh(force=args.refresh)).values())
+        write_models_cache(models)
+    if args.provider:
+        models = [m for m in models if m.get('providerName', '').lower() == args.provider.lower()]
+    if args.modality:
+        models = [m for m in models if args.modality.upper() in m.get('outputModalities', ())]
+    if args.json:
+        _print_json(models, out)
+        return 0
+    for m in models:
+        streaming = 'stream' if m.get('responseStreamingSupported') else ''
+        modalities = f"{','.join(m.get('inputModalities', ()))}->{','.join(m.get('outputModalities', ()))}"
+        out.write(f"{m['modelId']}\t{m.get('providerName', '')}\t{modalities}\t{streaming}\n")
+    return 0
+
+
+def _parse_params(pairs) -> dict:
+    params = {}
+    for pair in pairs or ():
+        key, _, value = pair.partition('=')
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+def cmd_invoke(args, out) -> int:
+    """Invokes a model with the prompt, streaming the reply with ``--stream``."""
+    from aws_management.src.daemon import run_coroutine
+    from aws_management.src.services import bedrock_ops
+
+    params = _parse_params(args.param)
+
+    async def run():
+        if not args.stream:
+            return await bedrock_ops.invoke_model(args.prompt, args.model, params)
+        chunks = []
+        async for chunk in bedrock_ops.stream_model(args.prompt, args.model, params):
+            out.write(chunk)
+            out.flush()
+            chunks.append(chunk)
+        return ''.join(chunks)
+
+    text = run_coroutine(run())
+    out.write(text + "\n" if not args.stream else "\n")
+    return 0 if text else 1
+
+
+def cmd_s3(args, out) -> int:
+    """Runs ``s3 sync``, ``s3 get`` or ``s3 cat``."""
+    from aws_management.src.services import s3_ops
+
+    if args.s3_command == 'sync':
+        sync = s3_ops.upload_directory if args.all else s3_ops.sync_to_s3
+        kwargs = {} if args.all else {'skip_unchanged': True}
+        report = sync(args.directory, args.bucket, prefix=args.prefix, max_workers=args.workers, **kwargs)
+        _print_json({
+            'uploaded': len(report.uploaded), 'skipped': len(report.skipped), 'failed': len(report.failed),
+            'bytes': report.bytes_transferred, 'seconds': round(report.elapsed, 3),
+            'mbps': round(report.throughput_mbps, 2),
+        }, out)
+        return 1 if report.failed else 0
+    if args.s3_command == 'get':
+        etag = s3_ops.download_ranged(args.bucket, args.key, args.file,
+                                      part_size=args.part_size * s3_ops.MB, max_workers=args.workers)
+        _print_json({'file': args.file, 'etag': etag}, out)
+        return 0
+    for line in s3_ops.iter_lines(args.bucket, args.key):
+        out.write(line + "\n")
+    return 0
+
+
+def cmd_idc(args, out) -> int:
+    """Provisions Identity Center users and groups from a desired-state file."""
+    from aws_management.src.services import conf_ops
+    from aws_management.src.utils.config import get_client
+
+    client = get_client('identitystore', args.region)
+    desired = conf_ops.load_desired_state(args.file)
+    if args.dry_run:
+        snapshot = conf_ops.fetch_directory(client, args.store_id)
+        plan = conf_ops.plan_changes(snapshot, desired, prune=args.prune)
+        _print_json({name: len(items) for name, items in vars(plan).items()}, out)
+        return 0
+    report = conf_ops.provision(client, args.store_id, desired, prune=args.prune,
+                                requests_per_second=args.rate)
+    for result in report.failed:
+        out.write(f"failed {result.kind} {result.name} ({result.action}): {result.error}\n")
+    _print_json(report.counts(), out)
+    return 1 if report.failed else 0
+
+
+def cmd_ec2(args, out) -> int:
+    """Prints EC2 instances across regions as JSON lines."""
+    from aws_management.src.services import ec2_ops
+    from aws_management.src.utils.config import register_users
+
+    profiles = register_users() if args.users else (None,)
+    filters = {'instance-state-name': [args.state]} if args.state else None
+    for record in ec2_ops.iter_instances(args.region, profiles, filters):
+        _print_json(record.as_dict(), out)
+    return 0
+
+
+def cmd_rds(args, out) -> int:
+    """Prints RDS resources across regions as JSON lines."""
+    from aws_management.src.services import rds_ops
+
+    result = rds_ops.inventory(args.region, resources=args.resource or tuple(rds_ops.RESOURCES))
+    for resource, items in result.items():
+        for item in items:
+            _print_json({'resource': resource, **item}, out)
+    return 0
+
+
+def cmd_daemon(args, out) -> int:
+    """Starts, stops or reports on the warm daemon."""
+    from aws_management.src import daemon
+
+    path = args.socket or socket_path()
+    if args.daemon_command == 'start':
+        if args.foreground:
+            daemon.serve(path, run)
+            return 0
+        return 0 if daemon.spawn(path) else 1
+    if args.daemon_command == 'stop':
+        return 0 if daemon.stop(path) else 1
+    running = daemon.ping(path)
+    out.write(f"{'running' if running else 'not running'} ({path})\n")
+    return 0 if running else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the ``bedrock-k`` argument parser."""
+    parser = argparse.ArgumentParser(prog='bedrock-k', description="Bedrock, S3, Identity Center, EC2 and RDS tools.")
+    parser.add_argument('--no-daemon', action='store_true', help="run locally even if a warm daemon is up")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    models = commands.add_parser('models', help="list foundation models (cached between runs)")
+    models.add_argument('--provider', help="only this provider, e.g. anthropic")
+    models.add_argument('--modality', help="only models with this output modality, e.g. TEXT")
+    models.add_argument('--refresh', action='store_true', help="ignore the cache and refetch")
+    models.add_argument('--json', action='store_true', help="print the full summaries as JSON")
+    models.set_defaults(handler=cmd_models)
+
+    invoke = commands.add_parser('invoke', help="invoke a model")
+    invoke.add_argument('prompt', help="prompt text, or - to read it from stdin")
+    invoke.add_argument('--model', default='anthropic.claude-v2')
+    invoke.add_argument('--param', action='append', metavar='KEY=VALUE', help="inference parameter (JSON value)")
+    invoke.add_argument('--stream', action='store_true', help="print tokens as they arrive")
+    invoke.set_defaults(handler=cmd_invoke)
+
+    s3 = commands.add_parser('s3', help="S3 transfers")
+    s3_commands = s3.add_subparsers(dest='s3_command', required=True)
+    sync = s3_commands.add_parser('sync', help="upload a directory, skipping unchanged files")
+    sync.add_argument('directory')
+    sync.add_argument('bucket')
+    sync.add_argument('--prefix', default='')
+    sync.add_argument('--workers', type=int, default=8)
+    sync.add_argument('--all', action='store_true', help="upload every file, changed or not")
+    get = s3_commands.add_parser('get', help="download an object with parallel ranged GETs")
+    get.add_argument('bucket')
+    get.add_argument('key')
+    get.add_argument('file')
+    get.add_argument('--part-size', type=int, default=16, help="MB per ranged GET")
+    get.add_argument('--workers', type=int, default=8)
+    cat = s3_commands.add_parser('cat', help="stream an object's lines")
+    cat.add_argument('bucket')
+    cat.add_argument('key')
+    s3.set_defaults(handler=cmd_s3)
+
+    idc = commands.add_parser('idc', help="Identity Center provisioning")
+    idc_commands = idc.add_subparsers(dest='idc_command', required=True)
+    provision = idc_commands.add_parser('provision', help="apply a desired-state .json or .csv file")
+    provision.add_argument('file')
+    provision.add_argument('--store-id', required=True)
+    provision.add_argument('--region')
+    provision.add_argument('--prune', action='store_true', help="delete entities absent from the file")
+    provision.add_argument('--dry-run', action='store_true', help="print the planned writes only")
+    provision.add_argument('--rate', type=float, default=20.0, help="write requests per second")
+    idc.set_defaults(handler=cmd_idc)
+
+    ec2 = commands.add_parser('ec2', help="EC2 inventory")
+    ec2_commands = ec2.add_subparsers(dest='ec2_command', required=True)
+    ec2_list = ec2_commands.add_parser('list', help="print instances as JSON lines")
+    ec2_list.add_argument('--region', action='append', help="region to scan (repeatable; default all enabled)")
+    ec2_list.add_argument('--state', help="only instances in this state, e.g. running")
+    ec2_list.add_argument('--users', action='store_true', help="scan with each USERS credential set")
+    ec2.set_defaults(handler=cmd_ec2)
+
+    rds = commands.add_parser('rds', help="RDS inventory")
+    rds_commands = rds.add_subparsers(dest='rds_command', required=True)
+    inventory = rds_commands.add_parser('inventory', help="print RDS resources as JSON lines")
+    inventory.add_argument('--region', action='append', required=True, help="region to scan (repeatable)")
+    inventory.add_argument('--resource', action='append', choices=['instances', 'clusters', 'snapshots', 'cluster_snapshots'])
+    rds.set_defaults(handler=cmd_rds)
+
+    daemon = commands.add_parser('daemon', help="warm daemon that keeps clients and caches alive")
+    daemon.add_argument('daemon_command', choices=['start', 'stop', 'status'])
+    daemon.add_argument('--socket', help="Unix socket path")
+    daemon.add_argument('--foreground', action='store_true', help="serve in this process")
+    daemon.set_defaults(handler=cmd_daemon)
+    return parser
+
+
+def run(argv, out=None, err=None, cwd=None) -> int:
+    """
+    Parses ``argv`` and runs the command in this process.
+
+    Args:
+        argv (list): Arguments without the program name.
+        out: Stream for command output; defaults to stdout.
+        err: Stream for error messages; defaults to stderr.
+        cwd (str): Directory relative path arguments are resolved against, e.g.
+            the caller's when run by the daemon; None for this process's own.
+
+    Returns:
+        int: The exit status.
+    """
+    from aws_management.src.utils.logging import (
+        configure_logging,
+        get_logger,
+        logging_configured,
+    )
+
+    out = out or sys.stdout
+    err = err or sys.stderr
+    args = build_parser().parse_args(argv)
+    if cwd is not None:
+        for name in PATH_ARGUMENTS:
+            if getattr(args, name, None):
+                setattr(args, name, os.path.join(cwd, getattr(args, name)))
+    if not logging_configured():
+        configure_logging()
+    try:
+        return args.handler(args, out)
+    except Exception as e:
+        # Only the message goes to stderr; run with LOG_LEVEL=DEBUG for the traceback.
+        get_logger(__name__).debug("Command %s failed", args.command, exc_info=True)
+        err.write(f"Error: {e}\n")
+        return 1
+
+
+def main(argv=None) -> int:
+    """
+    Entry point of the ``bedrock-k`` console script.
+
+    Commands are forwarded to the warm daemon when one is listening on
+    ``socket_path()``, and run in-process otherwise. ``invoke --stream`` always
+    runs in-process: the daemon relays output only once a command finishes.
+    """
+    argv = list(sys.argv[1:] if argv is None else argv)
+    args = build_parser().parse_args(argv)
+    if args.command == 'invoke' and args.prompt == '-':
+        argv[argv.index('-')] = args.prompt = sys.stdin.read()
+    streaming = args.command == 'invoke' and args.stream
+    if args.command != 'daemon' and not args.no_daemon and not streaming and os.path.exists(socket_path()):
+        from aws_management.src import daemon
+
+        status = daemon.forward(socket_path(), argv)
+        if status is not None:
+            return status
+    return run(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
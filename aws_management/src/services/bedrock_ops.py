@@ -1,44 +1,1911 @@
-import boto3
 import asyncio
+import base64
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from aws_management.src.services import s3_ops
+from aws_management.src.utils.cache import ResponseCache, content_key
+from aws_management.src.utils.config import get_client
+from aws_management.src.utils.logging import aws_fields, get_logger
+from aws_management.src.utils.ratelimit import AdaptiveRateLimiter, backoff_delay
+
+logger = get_logger(__name__)
+
+# Seconds a fetched model catalog stays valid; override with BEDROCK_MODEL_CATALOG_TTL.
+MODEL_CATALOG_TTL = float(os.environ.get("BEDROCK_MODEL_CATALOG_TTL", "300"))
+# Threads available for blocking botocore calls; keep within AWS_MAX_POOL_CONNECTIONS.
+BEDROCK_MAX_WORKERS = int(os.environ.get("BEDROCK_MAX_WORKERS", "64"))
+# Bedrock calls allowed in flight at once, across all models and per model.
+BEDROCK_MAX_CONCURRENCY = int(os.environ.get("BEDROCK_MAX_CONCURRENCY", "256"))
+BEDROCK_MODEL_CONCURRENCY = int(os.environ.get("BEDROCK_MODEL_CONCURRENCY", "64"))
+
+
+class AsyncEngine:
+    """
+    Runs blocking botocore calls off the event loop under bounded concurrency.
+
+    Calls are executed on a dedicated, sized thread pool so the event loop keeps
+    serving other coroutines while requests are outstanding. A global semaphore
+    caps the total number of calls in flight and a per-model semaphore keeps one
+    hot model from starving the rest.
+
+    Args:
+        max_workers (int): Size of the thread pool.
+        max_concurrency (int): Calls allowed in flight across all models.
+        per_model_concurrency (int): Calls allowed in flight for any one model.
+    """
+
+    def __init__(self, max_workers: int = BEDROCK_MAX_WORKERS,
+                 max_concurrency: int = BEDROCK_MAX_CONCURRENCY,
+                 per_model_concurrency: int = BEDROCK_MODEL_CONCURRENCY):
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.per_model_concurrency = per_model_concurrency
+        self._executor = None
+        self._loop = None
+        self._global_limit = None
+        self._model_limits = {}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """ThreadPoolExecutor: The pool blocking calls run on, created on first use."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='bedrock',
+            )
+        return self._executor
+
+    def _limits(self, model: str | None) -> tuple:
+        # Semaphores bind to the loop they are first awaited on; rebuild them
+        # when the engine is driven from a new loop.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+            self._model_limits = {}
+        model_limit = None
+        if model is not None:
+            model_limit = self._model_limits.get(model)
+            if model_limit is None:
+                model_limit = self._model_limits[model] = asyncio.Semaphore(self.per_model_concurrency)
+        return self._global_limit, model_limit
+
+    async def run(self, fn, *args, model: str | None = None):
+        """
+        Runs ``fn(*args)`` on the engine's thread pool and awaits the result.
+
+        Args:
+            fn (callable): The blocking function to call.
+            *args: Positional arguments for ``fn``.
+            model (str): Model ID whose per-model limit applies, if any.
+
+        Returns:
+            The value returned by ``fn``.
+        """
+        global_limit, model_limit = self._limits(model)
+        limits = [limit for limit in (model_limit, global_limit) if limit is not None]
+        loop = asyncio.get_running_loop()
+        # Take the per-model slot first so callers queued behind a saturated
+        # model do not hold global slots other models could use.
+        acquired = []
+        try:
+            for limit in limits:
+                await limit.acquire()
+                acquired.append(limit)
+        except BaseException:
+            for limit in acquired:
+                limit.release()
+            raise
+
+        def release():
+            for limit in limits:
+                limit.release()
+
+        def on_done(_):
+            # RuntimeError means the loop has closed; its semaphores went with it.
+            with contextlib.suppress(RuntimeError):
+                loop.call_soon_threadsafe(release)
+
+        # The slots are released when the thread finishes, not when the caller
+        # stops waiting, so a cancelled call (e.g. a hedge that lost) still
+        # counts against the limits while its request is in flight.
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shuts down the thread pool; it is recreated on the next call."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+engine = AsyncEngine()
+
+
+class ModelCatalog:
+    """
+    TTL-cached index of the foundation models available in Amazon Bedrock.
+
+    The catalog is fetched with a single ``list_foundation_models`` call and kept
+    for ``ttl`` seconds. Callers that find it cold or expired share one in-flight
+    refresh, so a burst of concurrent requests triggers one API call.
+
+    Args:
+        ttl (float): Seconds a fetched catalog stays valid.
+        clock (callable): Monotonic time source, injectable for tests.
+    """
+
+    def __init__(self, ttl: float = MODEL_CATALOG_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._expires_at = None
+        self._refresh_task = None
+        self._index({})
+
+    def _index(self, models: dict) -> None:
+        by_provider, by_input, by_output = {}, {}, {}
+        for model_id, summary in models.items():
+            by_provider.setdefault(summary.get('providerName', '').lower(), set()).add(model_id)
+            for modality in summary.get('inputModalities', ()):
+                by_input.setdefault(modality.upper(), set()).add(model_id)
+            for modality in summary.get('outputModalities', ()):
+                by_output.setdefault(modality.upper(), set()).add(model_id)
+        self._models = models
+        self._by_provider = {k: frozenset(v) for k, v in by_provider.items()}
+        self._by_input_modality = {k: frozenset(v) for k, v in by_input.items()}
+        self._by_output_modality = {k: frozenset(v) for k, v in by_output.items()}
+        self._streaming = frozenset(
+            model_id for model_id, summary in models.items()
+            if summary.get('responseStreamingSupported')
+        )
+
+    @property
+    def is_fresh(self) -> bool:
+        """bool: True while the cached catalog is within its TTL."""
+        return self._expires_at is not None and self._clock() < self._expires_at
+
+    @property
+    def model_ids(self) -> list:
+        """list: The model IDs in the cached catalog."""
+        return list(self._models)
+
+    def invalidate(self) -> None:
+        """Expire the cached catalog so the next lookup refetches it."""
+        self._expires_at = None
+
+    async def refresh(self, force: bool = False) -> dict:
+        """
+        Returns the model index, fetching it if the cache is cold or expired.
+
+        Args:
+            force (bool): Refetch even if the cached catalog is still fresh.
+
+        Returns:
+            dict: Model summaries keyed by modelId.
+        """
+        if self.is_fresh and not force:
+            return self._models
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refresh_task = asyncio.ensure_future(self._fetch())
+        # Shield the shared fetch so one cancelled caller does not cancel the rest.
+        return await asyncio.shield(task)
+
+    async def _fetch(self) -> dict:
+        response = await engine.run(get_client('bedrock').list_foundation_models)
+        self._index({m['modelId']: m for m in response['modelSummaries']})
+        self._expires_at = self._clock() + self.ttl
+        return self._models
+
+    async def lookup(self, model_id: str) -> dict | None:
+        """
+        Returns the summary for ``model_id``, or None if it is not available.
+
+        Args:
+            model_id (str): The Bedrock modelId to look up.
+
+        Returns:
+            dict | None: The model summary from ``list_foundation_models``.
+        """
+        return (await self.refresh()).get(model_id)
+
+    def get(self, model_id: str) -> dict | None:
+        """Returns the cached summary for ``model_id`` without refreshing."""
+        return self._models.get(model_id)
+
+    def by_provider(self, provider: str) -> frozenset:
+        """Returns the cached model IDs offered by ``provider`` (case-insensitive)."""
+        return self._by_provider.get(provider.lower(), frozenset())
+
+    def by_modality(self, modality: str, output: bool = True) -> frozenset:
+        """
+        Returns the cached model IDs supporting ``modality``.
+
+        Args:
+            modality (str): A Bedrock modality such as "TEXT", "IMAGE" or "EMBEDDING".
+            output (bool): Match output modalities if True, input modalities otherwise.
+        """
+        index = self._by_output_modality if output else self._by_input_modality
+        return index.get(modality.upper(), frozenset())
+
+    def supports_streaming(self, model_id: str) -> bool:
+        """Returns True if the cached catalog marks ``model_id`` as streaming-capable."""
+        return model_id in self._streaming
+
+
+model_catalog = ModelCatalog()
 
-bedrock_client = boto3.client('bedrock')
 
 async def list_available_models() -> list:
     """
     Lists the foundation models currently available in Amazon Bedrock.
 
+    The result is served from ``model_catalog`` and refetched only when its TTL
+    has expired.
+
     Returns:
         list: A list of dictionaries containing information about available models.
     """
     try:
-        response = bedrock_client.list_foundation_models()
-        return response['modelSummaries']
+        models = await model_catalog.refresh()
+        return list(models.values())
     except Exception as e:
-        print(f"Error listing models: {str(e)}")
+        logger.exception("Error listing models", extra={
+            'service': 'bedrock', 'operation': 'ListFoundationModels', **aws_fields(e),
+        })
         return []
-    
-async def invoke_model(prompt: str, model: str = "anthropic.claude-v2") -> str:
+
+
+def _provider(model: str) -> str:
+    parts = model.split('.')
+    # Cross-region inference profiles prefix the model ID with a geography, e.g. "us.".
+    if len(parts) > 2 and len(parts[0]) == 2:
+        parts = parts[1:]
+    return parts[0]
+
+
+def _uses_messages_api(model: str) -> bool:
+    # Claude 2 and Instant use the legacy text-completions body; later models
+    # only accept the Messages API.
+    legacy = ('claude-v2', 'claude-instant')
+    return _provider(model) == 'anthropic' and not any(tag in model for tag in legacy)
+
+
+def _request_body(model: str, prompt: str, params: dict | None = None) -> dict:
+    """Builds the provider-specific ``invoke_model`` request body."""
+    provider = _provider(model)
+    if provider == 'anthropic':
+        if _uses_messages_api(model):
+            body = {
+                'anthropic_version': 'bedrock-2023-05-31',
+                'max_tokens': 512,
+                'messages': [{'role': 'user', 'content': prompt}],
+            }
+        else:
+            body = {'prompt': f"\n\nHuman: {prompt}\n\nAssistant:", 'max_tokens_to_sample': 512}
+    elif provider == 'amazon':
+        body = {'inputText': prompt}
+    else:
+        body = {'prompt': prompt}
+    if params:
+        body.update(params)
+    return body
+
+
+RESPONSE_FORMAT_ERROR = "Unsupported response format for model '{model}'"
+
+
+def _parse_response(model: str, payload: dict) -> str:
+    """Extracts the generated text from a provider-specific response body."""
+    provider = _provider(model)
+    if provider == 'anthropic':
+        if 'content' in payload:
+            return ''.join(block.get('text', '') for block in payload['content'])
+        return payload['completion']
+    if provider == 'ai21':
+        data = payload['completions'][0]['data']
+        return data['text'] if isinstance(data, dict) else data
+    if provider == 'amazon':
+        return payload['results'][0]['outputText']
+    if provider == 'cohere':
+        return payload['generations'][0]['text']
+    if provider == 'meta':
+        return payload['generation']
+    if provider == 'mistral':
+        return payload['outputs'][0]['text']
+    raise ValueError(RESPONSE_FORMAT_ERROR.format(model=model))
+
+
+def _invoke_sync(model: str, body: str, region: str | None = None) -> dict:
+    start = time.perf_counter()
+    response = get_client('bedrock-runtime', region).invoke_model(
+        body=body,
+        modelId=model,
+        accept='application/json',
+        contentType='application/json',
+    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Invoked %s", model, extra={
+            'service': 'bedrock-runtime', 'operation': 'InvokeModel', 'model': model, 'region': region,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 1), **aws_fields(response),
+        })
+    return json.loads(response['body'].read())
+
+
+MODEL_UNAVAILABLE_ERROR = "Model '{model}' is not available. Available models are: {available}"
+
+
+async def _require_model(model: str) -> dict:
+    summary = await model_catalog.lookup(model)
+    if summary is None:
+        raise ValueError(MODEL_UNAVAILABLE_ERROR.format(model=model, available=', '.join(model_catalog.model_ids)))
+    return summary
+
+
+# Opt-in response cache; see enable_response_cache.
+response_cache = None
+_cache_inflight = {}
+# Opt-in multi-region routing; see enable_region_routing.
+region_router = None
+
+
+def enable_response_cache(path: str | None = None, **kwargs) -> ResponseCache:
+    """
+    Turns on the content-addressed response cache for ``invoke_model``.
+
+    Responses are keyed by a hash of the model ID and the normalized request
+    body, which includes the inference parameters. Only requests that set
+    ``temperature`` (``textGenerationConfig.temperature`` for Titan) to 0 are
+    cached; the rest, including those using the provider's default, bypass it.
+
+    Args:
+        path (str): SQLite file for the disk tier, or None to cache in memory only.
+        **kwargs: Size and TTL limits passed to ``ResponseCache``.
+
+    Returns:
+        ResponseCache: The installed cache, whose ``stats()`` reports hits and misses.
+    """
+    global response_cache
+    disable_response_cache()
+    response_cache = ResponseCache(path, **kwargs)
+    return response_cache
+
+
+def disable_response_cache() -> None:
+    """Turns off the response cache and closes its disk tier."""
+    global response_cache
+    if response_cache is not None:
+        response_cache.close()
+    response_cache = None
+
+
+def _is_deterministic(body: dict) -> bool:
+    # Provider defaults sample (Claude's temperature defaults to 1.0), so only
+    # an explicit temperature of 0 makes a response worth caching.
+    temperature = body.get('temperature', body.get('textGenerationConfig', {}).get('temperature'))
+    return temperature == 0
+
+
+async def _cached(cache: ResponseCache, key: str, fetch) -> str:
+    # Serve from memory inline; only a memory miss pays a thread hop to disk.
+    value = cache.get(key, memory_only=True)
+    if value is None and cache.path is not None:
+        value = await engine.run(cache.get, key)
+    if value is not None:
+        return value.decode()
+    loop = asyncio.get_running_loop()
+    task = _cache_inflight.get(key)
+    if task is not None and not task.done() and task.get_loop() is loop:
+        cache.record_coalesced()
+        return await asyncio.shield(task)
+    # The shared task stores the result itself, so it still lands in the
+    # cache (and other waiters still get it) if this caller is cancelled.
+    task = _cache_inflight[key] = asyncio.ensure_future(_fetch_and_store(cache, key, fetch))
+    return await asyncio.shield(task)
+
+
+async def _fetch_and_store(cache: ResponseCache, key: str, fetch) -> str:
+    try:
+        output = await fetch()
+        if cache.path is None:
+            cache.put(key, output.encode())
+        else:
+            await engine.run(cache.put, key, output.encode())
+        return output
+    finally:
+        if _cache_inflight.get(key) is asyncio.current_task():
+            del _cache_inflight[key]
+
+
+async def _invoke(prompt: str, model: str, params: dict | None = None) -> str:
+    """Invokes ``model`` and returns its text, raising on any failure."""
+    await _require_model(model)
+    request = _request_body(model, prompt, params)
+    body = json.dumps(request)
+
+    async def fetch():
+        router = region_router
+        if router is not None:
+            return await router.invoke(prompt, model, params)
+        payload = await engine.run(_invoke_sync, model, body, model=model)
+        return _parse_response(model, payload)
+
+    cache = response_cache
+    if cache is None or not _is_deterministic(request):
+        return await fetch()
+    return await _cached(cache, content_key(model, request), fetch)
+
+
+EMPTY_PROMPT_ERROR = "prompt must not be empty"
+
+
+async def invoke_model(prompt: str, model: str = "anthropic.claude-v2", params: dict | None = None) -> str:
     """
     Invokes the specified AI model with the given prompt.
 
+    The blocking Bedrock call runs on ``engine``'s thread pool, so many
+    invocations can be in flight without stalling the event loop. After
+    ``enable_region_routing`` calls go through the installed RegionRouter.
+
+    Args:
+        prompt (str): The input prompt for the model.
+        model (str): The name of the model to use (default: "anthropic.claude-v2").
+        params (dict): Inference parameters merged into the request body.
+
+    Returns:
+        str: The generated response from the model, or "" if the call failed.
+
+    Raises:
+        ValueError: If ``prompt`` is empty.
+    """
+    if not prompt:
+        raise ValueError(EMPTY_PROMPT_ERROR)
+    try:
+        return await _invoke(prompt, model, params)
+    except Exception as e:
+        logger.exception("Error invoking model", extra={
+            'service': 'bedrock-runtime', 'operation': 'InvokeModel', 'model': model, **aws_fields(e),
+        })
+        return ""
+
+
+@dataclass
+class StreamMetrics:
+    """
+    Timing of one ``stream_model`` call.
+
+    Attributes:
+        model (str): The model that was streamed.
+        started_at (float): ``time.perf_counter()`` when the request was issued.
+        first_token_at (float): When the first non-empty token arrived, if any.
+        ended_at (float): When the stream finished, if it has.
+        chunks (int): Non-empty text chunks yielded to the caller.
+        output_tokens (int): Output tokens reported by Bedrock, or ``chunks`` if none were.
+    """
+
+    model: str
+    started_at: float = 0.0
+    first_token_at: float | None = None
+    ended_at: float | None = None
+    chunks: int = 0
+    output_tokens: int | None = None
+
+    @property
+    def time_to_first_token(self) -> float | None:
+        """float: Seconds from request to first token."""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        """float: Output tokens per second after the first token arrived."""
+        if self.first_token_at is None or self.ended_at is None:
+            return None
+        tokens = self.output_tokens if self.output_tokens is not None else self.chunks
+        elapsed = self.ended_at - self.first_token_at
+        return tokens / elapsed if elapsed > 0 else None
+
+
+# Metrics for the most recent stream_model calls, oldest first.
+stream_metrics = deque(maxlen=1000)
+
+# Events stream_model's reader thread may run ahead of the consumer before it blocks.
+BEDROCK_STREAM_BUFFER = int(os.environ.get("BEDROCK_STREAM_BUFFER", "64"))
+
+_STREAM_END = object()
+STREAM_FORMAT_ERROR = "Unsupported stream format for model '{model}'"
+
+
+def _decode_stream_chunk(model: str, payload: dict) -> str:
+    """Extracts the text delta from one provider-specific stream chunk."""
+    provider = _provider(model)
+    if provider == 'anthropic':
+        if 'delta' in payload:
+            return payload['delta'].get('text', '')
+        return payload.get('completion', '')
+    if provider == 'ai21':
+        if 'choices' in payload:
+            return payload['choices'][0].get('delta', {}).get('content') or ''
+        data = payload['completions'][0]['data']
+        return data['text'] if isinstance(data, dict) else data
+    if provider == 'amazon':
+        return payload.get('outputText', '')
+    if provider == 'cohere':
+        return payload.get('text', '')
+    if provider == 'meta':
+        return payload.get('generation', '')
+    if provider == 'mistral':
+        return payload['outputs'][0]['text']
+    raise ValueError(STREAM_FORMAT_ERROR.format(model=model))
+
+
+async def stream_model(prompt: str, model: str = "anthropic.claude-v2", params: dict | None = None,
+                       metrics: StreamMetrics | None = None):
+    """
+    Streams the specified model's completion token by token.
+
+    Wraps ``invoke_model_with_response_stream``: the blocking event stream is
+    read on ``engine``'s thread pool and each decoded text delta is yielded as
+    soon as it arrives. The reader blocks once it is ``BEDROCK_STREAM_BUFFER``
+    events ahead of the consumer, so a slow consumer applies backpressure
+    instead of buffering the whole response. Timing for the call is written to ``metrics`` and
+    appended to ``stream_metrics``.
+
     Args:
         prompt (str): The input prompt for the model.
         model (str): The name of the model to use (default: "anthropic.claude-v2").
+        params (dict): Inference parameters merged into the request body.
+        metrics (StreamMetrics): Optional record to fill in with this call's timing.
+
+    Yields:
+        str: Text deltas in the order the model produced them.
+
+    Raises:
+        ValueError: If the model is not available.
+        botocore.exceptions.ClientError: If Bedrock rejects the request or fails mid-stream.
+    """
+    await _require_model(model)
+    body = json.dumps(_request_body(model, prompt, params))
+    if metrics is None:
+        metrics = StreamMetrics(model=model)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=BEDROCK_STREAM_BUFFER)
+    stop = threading.Event()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        try:
+            response = get_client('bedrock-runtime').invoke_model_with_response_stream(
+                body=body,
+                modelId=model,
+                accept='application/json',
+                contentType='application/json',
+            )
+            for event in response['body']:
+                if stop.is_set():
+                    break
+                put(event)
+        finally:
+            # Once stopped, nobody reads the queue, so a full one would block forever.
+            if not stop.is_set():
+                put(_STREAM_END)
+
+    metrics.started_at = time.perf_counter()
+    producer = asyncio.ensure_future(engine.run(produce, model=model))
+    try:
+        while (event := await queue.get()) is not _STREAM_END:
+            if 'chunk' not in event:
+                continue
+            payload = json.loads(event['chunk']['bytes'])
+            invocation_metrics = payload.get('amazon-bedrock-invocationMetrics')
+            if invocation_metrics:
+                metrics.output_tokens = invocation_metrics.get('outputTokenCount')
+            text = _decode_stream_chunk(model, payload)
+            if text:
+                if metrics.first_token_at is None:
+                    metrics.first_token_at = time.perf_counter()
+                metrics.chunks += 1
+                yield text
+        await producer
+    finally:
+        metrics.ended_at = time.perf_counter()
+        stream_metrics.append(metrics)
+        # Let the reader thread stop early if the caller abandoned the stream,
+        # unblocking a put that is waiting on a full queue.
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+        if not producer.done():
+            producer.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+
+# Default per-model budgets for invoke_many; override per call.
+BEDROCK_REQUESTS_PER_MINUTE = float(os.environ.get("BEDROCK_REQUESTS_PER_MINUTE", "500"))
+THROTTLING_ERRORS = frozenset({'ThrottlingException', 'TooManyRequestsException'})
+
+# Shared per-model limiters so concurrent batches against one model draw on
+# the same budget and see each other's throttling.
+rate_limiters = {}
+
+
+def rate_limiter(model: str, requests_per_minute: float = BEDROCK_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float | None = None) -> AdaptiveRateLimiter:
+    """
+    Returns the shared AdaptiveRateLimiter for ``model``, creating it on first use.
+
+    A budget different from the existing limiter's replaces its maximums, so
+    the latest caller's budget applies to every batch sharing the model.
+
+    Args:
+        model (str): The model ID the limiter applies to.
+        requests_per_minute (float): Maximum request rate.
+        tokens_per_minute (float): Maximum token rate, or None for no token budget.
 
     Returns:
-        str: The generated response from the model.
+        AdaptiveRateLimiter: The limiter shared by all batches for ``model``.
     """
+    limiter = rate_limiters.get(model)
+    if limiter is None:
+        limiter = rate_limiters[model] = AdaptiveRateLimiter(requests_per_minute, tokens_per_minute)
+    elif (limiter.max_requests_per_minute, limiter.max_tokens_per_minute) != (requests_per_minute, tokens_per_minute):
+        limiter.set_maximums(requests_per_minute, tokens_per_minute)
+    return limiter
+
+
+def estimate_tokens(prompt: str, params: dict | None = None) -> int:
+    """Roughly estimates the tokens a call consumes: ~4 characters per input token plus the output cap."""
+    params = params or {}
+    max_output = params.get('max_tokens', params.get('max_tokens_to_sample', 512))
+    return len(prompt) // 4 + max_output
+
+
+@dataclass
+class BatchResult:
+    """
+    Outcome of one prompt in an ``invoke_many`` batch.
+
+    Attributes:
+        index (int): Position of the prompt in the input.
+        prompt (str): The prompt that was sent.
+        output (str): The generated text, if the call succeeded.
+        error (Exception): The final error, if the call failed.
+        attempts (int): Calls made, including throttled retries.
+    """
+
+    index: int
+    prompt: str
+    output: str | None = None
+    error: Exception | None = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        """bool: True if the prompt produced an output."""
+        return self.error is None
+
+
+async def _invoke_with_backoff(index: int, prompt: str, model: str, params: dict | None,
+                               limiter: AdaptiveRateLimiter, max_attempts: int) -> BatchResult:
+    result = BatchResult(index=index, prompt=prompt)
+    tokens = estimate_tokens(prompt, params)
+    while True:
+        result.attempts += 1
+        await limiter.acquire_async(tokens)
+        try:
+            result.output = await _invoke(prompt, model, params)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLING_ERRORS:
+                result.error = e
+                return result
+            limiter.on_throttle()
+            logger.info("Throttled invoking %s, attempt %d", model, result.attempts, extra={
+                'service': 'bedrock-runtime', 'operation': 'InvokeModel', 'model': model,
+                'requests_per_minute': limiter.requests_per_minute, **aws_fields(e),
+            })
+            if result.attempts >= max_attempts:
+                result.error = e
+                return result
+            await asyncio.sleep(backoff_delay(result.attempts))
+        except Exception as e:
+            result.error = e
+            return result
+        else:
+            limiter.on_success()
+            return result
+
+
+async def iter_invoke_many(prompts, model: str = "anthropic.claude-v2", params: dict | None = None,
+                           requests_per_minute: float = BEDROCK_REQUESTS_PER_MINUTE,
+                           tokens_per_minute: float | None = None, max_in_flight: int | None = None,
+                           max_attempts: int = 6):
+    """
+    Invokes ``model`` for each prompt and yields results as they complete.
+
+    Prompts are scheduled through the model's shared AdaptiveRateLimiter, which
+    enforces the request and token budgets and halves them when Bedrock
+    throttles. Throttled calls are retried with jittered exponential backoff;
+    any other failure is reported on that prompt's result without stopping the
+    batch.
+
+    Args:
+        prompts (iterable): The prompts to send; consumed lazily.
+        model (str): The name of the model to use (default: "anthropic.claude-v2").
+        params (dict): Inference parameters merged into every request body.
+        requests_per_minute (float): Request budget for the model.
+        tokens_per_minute (float): Token budget for the model, or None for none.
+        max_in_flight (int): Prompts processed concurrently (default: the engine's per-model limit).
+        max_attempts (int): Calls per prompt before a throttle is reported as an error.
+
+    Yields:
+        BatchResult: One result per prompt, in completion order.
+    """
+    limiter = rate_limiter(model, requests_per_minute, tokens_per_minute)
+    pending = enumerate(prompts)
+    queue = asyncio.Queue()
+    done = object()
+
+    async def worker():
+        try:
+            for index, prompt in pending:
+                await queue.put(await _invoke_with_backoff(index, prompt, model, params, limiter, max_attempts))
+        finally:
+            await queue.put(done)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max_in_flight or engine.per_model_concurrency)]
     try:
-        available_models = await list_available_models()
-        model_ids = [m['modelId'] for m in available_models]
-        
-        if model not in model_ids:
-            raise ValueError(f"Model '{model}' is not available. Available models are: {', '.join(model_ids)}")
+        remaining = len(workers)
+        while remaining:
+            result = await queue.get()
+            if result is done:
+                remaining -= 1
+            else:
+                yield result
+        # Surface errors raised outside a call, e.g. by the prompts iterator.
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
 
-        # TODO: Implement the actual API call to Bedrock here
-        # This is still a placeholder
-        response = f"This is a placeholder response for the prompt: {prompt}"
-        return response
+async def invoke_many(prompts, model: str = "anthropic.claude-v2", params: dict | None = None,
+                      requests_per_minute: float = BEDROCK_REQUESTS_PER_MINUTE,
+                      tokens_per_minute: float | None = None, max_in_flight: int | None = None,
+                      max_attempts: int = 6) -> list:
+    """
+    Invokes ``model`` for each prompt and returns the results in input order.
+
+    See ``iter_invoke_many`` for scheduling, throttling and error handling.
+
+    Returns:
+        list: One BatchResult per prompt, ordered like ``prompts``.
+    """
+    results = [
+        result async for result in iter_invoke_many(
+            prompts, model, params, requests_per_minute, tokens_per_minute, max_in_flight, max_attempts,
+        )
+    ]
+    results.sort(key=lambda result: result.index)
+    return results
+
+
+# Batch inference: records per job (Bedrock's per-job cap is 50,000 by
+# default) and jobs running at once (the per-account in-progress quota).
+BEDROCK_BATCH_RECORDS_PER_JOB = int(os.environ.get("BEDROCK_BATCH_RECORDS_PER_JOB", "50000"))
+BEDROCK_BATCH_MAX_JOBS = int(os.environ.get("BEDROCK_BATCH_MAX_JOBS", "10"))
+BATCH_TERMINAL_STATUSES = frozenset({'Completed', 'PartiallyCompleted', 'Failed', 'Stopped', 'Expired'})
+# Lines read from an output file per thread-pool hop while streaming results.
+_BATCH_READ_LINES = 1000
+
+
+@dataclass
+class BatchInferenceResult:
+    """
+    Outcome of one record of a batch inference job.
+
+    Attributes:
+        record_id (str): The input record's ID.
+        output (str): The generated text, if the record succeeded.
+        error (str): Why the record produced no output, otherwise.
+        job_arn (str): The job that processed the record.
+    """
+
+    record_id: str
+    output: str | None = None
+    error: str | None = None
+    job_arn: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        """bool: True if the record produced an output."""
+        return self.error is None
+
+
+@dataclass
+class BatchJob:
+    """One shard of a batch inference run and the job processing it."""
+
+    name: str
+    input_key: str
+    output_prefix: str
+    record_ids: list
+    job_arn: str | None = None
+    status: str = 'Pending'
+    message: str | None = None
+
+
+def _batch_records(prompts, model: str, params: dict | None):
+    # Accepts bare prompts, numbered by position, or (record_id, prompt) pairs.
+    for index, item in enumerate(prompts):
+        record_id, prompt = item if isinstance(item, tuple) else (f"{index:011d}", item)
+        yield str(record_id), json.dumps({'recordId': str(record_id), 'modelInput': _request_body(model, prompt, params)})
+
+
+def _submit_shard(records, name: str, bucket: str, prefix: str, role_arn: str, model: str,
+                  limit: int, timeout_hours: int | None) -> BatchJob | None:
+    """Writes the next ``limit`` records to S3 and starts a job on them; None once records run out."""
+    record_ids = []
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+        for record_id, line in records:
+            record_ids.append(record_id)
+            f.write(line + "\n")
+            if len(record_ids) >= limit:
+                break
+    try:
+        if not record_ids:
+            return None
+        job = BatchJob(name=name, input_key=f"{prefix}/input/{name}.jsonl",
+                       output_prefix=f"{prefix}/output/", record_ids=record_ids)
+        if not s3_ops.upload_file(f.name, bucket, job.input_key):
+            job.status, job.message = 'Failed', f"Could not upload s3://{bucket}/{job.input_key}"
+            return job
+    finally:
+        os.unlink(f.name)
+    kwargs = {
+        'jobName': name,
+        'roleArn': role_arn,
+        'modelId': model,
+        'inputDataConfig': {'s3InputDataConfig': {'s3Uri': f"s3://{bucket}/{job.input_key}", 's3InputFormat': 'JSONL'}},
+        'outputDataConfig': {'s3OutputDataConfig': {'s3Uri': f"s3://{bucket}/{job.output_prefix}"}},
+    }
+    if timeout_hours is not None:
+        kwargs['timeoutDurationInHours'] = timeout_hours
+    try:
+        job.job_arn = get_client('bedrock').create_model_invocation_job(**kwargs)['jobArn']
+    except ClientError as e:
+        logger.exception("Error creating batch job %s", name, extra={
+            'service': 'bedrock', 'operation': 'CreateModelInvocationJob', 'model': model, **aws_fields(e),
+        })
+        job.status, job.message = 'Failed', str(e)
+        return job
+    job.status = 'Submitted'
+    logger.info("Submitted batch job %s with %d records", name, len(record_ids), extra={
+        'service': 'bedrock', 'operation': 'CreateModelInvocationJob', 'model': model, 'job_arn': job.job_arn,
+    })
+    return job
+
+
+def _batch_statuses(run_name: str) -> dict:
+    """Returns {job name: summary} for every job of a run, in one paginated listing."""
+    paginator = get_client('bedrock').get_paginator('list_model_invocation_jobs')
+    return {
+        summary['jobName']: summary
+        for page in paginator.paginate(nameContains=run_name)
+        for summary in page.get('invocationJobSummaries', ())
+    }
+
+
+def _batch_output_keys(bucket: str, job: BatchJob) -> list:
+    # Bedrock writes <input file name>.out under a folder named after the job ID.
+    folder = f"{job.output_prefix}{job.job_arn.rsplit('/', 1)[-1]}/"
+    return sorted(key for key in s3_ops.list_object_index(bucket, folder) if key.endswith('.jsonl.out'))
+
+
+def _read_some(lines, n: int) -> list:
+    return [line for _, line in zip(range(n), lines, strict=False)]
+
+
+async def _batch_results(bucket: str, job: BatchJob, model: str):
+    pending = set(job.record_ids)
+    if job.status in ('Completed', 'PartiallyCompleted'):
+        for key in await engine.run(_batch_output_keys, bucket, job):
+            lines = s3_ops.iter_lines(bucket, key)
+            try:
+                while chunk := await engine.run(_read_some, lines, _BATCH_READ_LINES):
+                    for line in chunk:
+                        record = json.loads(line)
+                        record_id = record.get('recordId')
+                        pending.discard(record_id)
+                        if 'modelOutput' in record:
+                            try:
+                                output = _parse_response(model, record['modelOutput'])
+                            except (KeyError, IndexError, ValueError) as e:
+                                yield BatchInferenceResult(record_id, error=f"Unparseable output: {e}", job_arn=job.job_arn)
+                            else:
+                                yield BatchInferenceResult(record_id, output=output, job_arn=job.job_arn)
+                        else:
+                            error = record.get('error') or {}
+                            message = error.get('errorMessage', 'No output') if isinstance(error, dict) else str(error)
+                            yield BatchInferenceResult(record_id, error=message, job_arn=job.job_arn)
+            finally:
+                lines.close()
+    if job.status in ('Completed', 'PartiallyCompleted'):
+        reason = "No output record"
+    else:
+        reason = job.message or f"Job ended {job.status}"
+    for record_id in job.record_ids:
+        if record_id in pending:
+            yield BatchInferenceResult(record_id, error=reason, job_arn=job.job_arn)
+
+
+async def iter_batch_inference(prompts, bucket: str, role_arn: str, model: str = "anthropic.claude-v2",
+                               params: dict | None = None, prefix: str = "batch-inference",
+                               run_name: str | None = None,
+                               records_per_job: int = BEDROCK_BATCH_RECORDS_PER_JOB,
+                               max_jobs: int = BEDROCK_BATCH_MAX_JOBS, poll_interval: float = 30.0,
+                               max_poll_interval: float = 300.0, timeout_hours: int | None = None):
+    """
+    Runs ``prompts`` through Bedrock batch inference and yields the results.
+
+    Prompts are turned into ``modelInput`` records in one streaming pass and
+    split into shards of ``records_per_job``. Each shard is written to a
+    temporary JSONL file, uploaded to ``bucket`` and submitted as its own
+    model invocation job, with up to ``max_jobs`` jobs running at once; the
+    next shard is only built when a job slot frees up, so memory holds record
+    IDs rather than prompts. Running jobs are checked with one
+    ``list_model_invocation_jobs`` call per poll; the interval doubles (with
+    jitter) while nothing finishes, up to ``max_poll_interval``. As each job
+    ends, its output files are streamed back from S3 line by line.
+
+    Bedrock requires a minimum number of records per job (100 by default),
+    so keep ``records_per_job`` above it.
+
+    Args:
+        prompts (iterable): Prompts, or (record_id, prompt) pairs; consumed lazily.
+            Bare prompts get their zero-padded position as record ID.
+        bucket (str): Bucket for the input and output files.
+        role_arn (str): Service role Bedrock assumes to read and write ``bucket``.
+        model (str): The name of the model to use (default: "anthropic.claude-v2").
+        params (dict): Inference parameters merged into every record.
+        prefix (str): Key prefix; files go under ``<prefix>/<run_name>/``.
+        run_name (str): Name shared by the run's jobs (default: generated).
+        records_per_job (int): Records per shard and job.
+        max_jobs (int): Jobs submitted or running at once.
+        poll_interval (float): Initial seconds between status checks.
+        max_poll_interval (float): Upper bound on the seconds between status checks.
+        timeout_hours (int): Bedrock-side timeout per job, or None for the service default.
+
+    Yields:
+        BatchInferenceResult: One result per record, grouped by job in completion order.
+    """
+    run_name = run_name or f"batch-{uuid.uuid4().hex[:12]}"
+    records = _batch_records(prompts, model, params)
+    running = {}
+    shard = 0
+    exhausted = False
+    interval = poll_interval
+    while True:
+        while not exhausted and len(running) < max_jobs:
+            name = f"{run_name}-{shard:05d}"
+            job = await engine.run(_submit_shard, records, name, bucket, f"{prefix}/{run_name}",
+                                   role_arn, model, records_per_job, timeout_hours)
+            if job is None:
+                exhausted = True
+            elif job.job_arn is None:
+                async for result in _batch_results(bucket, job, model):
+                    yield result
+            else:
+                running[name] = job
+            shard += 1
+        if not running:
+            return
+        await asyncio.sleep(interval * random.uniform(0.8, 1.2))  # noqa: S311
+        try:
+            statuses = await engine.run(_batch_statuses, run_name)
+        except ClientError as e:
+            logger.warning("Error polling batch jobs of %s: %s", run_name, e, extra={
+                'service': 'bedrock', 'operation': 'ListModelInvocationJobs', **aws_fields(e),
+            })
+            statuses = {}
+        finished = []
+        for name, job in running.items():
+            summary = statuses.get(name)
+            if summary is None:
+                continue
+            job.status, job.message = summary['status'], summary.get('message')
+            if job.status in BATCH_TERMINAL_STATUSES:
+                finished.append(job)
+        interval = poll_interval if finished else min(max_poll_interval, interval * 2)
+        for job in finished:
+            del running[job.name]
+            logger.info("Batch job %s ended %s", job.name, job.status, extra={
+                'service': 'bedrock', 'operation': 'GetModelInvocationJob', 'model': model,
+                'job_arn': job.job_arn, 'status': job.status,
+            })
+            async for result in _batch_results(bucket, job, model):
+                yield result
+
+
+# Texts per embedding request: Cohere accepts up to 96 per call, Titan one.
+EMBED_BATCH_SIZES = {'cohere': 96}
+EMBEDDING_MODEL_ERROR = "Unsupported embedding model '{model}'"
+
+
+def _embedding_body(model: str, texts: list, params: dict | None = None) -> dict:
+    """Builds the provider-specific embedding request body for ``texts``."""
+    provider = _provider(model)
+    if provider == 'cohere':
+        body = {'texts': texts, 'input_type': 'search_document'}
+    elif provider == 'amazon':
+        body = {'inputText': texts[0]}
+    else:
+        raise ValueError(EMBEDDING_MODEL_ERROR.format(model=model))
+    if params:
+        body.update(params)
+    return body
+
+
+def _parse_embeddings(model: str, payload: dict) -> list:
+    """Extracts the embedding vectors from a provider-specific response body."""
+    if 'embedding' in payload:
+        return [payload['embedding']]
+    embeddings = payload['embeddings']
+    # Cohere returns {'float': [...]} when embedding_types is requested.
+    return embeddings['float'] if isinstance(embeddings, dict) else embeddings
+
+
+async def _embed_batch(model: str, texts: list, params: dict | None,
+                       limiter: AdaptiveRateLimiter, max_attempts: int) -> list:
+    body = json.dumps(_embedding_body(model, texts, params))
+    attempt = 0
+    while True:
+        attempt += 1
+        await limiter.acquire_async(sum(len(text) for text in texts) // 4)
+        try:
+            payload = await engine.run(_invoke_sync, model, body, model=model)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLING_ERRORS or attempt >= max_attempts:
+                raise
+            limiter.on_throttle()
+            await asyncio.sleep(backoff_delay(attempt))
+        else:
+            limiter.on_success()
+            return _parse_embeddings(model, payload)
+
+
+EMBED_BATCH_SIZE_ERROR = "batch_size must be between 1 and {limit} for '{model}'"
+EMBED_COUNT_ERROR = "{model} returned {returned} embeddings for {expected} texts"
+
+
+async def embed_texts(texts, model: str = "amazon.titan-embed-text-v2:0", params: dict | None = None,
+                      path: str | None = None, batch_size: int | None = None, normalize: bool = False,
+                      requests_per_minute: float = BEDROCK_REQUESTS_PER_MINUTE,
+                      max_in_flight: int | None = None, max_attempts: int = 6):
+    """
+    Embeds ``texts`` into one contiguous float32 matrix.
+
+    Texts are grouped into requests of the model's batch size (96 for Cohere,
+    1 for Titan) and sent concurrently through the model's shared rate
+    limiter, retrying throttled requests with backoff. Each response is
+    written straight into its rows of the output, which is allocated when
+    the first response reveals the dimension. With ``path`` the output is a
+    ``.npy`` file opened as a memory map, so it can be larger than RAM and
+    reloaded with ``np.load(path, mmap_mode='r')``.
+
+    Args:
+        texts (sequence): The texts to embed.
+        model (str): A Titan or Cohere embedding model (default: "amazon.titan-embed-text-v2:0").
+        params (dict): Extra request fields, e.g. {'dimensions': 256} for Titan v2.
+        path (str): Write the vectors to this ``.npy`` file instead of memory.
+        batch_size (int): Texts per request, at most the model's maximum (the default).
+        normalize (bool): Scale each vector to unit length, as cosine search expects.
+        requests_per_minute (float): Request budget for the model.
+        max_in_flight (int): Requests in flight at once (default: the engine's per-model limit).
+        max_attempts (int): Calls per request before a throttle is raised.
+
+    Returns:
+        np.ndarray: An ``(len(texts), dim)`` float32 array (a memmap with ``path``), in input order;
+            ``(0, 0)`` when ``texts`` is empty.
+
+    Raises:
+        ValueError: If ``batch_size`` exceeds what the model accepts per request.
+        RuntimeError: If a response does not hold one vector per text.
+        ClientError: If a request fails, or is still throttled after ``max_attempts``.
+    """
+    import numpy as np
+
+    texts = list(texts)
+    limit = EMBED_BATCH_SIZES.get(_provider(model), 1)
+    if batch_size is not None and not 0 < batch_size <= limit:
+        raise ValueError(EMBED_BATCH_SIZE_ERROR.format(limit=limit, model=model))
+    size = batch_size or limit
+    batches = iter(range(0, len(texts), size))
+    limiter = rate_limiter(model, requests_per_minute)
+    out = None
+
+    def store(start: int, vectors: list):
+        nonlocal out
+        block = np.asarray(vectors, dtype=np.float32)
+        expected = min(size, len(texts) - start)
+        if len(block) != expected:
+            raise RuntimeError(EMBED_COUNT_ERROR.format(model=model, returned=len(block), expected=expected))
+        if out is None:
+            shape = (len(texts), block.shape[1])
+            out = np.empty(shape, dtype=np.float32) if path is None else \
+                np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=shape)
+        if normalize:
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            block /= np.where(norms == 0, 1.0, norms)
+        out[start:start + len(block)] = block
+
+    async def worker():
+        for start in batches:
+            store(start, await _embed_batch(model, texts[start:start + size], params, limiter, max_attempts))
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max_in_flight or engine.per_model_concurrency)]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    if out is None:
+        if path is None:
+            return np.empty((0, 0), dtype=np.float32)
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(0, 0))
+    if path is not None:
+        out.flush()
+    return out
+
+
+# Errors after which a request is retried in the next region, and then on
+# the model's fallback; anything else (e.g. a validation error) is raised.
+FAILOVER_ERRORS = THROTTLING_ERRORS | {
+    'ServiceUnavailableException', 'ModelNotReadyException', 'ModelTimeoutException', 'InternalServerException',
+}
+
+
+def _should_failover(error: Exception) -> bool:
+    if isinstance(error, ClientError):
+        return error.response['Error']['Code'] in FAILOVER_ERRORS
+    # Connection errors and read timeouts.
+    return isinstance(error, BotoCoreError)
+
+
+class RegionStats:
+    """
+    Exponentially weighted latency and error rate of one model in one region.
+
+    Attributes:
+        latency (float): EWMA of successful call latency in seconds, None before the first success.
+        error_rate (float): EWMA of the failure indicator, between 0 and 1.
+        samples (deque): The most recent successful latencies, for percentile deadlines.
+    """
+
+    __slots__ = ('latency', 'error_rate', 'samples')
+
+    def __init__(self, window: int):
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = deque(maxlen=window)
+
+
+NO_REGIONS_ERROR = "RegionRouter needs at least one region"
+
+
+class RegionRouter:
+    """
+    Sends each invocation to the region currently serving a model best.
+
+    Every call updates the (region, model) latency and error-rate EWMAs, and
+    regions are tried in order of ``latency * (1 + error_penalty * error_rate)``.
+    Regions without data rank first so each is measured, and with probability
+    ``explore`` a random region is moved to the front to notice recoveries.
+
+    If the first request has not answered by the ``hedge_percentile`` of its
+    region's recent latencies, a duplicate goes to the next-best region.
+    Whichever answers first wins and the other is cancelled; the loser's
+    thread still finishes, feeds its latency into the stats and holds its
+    engine slot until then. A throttle,
+    timeout or 5xx moves on to the next region at once. When every region
+    has failed, the model's entry in ``fallbacks`` is tried the same way.
+
+    Args:
+        regions (list): Regions to route across.
+        fallbacks (dict): Maps a model ID to the model ID used when it fails everywhere.
+        alpha (float): EWMA weight of the newest observation.
+        window (int): Recent latencies kept per region and model.
+        hedge_percentile (float): Percentile (0-100) of recent latency after which to hedge.
+        min_hedge_delay (float): Lower bound on the hedge deadline in seconds.
+        initial_hedge_delay (float): Hedge deadline before a region has ``min_samples`` latencies.
+        min_samples (int): Latencies needed before the percentile deadline is used.
+        error_penalty (float): Weight of the error rate in a region's score.
+        explore (float): Probability of trying a random region first.
+        profile (str): Registry profile whose regional clients are used.
+        rng (random.Random): Random source for exploration, injectable for tests.
+
+    Raises:
+        ValueError: If ``regions`` is empty.
+    """
+
+    def __init__(self, regions, fallbacks: dict | None = None, alpha: float = 0.2, window: int = 200,
+                 hedge_percentile: float = 95.0, min_hedge_delay: float = 0.05,
+                 initial_hedge_delay: float = 2.0, min_samples: int = 10, error_penalty: float = 4.0,
+                 explore: float = 0.02, profile: str | None = None, rng: random.Random | None = None):
+        self.regions = list(regions)
+        if not self.regions:
+            raise ValueError(NO_REGIONS_ERROR)
+        self.fallbacks = dict(fallbacks or {})
+        self.alpha = alpha
+        self.window = window
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_samples = min_samples
+        self.error_penalty = error_penalty
+        self.explore = explore
+        self.profile = profile
+        self._rng = rng or random.Random()  # noqa: S311
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def _region_stats(self, region: str, model: str) -> RegionStats:
+        stats = self._stats.get((region, model))
+        if stats is None:
+            stats = self._stats[(region, model)] = RegionStats(self.window)
+        return stats
+
+    def record(self, region: str, model: str, latency: float | None) -> None:
+        """
+        Updates the stats of ``model`` in ``region`` with one call.
+
+        Args:
+            region (str): The region called.
+            model (str): The model invoked.
+            latency (float): Seconds the call took, or None if it failed.
+        """
+        with self._lock:
+            stats = self._region_stats(region, model)
+            failed = latency is None
+            stats.error_rate += self.alpha * (failed - stats.error_rate)
+            if not failed:
+                stats.latency = latency if stats.latency is None else stats.latency + self.alpha * (latency - stats.latency)
+                stats.samples.append(latency)
+
+    def score(self, region: str, model: str) -> float:
+        """Returns the region's expected cost for ``model``: lower is better, 0 if untried, inf if never successful."""
+        stats = self._stats.get((region, model))
+        if stats is None:
+            return 0.0
+        if stats.latency is None:
+            return float('inf')
+        return stats.latency * (1 + self.error_penalty * stats.error_rate)
+
+    def rank(self, model: str) -> list:
+        """Returns the regions in the order they should be tried for ``model``."""
+        with self._lock:
+            ranked = sorted(self.regions, key=lambda region: self.score(region, model))
+        if len(ranked) > 1 and self._rng.random() < self.explore:
+            ranked.insert(0, ranked.pop(self._rng.randrange(1, len(ranked))))
+        return ranked
+
+    def hedge_delay(self, region: str, model: str) -> float:
+        """Returns how long to wait on ``region`` before hedging to the next region."""
+        with self._lock:
+            stats = self._stats.get((region, model))
+            samples = sorted(stats.samples) if stats is not None else ()
+        if len(samples) < self.min_samples:
+            return self.initial_hedge_delay
+        rank = min(len(samples) - 1, int(self.hedge_percentile / 100 * len(samples)))
+        return max(self.min_hedge_delay, samples[rank])
+
+    def _call(self, region: str, model: str, body: str) -> dict:
+        # Runs on the engine's threads and records even if the caller has moved on.
+        start = time.perf_counter()
+        try:
+            payload = _invoke_sync(model, body, region)
+        except Exception:
+            self.record(region, model, None)
+            raise
+        self.record(region, model, time.perf_counter() - start)
+        return payload
+
+    async def _invoke_hedged(self, model: str, body: str) -> dict:
+        untried = deque(self.rank(model))
+        pending = {}
+
+        def launch():
+            region = untried.popleft()
+            task = asyncio.ensure_future(engine.run(self._call, region, model, body, model=model))
+            pending[task] = region
+            return region
+
+        first = launch()
+        delay = self.hedge_delay(first, model)
+        hedged = False
+        error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The request passed its deadline: race a duplicate in the next region.
+                    if untried:
+                        launch()
+                        hedged = True
+                        self.hedges += 1
+                    delay = None
+                    continue
+                for task in done:
+                    region = pending.pop(task)
+                    if task.exception() is None:
+                        self.hedge_wins += hedged and region != first
+                        return task.result()
+                    error = task.exception()
+                    if not _should_failover(error):
+                        raise error
+                if not pending and untried:
+                    region = launch()
+                    delay = None if hedged else self.hedge_delay(region, model)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def invoke(self, prompt: str, model: str, params: dict | None = None) -> str:
+        """
+        Invokes ``model`` through the best region, hedging and failing over as needed.
+
+        Args:
+            prompt (str): The input prompt for the model.
+            model (str): The model ID to invoke first.
+            params (dict): Inference parameters merged into the request body.
+
+        Returns:
+            str: The generated text, from ``model`` or a fallback.
+
+        Raises:
+            Exception: The last error once every region and fallback has failed.
+        """
+        tried = set()
+        while True:
+            body = json.dumps(_request_body(model, prompt, params))
+            try:
+                return _parse_response(model, await self._invoke_hedged(model, body))
+            except Exception as e:
+                tried.add(model)
+                fallback = self.fallbacks.get(model)
+                if fallback is None or fallback in tried or not _should_failover(e):
+                    raise
+                logger.warning("Failing over from %s to %s: %s", model, fallback, e, extra={
+                    'service': 'bedrock-runtime', 'operation': 'InvokeModel', 'model': model,
+                    'fallback': fallback, **aws_fields(e),
+                })
+                self.failovers += 1
+                model = fallback
+
+    def stats(self) -> dict:
+        """Returns {(region, model): {'latency_ms', 'error_rate', 'samples'}} plus hedge and failover counts."""
+        with self._lock:
+            regions = {
+                key: {
+                    'latency_ms': None if s.latency is None else round(s.latency * 1000, 3),
+                    'error_rate': round(s.error_rate, 4),
+                    'samples': len(s.samples),
+                }
+                for key, s in self._stats.items()
+            }
+        return {'regions': regions, 'hedges': self.hedges, 'hedge_wins': self.hedge_wins, 'failovers': self.failovers}
+
+
+def enable_region_routing(regions, **kwargs) -> RegionRouter:
+    """
+    Routes ``invoke_model`` (and everything built on it) across ``regions``.
+
+    Args:
+        regions (list): Regions to route across, e.g. ['us-east-1', 'us-west-2'].
+        **kwargs: Hedging, scoring and fallback settings passed to ``RegionRouter``.
+
+    Returns:
+        RegionRouter: The installed router, whose ``stats()`` reports per-region EWMAs.
+    """
+    global region_router
+    region_router = RegionRouter(regions, **kwargs)
+    return region_router
+
+
+def disable_region_routing() -> None:
+    """Sends ``invoke_model`` to the default region again."""
+    global region_router
+    region_router = None
+
+
+# Model ID prefixes (after any cross-region geography) that accept Converse
+# cache points; other models reject requests containing them.
+PROMPT_CACHE_MODELS = (
+    'anthropic.claude-3-5-haiku', 'anthropic.claude-3-7-sonnet', 'anthropic.claude-sonnet-4',
+    'anthropic.claude-opus-4', 'amazon.nova-micro', 'amazon.nova-lite', 'amazon.nova-pro',
+)
+_CACHE_POINT = {'cachePoint': {'type': 'default'}}
+# Legacy body parameters and their Converse inferenceConfig names.
+_INFERENCE_CONFIG_KEYS = {
+    'max_tokens': 'maxTokens', 'max_tokens_to_sample': 'maxTokens', 'maxTokenCount': 'maxTokens',
+    'temperature': 'temperature', 'top_p': 'topP', 'topP': 'topP',
+    'stop_sequences': 'stopSequences', 'stopSequences': 'stopSequences',
+}
+
+
+def supports_prompt_cache(model: str) -> bool:
+    """Returns True if ``model`` accepts Converse cache points."""
+    parts = model.split('.')
+    if len(parts) > 2 and len(parts[0]) == 2:
+        model = '.'.join(parts[1:])
+    return model.startswith(PROMPT_CACHE_MODELS)
+
+
+def _accepts_cache_points(client) -> bool:
+    # botocore validates requests before sending them, and releases that
+    # predate prompt caching reject cachePoint blocks.
+    meta = getattr(client, 'meta', None)
+    if meta is None:
+        return True
+    return 'cachePoint' in meta.service_model.shape_for('SystemContentBlock').members
+
+
+@dataclass
+class ConverseResult:
+    """
+    Text and token accounting of one Converse call.
+
+    Attributes:
+        text (str): The generated text.
+        stop_reason (str): Why generation stopped, e.g. "end_turn" or "max_tokens".
+        input_tokens (int): Input tokens processed at full price.
+        output_tokens (int): Tokens generated.
+        cache_read_tokens (int): Input tokens served from the prompt cache.
+        cache_write_tokens (int): Input tokens written to the prompt cache.
+        latency_ms (int): Model latency reported by Bedrock.
+    """
+
+    text: str
+    stop_reason: str | None = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    latency_ms: int | None = None
+
+
+@dataclass
+class TokenUsage:
+    """Running token totals over many Converse calls."""
+
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    latency_ms: int = 0
+
+    def add(self, result: ConverseResult) -> None:
+        """Adds one call's token counts and latency to the totals."""
+        self.calls += 1
+        self.input_tokens += result.input_tokens
+        self.output_tokens += result.output_tokens
+        self.cache_read_tokens += result.cache_read_tokens
+        self.cache_write_tokens += result.cache_write_tokens
+        self.latency_ms += result.latency_ms or 0
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        """float: Share of all input tokens that were read from the prompt cache."""
+        total = self.input_tokens + self.cache_read_tokens + self.cache_write_tokens
+        return self.cache_read_tokens / total if total else 0.0
+
+
+class ConverseTemplate:
+    """
+    A Converse request prepared once and reused for many prompts.
+
+    The system prompt, shared context (for example RAG documents) and
+    inference settings are converted to Converse blocks when the template is
+    built. Each call only adds the user's prompt. On models that support
+    prompt caching, a cache point follows the system prompt and another follows
+    the shared context, so Bedrock reuses that prefix instead of reprocessing
+    it. Token counts of every call accumulate in ``usage``.
+
+    Args:
+        model (str): The model ID.
+        system (str): System prompt.
+        context (str): Text sent ahead of every prompt in the user turn.
+        params (dict): Inference parameters, legacy names (max_tokens, top_p, ...)
+            or Converse names; anything else goes to additionalModelRequestFields.
+        cache (bool): Insert cache points where the model supports them.
+    """
+
+    def __init__(self, model: str, system: str | None = None, context: str | None = None,
+                 params: dict | None = None, cache: bool = True):
+        self.model = model
+        self.cache = cache and supports_prompt_cache(model)
+        self.usage = TokenUsage()
+        inference, additional = {}, {}
+        for key, value in (params or {}).items():
+            if key in _INFERENCE_CONFIG_KEYS:
+                inference[_INFERENCE_CONFIG_KEYS[key]] = value
+            else:
+                additional[key] = value
+        base = {'modelId': model}
+        if inference:
+            base['inferenceConfig'] = inference
+        if additional:
+            base['additionalModelRequestFields'] = additional
+        self._plain = dict(base)
+        self._cached = dict(base)
+        self._plain_prefix = self._cached_prefix = ()
+        if system:
+            self._plain['system'] = [{'text': system}]
+            self._cached['system'] = [{'text': system}, _CACHE_POINT] if self.cache else self._plain['system']
+        if context:
+            self._plain_prefix = ({'text': context},)
+            self._cached_prefix = ({'text': context}, _CACHE_POINT) if self.cache else self._plain_prefix
+
+    def request(self, prompt: str, cache_points: bool = True) -> dict:
+        """Returns the Converse arguments for ``prompt``; the prepared parts are shared, not copied."""
+        base, prefix = (self._cached, self._cached_prefix) if cache_points else (self._plain, self._plain_prefix)
+        return {**base, 'messages': [{'role': 'user', 'content': [*prefix, {'text': prompt}]}]}
+
+
+# Token totals over every converse call.
+converse_usage = TokenUsage()
+
+
+def _converse_sync(template: ConverseTemplate, prompt: str) -> dict:
+    client = get_client('bedrock-runtime')
+    cache_points = template.cache and _accepts_cache_points(client)
+    return client.converse(**template.request(prompt, cache_points))
+
+
+async def converse(prompt: str, model: str = "anthropic.claude-3-5-haiku-20241022-v1:0",
+                   params: dict | None = None, template: ConverseTemplate | None = None) -> ConverseResult:
+    """
+    Invokes a model through the Converse API and reports its token usage.
+
+    Converse takes one request shape for every provider, so no per-provider
+    body is built. The response is already parsed by botocore, so the text
+    and usage are read from it directly. Pass a ``template`` to reuse a
+    system prompt and shared context; on supported models that prefix is then
+    cached by Bedrock, which shows up as ``cache_read_tokens``.
+
+    Args:
+        prompt (str): The user prompt.
+        model (str): Model ID, used when no template is given.
+        params (dict): Inference parameters, used when no template is given.
+        template (ConverseTemplate): Prepared model, system prompt, context and parameters.
+
+    Returns:
+        ConverseResult: The text, stop reason and token counts.
+
+    Raises:
+        ClientError: If Bedrock rejects or fails the request.
+    """
+    template = template or ConverseTemplate(model, params=params)
+    response = await engine.run(_converse_sync, template, prompt, model=template.model)
+    usage = response.get('usage', {})
+    content = response['output']['message']['content']
+    result = ConverseResult(
+        # Non-text blocks (toolUse, image, reasoningContent) contribute no text.
+        text=''.join(block.get('text', '') for block in content),
+        stop_reason=response.get('stopReason'),
+        input_tokens=usage.get('inputTokens', 0),
+        output_tokens=usage.get('outputTokens', 0),
+        cache_read_tokens=usage.get('cacheReadInputTokens', 0),
+        cache_write_tokens=usage.get('cacheWriteInputTokens', 0),
+        latency_ms=response.get('metrics', {}).get('latencyMs'),
+    )
+    template.usage.add(result)
+    converse_usage.add(result)
+    return result
+
+
+# Image generation: requests per minute for image models (on-demand quotas are
+# far below text models') and threads decoding base64 payloads.
+BEDROCK_IMAGES_PER_MINUTE = float(os.environ.get("BEDROCK_IMAGES_PER_MINUTE", "60"))
+BEDROCK_IMAGE_DECODE_WORKERS = int(os.environ.get("BEDROCK_IMAGE_DECODE_WORKERS", str(os.cpu_count() or 4)))
+
+# Leading bytes of the formats image models return, with their content type and extension.
+_IMAGE_FORMATS = (
+    (b'\x89PNG', 'image/png', 'png'),
+    (b'\xff\xd8', 'image/jpeg', 'jpg'),
+    (b'RIFF', 'image/webp', 'webp'),
+)
+
+
+IMAGE_MODEL_ERROR = "Unsupported image model '{model}'"
+
+
+def _image_body(model: str, prompt: str, params: dict | None = None) -> dict:
+    """Builds the provider-specific text-to-image request body for ``prompt``."""
+    params = params or {}
+    if model.startswith(('amazon.titan-image', 'amazon.nova-canvas')):
+        return {
+            'taskType': 'TEXT_IMAGE',
+            'textToImageParams': {'text': prompt},
+            'imageGenerationConfig': params,
+        }
+    if 'stable-diffusion-xl' in model:
+        return {'text_prompts': [{'text': prompt}], **params}
+    if model.startswith('stability.'):
+        return {'prompt': prompt, **params}
+    raise ValueError(IMAGE_MODEL_ERROR.format(model=model))
+
+
+def _image_payloads(model: str, payload: dict) -> list:
+    """
+    Extracts the base64 images from a provider-specific response body.
+
+    Raises:
+        RuntimeError: If the model returned an error or filtered every image.
+    """
+    if 'artifacts' in payload:
+        images = [a['base64'] for a in payload['artifacts'] if a.get('finishReason', 'SUCCESS') == 'SUCCESS']
+    else:
+        reasons = payload.get('finish_reasons') or [None] * len(payload.get('images', ()))
+        images = [image for image, reason in zip(payload.get('images', ()), reasons, strict=True) if reason is None]
+    if not images:
+        raise RuntimeError(payload.get('error') or f"{model} returned no images")
+    return images
+
+
+def _decode_image(data: str) -> tuple:
+    """Decodes one base64 image; returns (bytes, content type, extension)."""
+    image = base64.b64decode(data)
+    for magic, content_type, extension in _IMAGE_FORMATS:
+        if image.startswith(magic):
+            return image, content_type, extension
+    return image, 'application/octet-stream', 'bin'
+
+
+def peak_rss() -> int | None:
+    """Returns the process's peak resident set size in bytes, or None where it is unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@dataclass
+class ImageResult:
+    """
+    Outcome of one prompt in a ``generate_images`` run.
+
+    Attributes:
+        index (int): Position of the prompt in the input.
+        prompt (str): The prompt that was sent.
+        keys (list): S3 keys of the uploaded images.
+        error (Exception): The final error, if generation or an upload failed.
+        attempts (int): Calls made, including throttled retries.
+        bytes (int): Decoded image bytes uploaded.
+    """
+
+    index: int
+    prompt: str
+    keys: list = field(default_factory=list)
+    error: Exception | None = None
+    attempts: int = 0
+    bytes: int = 0
+
+    @property
+    def ok(self) -> bool:
+        """bool: True if every image of the prompt was uploaded."""
+        return self.error is None
+
+
+@dataclass
+class ImageMetrics:
+    """
+    Throughput and memory of one ``generate_images`` run.
+
+    Attributes:
+        model (str): The image model used.
+        prompts (int): Prompts finished, successfully or not.
+        images (int): Images uploaded.
+        failed (int): Prompts that ended with an error.
+        bytes (int): Decoded image bytes uploaded.
+        started_at (float): ``time.perf_counter()`` when the run started.
+        ended_at (float): When the run finished, if it has.
+        peak_rss_bytes (int): The process's peak RSS when the run finished.
+        rss_growth_bytes (int): How far the run raised the process's peak RSS.
+    """
+
+    model: str
+    prompts: int = 0
+    images: int = 0
+    failed: int = 0
+    bytes: int = 0
+    started_at: float = 0.0
+    ended_at: float | None = None
+    peak_rss_bytes: int | None = None
+    rss_growth_bytes: int | None = None
+
+    @property
+    def seconds(self) -> float:
+        """float: Duration of the run so far."""
+        return (self.ended_at or time.perf_counter()) - self.started_at
+
+    @property
+    def images_per_minute(self) -> float:
+        """float: Images uploaded per minute of the run."""
+        return self.images * 60 / self.seconds if self.seconds > 0 else 0.0
+
+
+async def _generate_image(index: int, prompt: str, model: str, params: dict | None, bucket: str, prefix: str,
+                          limiter: AdaptiveRateLimiter, decoder: ThreadPoolExecutor,
+                          max_attempts: int) -> ImageResult:
+    result = ImageResult(index=index, prompt=prompt)
+    body = json.dumps(_image_body(model, prompt, params))
+    loop = asyncio.get_running_loop()
+    while True:
+        result.attempts += 1
+        await limiter.acquire_async()
+        try:
+            payload = await engine.run(_invoke_sync, model, body, model=model)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLING_ERRORS:
+                result.error = e
+                return result
+            limiter.on_throttle()
+            logger.info("Throttled generating images with %s, attempt %d", model, result.attempts, extra={
+                'service': 'bedrock-runtime', 'operation': 'InvokeModel', 'model': model,
+                'requests_per_minute': limiter.requests_per_minute, **aws_fields(e),
+            })
+            if result.attempts >= max_attempts:
+                result.error = e
+                return result
+            await asyncio.sleep(backoff_delay(result.attempts))
+        except Exception as e:
+            result.error = e
+            return result
+        else:
+            limiter.on_success()
+            break
+    try:
+        images = _image_payloads(model, payload)
+        del payload
+        for n, data in enumerate(images):
+            image, content_type, extension = await loop.run_in_executor(decoder, _decode_image, data)
+            images[n] = None
+            key = f"{prefix}{index:06d}-{n}.{extension}"
+            uploaded = await engine.run(s3_ops.upload_fileobj, io.BytesIO(image), bucket, key,
+                                        {'ContentType': content_type})
+            if not uploaded:
+                result.error = RuntimeError(f"Upload of s3://{bucket}/{key} failed")
+                return result
+            result.keys.append(key)
+            result.bytes += len(image)
     except Exception as e:
-        print(f"Error invoking model: {str(e)}")
-        return ""
\ No newline at end of file
+        result.error = e
+    return result
+
+
+async def iter_generate_images(prompts, bucket: str, prefix: str = 'images/',
+                               model: str = "stability.stable-diffusion-xl-v1", params: dict | None = None,
+                               requests_per_minute: float = BEDROCK_IMAGES_PER_MINUTE,
+                               max_in_flight: int | None = None,
+                               decode_workers: int = BEDROCK_IMAGE_DECODE_WORKERS,
+                               max_attempts: int = 6, metrics: ImageMetrics | None = None):
+    """
+    Generates images for each prompt and streams them to S3, yielding results as they complete.
+
+    Prompts are consumed lazily and generated concurrently through the
+    model's shared AdaptiveRateLimiter, retrying throttled calls with
+    backoff. Each base64 image is decoded on a pool of ``decode_workers``
+    threads, so the event loop keeps scheduling requests, and uploaded with
+    ``upload_fileobj`` straight from the decoded bytes, without temporary
+    files. Every response is released once its images are uploaded, so memory
+    is bounded by ``max_in_flight`` responses whatever the number of prompts.
+    Images are stored as ``{prefix}{index:06d}-{n}.{ext}``.
+
+    Args:
+        prompts (iterable): The prompts to render; consumed lazily.
+        bucket (str): Bucket to upload the images to.
+        prefix (str): Key prefix of the uploaded images.
+        model (str): A Stability or Titan image model (default: "stability.stable-diffusion-xl-v1").
+        params (dict): Generation parameters, e.g. {'cfg_scale': 7, 'steps': 30} for SDXL or
+            {'numberOfImages': 2, 'width': 1024, 'height': 1024} for Titan.
+        requests_per_minute (float): Request budget for the model.
+        max_in_flight (int): Prompts processed concurrently (default: the engine's per-model limit).
+        decode_workers (int): Threads decoding base64 payloads.
+        max_attempts (int): Calls per prompt before a throttle is reported as an error.
+        metrics (ImageMetrics): Optional record to fill in with the run's throughput and peak RSS.
+
+    Yields:
+        ImageResult: One result per prompt, in completion order.
+    """
+    _image_body(model, '')  # Reject unsupported models before consuming any prompt.
+    if metrics is None:
+        metrics = ImageMetrics(model=model)
+    limiter = rate_limiter(model, requests_per_minute)
+    pending = enumerate(prompts)
+    queue = asyncio.Queue()
+    done = object()
+    decoder = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix='image-decode')
+    rss_before = peak_rss()
+
+    async def worker():
+        try:
+            for index, prompt in pending:
+                await queue.put(await _generate_image(index, prompt, model, params, bucket, prefix,
+                                                      limiter, decoder, max_attempts))
+        finally:
+            await queue.put(done)
+
+    metrics.started_at = time.perf_counter()
+    workers = [asyncio.ensure_future(worker()) for _ in range(max_in_flight or engine.per_model_concurrency)]
+    try:
+        remaining = len(workers)
+        while remaining:
+            result = await queue.get()
+            if result is done:
+                remaining -= 1
+                continue
+            metrics.prompts += 1
+            metrics.images += len(result.keys)
+            metrics.bytes += result.bytes
+            if not result.ok:
+                metrics.failed += 1
+            yield result
+        # Surface errors raised outside a call, e.g. by the prompts iterator.
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        decoder.shutdown(wait=False)
+        metrics.ended_at = time.perf_counter()
+        metrics.peak_rss_bytes = peak_rss()
+        if rss_before is not None:
+            metrics.rss_growth_bytes = metrics.peak_rss_bytes - rss_before
+
+
+async def generate_images(prompts, bucket: str, prefix: str = 'images/',
+                          model: str = "stability.stable-diffusion-xl-v1", params: dict | None = None,
+                          requests_per_minute: float = BEDROCK_IMAGES_PER_MINUTE,
+                          max_in_flight: int | None = None, decode_workers: int = BEDROCK_IMAGE_DECODE_WORKERS,
+                          max_attempts: int = 6) -> tuple:
+    """
+    Generates and uploads images for each prompt; returns the results in input order.
+
+    See ``iter_generate_images`` for scheduling, decoding and uploads.
+
+    Returns:
+        tuple: (list of ImageResult ordered like ``prompts``, ImageMetrics of the run).
+    """
+    metrics = ImageMetrics(model=model)
+    results = [
+        result async for result in iter_generate_images(
+            prompts, bucket, prefix, model, params, requests_per_minute, max_in_flight, decode_workers,
+            max_attempts, metrics,
+        )
+    ]
+    results.sort(key=lambda result: result.index)
+    return results, metrics
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from aws_management.src.services import bedrock_ops
+from aws_management.src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Prompt tokens (summary plus recent turns) above which older turns are folded
+# into the summary; override with CHAT_TOKEN_BUDGET.
+CHAT_TOKEN_BUDGET = int(os.environ.get("CHAT_TOKEN_BUDGET", "2000"))
+# Model used for folding turns into the summary.
+CHAT_SUMMARY_MODEL = os.environ.get("CHAT_SUMMARY_MODEL", "anthropic.claude-v2")
+
+SUMMARY_PROMPT = (
+    "Here is a running summary of a conversation, followed by the turns that came after it.\n\n"
+    "<summary>\n{summary}\n</summary>\n\n<turns>\n{turns}\n</turns>\n\n"
+    "Rewrite the summary so it also covers these turns. Keep names, facts, decisions and open "
+    "questions; drop pleasantries. Answer with the summary only, in at most {max_words} words."
+)
+
+
+def count_tokens(text: str) -> int:
+    """Roughly estimates the tokens in ``text`` at ~4 characters per token."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Conversation:
+    """
+    Rolling state of one conversation.
+
+    Attributes:
+        conversation_id (str): The key the conversation is stored under.
+        summary (str): Summary of every turn no longer kept verbatim.
+        turns (list): Recent [role, text] pairs, oldest first.
+        folded (int): Turns folded into the summary so far.
+    """
+
+    conversation_id: str
+    summary: str = ''
+    turns: list = field(default_factory=list)
+    folded: int = 0
+
+    def tokens(self) -> int:
+        """Estimated tokens of the summary plus the recent turns."""
+        return count_tokens(self.summary) + sum(count_tokens(f"{role}: {text}") for role, text in self.turns)
+
+
+class ConversationStore:
+    """
+    Conversations keyed by ID in one SQLite table, as zlib-compressed JSON.
+
+    Args:
+        path (str): Database file, or None to keep conversations in memory.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False, isolation_level=None)
+        if path is not None:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS conversations (id TEXT PRIMARY KEY, state BLOB NOT NULL)')
+
+    def get(self, conversation_id: str) -> Conversation:
+        """Returns the stored conversation, or a new empty one."""
+        with self._lock:
+            row = self._db.execute('SELECT state FROM conversations WHERE id = ?', (conversation_id,)).fetchone()
+        if row is None:
+            return Conversation(conversation_id)
+        summary, turns, folded = json.loads(zlib.decompress(row[0]))
+        return Conversation(conversation_id, summary, turns, folded)
+
+    def put(self, conversation: Conversation) -> None:
+        """Stores ``conversation``, replacing any previous state."""
+        state = zlib.compress(json.dumps(
+            [conversation.summary, conversation.turns, conversation.folded], separators=(',', ':'),
+        ).encode())
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO conversations (id, state) VALUES (?, ?)',
+                             (conversation.conversation_id, state))
+
+    def delete(self, conversation_id: str) -> None:
+        """Removes a stored conversation; a missing one is ignored."""
+        with self._lock:
+            self._db.execute('DELETE FROM conversations WHERE id = ?', (conversation_id,))
+
+    def size(self, conversation_id: str) -> int:
+        """Returns the stored bytes of a conversation, 0 if absent."""
+        with self._lock:
+            row = self._db.execute('SELECT LENGTH(state) FROM conversations WHERE id = ?',
+                                   (conversation_id,)).fetchone()
+        return row[0] if row else 0
+
+    def close(self) -> None:
+        """Closes the database; the store cannot be used afterwards."""
+        with self._lock:
+            self._db.close()
+
+
+EMPTY_SUMMARY_ERROR = "Summarization returned no output"
+
+
+async def summarize_turns(summary: str, turns: list, max_words: int = 200,
+                          model: str = CHAT_SUMMARY_MODEL) -> str:
+    """
+    Folds ``turns`` into ``summary`` with one model call.
+
+    Only the previous summary and the new turns are sent, never the full
+    transcript, so the cost of a fold does not grow with the conversation.
+
+    Raises:
+        RuntimeError: If the model returned nothing.
+    """
+    transcript = "\n".join(f"{role}: {text}" for role, text in turns)
+    prompt = SUMMARY_PROMPT.format(summary=summary or '(empty)', turns=transcript, max_words=max_words)
+    output = await bedrock_ops.invoke_model(prompt, model, {'temperature': 0})
+    if not output:
+        raise RuntimeError(EMPTY_SUMMARY_ERROR)
+    return output.strip()
+
+
+class ChatMemory:
+    """
+    Keeps each conversation's prompt bounded with a rolling summary.
+
+    Every conversation is a summary plus a window of recent turns. Once the
+    two together exceed ``token_budget``, the oldest turns are folded into the
+    summary by a background task until the window is back under half the
+    budget. A fold sends only the previous summary and those turns, not the
+    whole history, and turns added while it runs are kept. At most one fold
+    runs per conversation. Turns added outside an event loop are folded when
+    the conversation's next ``prompt`` is built. ``prompt`` waits for a
+    running fold only if the conversation has grown past ``max_tokens``, so
+    the prompt size is bounded even when folds fall behind.
+
+    Only the ``max_conversations`` most recently used conversations are kept
+    in memory; the rest are reloaded from the store when next used.
+
+    Args:
+        store (ConversationStore): Where conversations are kept (default: in memory).
+        summarize (callable): ``async summarize(summary, turns) -> str``
+            (default: ``summarize_turns``).
+        token_budget (int): Tokens of summary plus recent turns that trigger a fold.
+        max_tokens (int): Tokens above which ``prompt`` waits for the fold (default: 2 x budget).
+        min_recent_turns (int): Turns always kept verbatim.
+        max_conversations (int): Conversations kept in memory.
+    """
+
+    def __init__(self, store: ConversationStore | None = None, summarize=None,
+                 token_budget: int = CHAT_TOKEN_BUDGET, max_tokens: int | None = None,
+                 min_recent_turns: int = 4, max_conversations: int = 1024):
+        self.store = store or ConversationStore()
+        self.summarize = summarize or summarize_turns
+        self.token_budget = token_budget
+        self.max_tokens = max_tokens or 2 * token_budget
+        self.min_recent_turns = min_recent_turns
+        self.max_conversations = max_conversations
+        self._conversations = OrderedDict()
+        self._folds = {}
+        self.folds = 0
+        self.fold_errors = 0
+
+    def conversation(self, conversation_id: str) -> Conversation:
+        """Returns the live state of a conversation, loading it from the store on first use."""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is not None:
+            self._conversations.move_to_end(conversation_id)
+            return conversation
+        conversation = self._conversations[conversation_id] = self.store.get(conversation_id)
+        self._evict()
+        return conversation
+
+    def _evict(self) -> None:
+        # Every change is already in the store, so an evicted conversation only
+        # costs a reload. One with a fold running stays, or the fold's result
+        # would be written over turns added to a reloaded copy.
+        for conversation_id in list(self._conversations):
+            if len(self._conversations) <= self.max_conversations:
+                break
+            task = self._folds.get(conversation_id)
+            if task is not None and not task.done():
+                continue
+            del self._conversations[conversation_id]
+            self._folds.pop(conversation_id, None)
+
+    def add_turn(self, conversation_id: str, role: str, text: str) -> None:
+        """
+        Appends a turn and starts a background fold if the budget is exceeded.
+
+        Without a running event loop the fold is left to the next ``prompt``.
+        """
+        conversation = self.conversation(conversation_id)
+        conversation.turns.append([role, text])
+        self.store.put(conversation)
+        if conversation.tokens() > self.token_budget:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._schedule_fold(conversation)
+
+    def _schedule_fold(self, conversation: Conversation) -> asyncio.Future:
+        task = self._folds.get(conversation.conversation_id)
+        if task is None or task.done():
+            task = self._folds[conversation.conversation_id] = asyncio.ensure_future(self._fold(conversation))
+        return task
+
+    async def _fold(self, conversation: Conversation) -> None:
+        # Fold the oldest turns until summary plus remaining turns fit in half the budget.
+        target = self.token_budget // 2
+        tokens = conversation.tokens()
+        count = 0
+        while len(conversation.turns) - count > self.min_recent_turns and tokens > target:
+            role, text = conversation.turns[count]
+            tokens -= count_tokens(f"{role}: {text}")
+            count += 1
+        if not count:
+            return
+        old = [list(turn) for turn in conversation.turns[:count]]
+        try:
+            summary = await self.summarize(conversation.summary, old)
+        except Exception as e:
+            self.fold_errors += 1
+            logger.warning("Error summarizing conversation %s: %s", conversation.conversation_id, e, extra={
+                'conversation_id': conversation.conversation_id,
+            })
+            return
+        # Turns appended during the call stay after the folded ones.
+        del conversation.turns[:count]
+        conversation.summary = summary
+        conversation.folded += count
+        self.folds += 1
+        self.store.put(conversation)
+
+    async def flush(self, conversation_id: str | None = None) -> None:
+        """Waits for the running fold of one conversation, or of all of them."""
+        tasks = self._folds.values() if conversation_id is None else [self._folds.get(conversation_id)]
+        await asyncio.gather(*(task for task in list(tasks) if task is not None))
+
+    async def prompt(self, conversation_id: str, message: str) -> str:
+        """
+        Builds the prompt for the next user ``message``: summary, recent turns, then the message.
+
+        Returns:
+            str: A prompt whose size is bounded by ``max_tokens`` plus the message.
+        """
+        conversation = self.conversation(conversation_id)
+        if conversation.tokens() > self.token_budget:
+            self._schedule_fold(conversation)
+        while conversation.tokens() > self.max_tokens:
+            # The running fold may predate the newest turns; fold again until under the cap.
+            folded = conversation.folded
+            await self._schedule_fold(conversation)
+            if conversation.folded == folded:
+                break
+        parts = []
+        if conversation.summary:
+            parts.append(f"Summary of the conversation so far:\n{conversation.summary}\n")
+        parts.extend(f"{role}: {text}" for role, text in conversation.turns)
+        parts.append(f"user: {message}")
+        return "\n".join(parts)
+
+    async def chat(self, conversation_id: str, message: str, model: str = "anthropic.claude-v2",
+                   params: dict | None = None) -> str:
+        """
+        Answers ``message`` with the conversation's bounded context and records both turns.
+
+        Returns:
+            str: The model's reply, or "" if the call failed (see ``invoke_model``).
+        """
+        reply = await bedrock_ops.invoke_model(await self.prompt(conversation_id, message), model, params)
+        self.add_turn(conversation_id, 'user', message)
+        if reply:
+            self.add_turn(conversation_id, 'assistant', reply)
+        return reply
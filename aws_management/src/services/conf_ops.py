@@ -1,6 +1,24 @@
-import boto3
+import csv
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from functools import partial
 
-def create_user(client, identity_store_id, username, email, given_name, family_name):
+from botocore.exceptions import BotoCoreError, ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+
+from aws_management.src.utils.logging import aws_fields, get_logger
+from aws_management.src.utils.ratelimit import TokenBucket, backoff_delay
+
+logger = get_logger(__name__)
+
+
+def create_user(client, identity_store_id, username, email, given_name, family_name, display_name=None):
+    kwargs = {'DisplayName': display_name} if display_name is not None else {}
     response = client.create_user(
         IdentityStoreId=identity_store_id,
         UserName=username,
@@ -13,15 +31,17 @@ def create_user(client, identity_store_id, username, email, given_name, family_n
                 'Value': email,
                 'Type': 'Work'
             }
-        ]
+        ],
+        **kwargs
     )
     return {'UserId': response['UserId']}  # Return a dict to match test expectations
 
-def create_group(client, identity_store_id, display_name, description):
+def create_group(client, identity_store_id, display_name, description=None):
+    kwargs = {'Description': description} if description else {}
     response = client.create_group(
         IdentityStoreId=identity_store_id,
         DisplayName=display_name,
-        Description=description
+        **kwargs
     )
     return {'GroupId': response['GroupId']}  # Return a dict to match test expectations
 
@@ -36,4 +56,671 @@ def assign_user_to_group(client, identity_store_id, group_id, user_id):
     return {'MembershipId': response['MembershipId']}  # Return a dict to match test expectations
 
 def assign_group_to_user(client, identity_store_id, group_id, user_id):
-    return assign_user_to_group(client, identity_store_id, group_id, user_id)
\ No newline at end of file
+    return assign_user_to_group(client, identity_store_id, group_id, user_id)
+
+# Error codes retried with backoff, and codes meaning a create raced an existing entity.
+RETRYABLE_ERRORS = frozenset({'ThrottlingException', 'TooManyRequestsException', 'InternalServerException'})
+CONFLICT_ERRORS = frozenset({'ConflictException', 'ResourceAlreadyExistsException'})
+# Transport failures (connection errors, read timeouts, dropped connections) retried like throttles.
+RETRYABLE_BOTOCORE_ERRORS = (BotoConnectionError, HTTPClientError)
+
+
+@dataclass(frozen=True)
+class UserSpec:
+    """A user as it should exist in the Identity Store."""
+
+    username: str
+    email: str
+    given_name: str
+    family_name: str
+    display_name: str = ''
+
+    def __post_init__(self):
+        if not self.display_name:
+            object.__setattr__(self, 'display_name', f"{self.given_name} {self.family_name}")
+
+
+@dataclass(frozen=True)
+class GroupSpec:
+    """A group as it should exist in the Identity Store."""
+
+    display_name: str
+    description: str = ''
+
+
+CSV_REQUIRED_COLUMNS = frozenset({'username', 'email', 'given_name', 'family_name'})
+CSV_OPTIONAL_COLUMNS = frozenset({'display_name', 'groups'})
+CSV_COLUMNS_ERROR = "Bad CSV header: missing columns: {missing}; unknown columns: {unknown}"
+
+
+@dataclass
+class DesiredState:
+    """
+    Users, groups and memberships that should exist in the Identity Store.
+
+    Attributes:
+        users (list): UserSpec entries.
+        groups (list): GroupSpec entries.
+        memberships (set): (group display name, username) pairs.
+    """
+
+    users: list = field(default_factory=list)
+    groups: list = field(default_factory=list)
+    memberships: set = field(default_factory=set)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'DesiredState':
+        """
+        Builds a DesiredState from parsed JSON.
+
+        Expects ``{"users": [{"username", "email", "given_name", "family_name"}],
+        "groups": [{"display_name", "description"}], "memberships": [{"group", "user"}]}``.
+        """
+        return cls(
+            users=[UserSpec(**user) for user in data.get('users', ())],
+            groups=[GroupSpec(**group) for group in data.get('groups', ())],
+            memberships={(m['group'], m['user']) for m in data.get('memberships', ())},
+        )
+
+    @classmethod
+    def from_csv(cls, lines) -> 'DesiredState':
+        """
+        Builds a DesiredState from CSV rows of users.
+
+        Columns are username, email, given_name, family_name, an optional
+        display_name and an optional ``groups`` column of semicolon-separated group names; every group named
+        is created with an empty description.
+
+        Raises:
+            ValueError: If the header lacks a required column or has an unknown one.
+        """
+        state = cls()
+        groups = set()
+        reader = csv.DictReader(lines)
+        columns = set(reader.fieldnames or ())
+        missing = sorted(CSV_REQUIRED_COLUMNS - columns)
+        unknown = sorted(columns - CSV_REQUIRED_COLUMNS - CSV_OPTIONAL_COLUMNS)
+        if missing or unknown:
+            raise ValueError(CSV_COLUMNS_ERROR.format(missing=', '.join(missing) or 'none',
+                                                      unknown=', '.join(unknown) or 'none'))
+        for row in reader:
+            names = [g.strip() for g in (row.pop('groups', None) or '').split(';') if g.strip()]
+            state.users.append(UserSpec(**row))
+            groups.update(names)
+            state.memberships.update((name, row['username']) for name in names)
+        state.groups = [GroupSpec(name) for name in sorted(groups)]
+        return state
+
+
+def load_desired_state(path: str) -> DesiredState:
+    """Loads a DesiredState from a .json or .csv file."""
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            return DesiredState.from_csv(f)
+        return DesiredState.from_dict(json.load(f))
+
+
+@dataclass
+class DirectorySnapshot:
+    """
+    The users, groups and memberships currently in an Identity Store.
+
+    Attributes:
+        users (dict): User records keyed by UserName.
+        groups (dict): Group records keyed by DisplayName.
+        memberships (dict): For each GroupId, a dict of member UserId to MembershipId.
+    """
+
+    users: dict = field(default_factory=dict)
+    groups: dict = field(default_factory=dict)
+    memberships: dict = field(default_factory=dict)
+
+
+def _paginate(client, operation, key, **kwargs) -> list:
+    items = []
+    for page in client.get_paginator(operation).paginate(**kwargs, PaginationConfig={'PageSize': 100}):
+        items.extend(page[key])
+    return items
+
+
+def fetch_directory(client, identity_store_id, max_workers=8) -> DirectorySnapshot:
+    """
+    Reads the current users, groups and memberships of an Identity Store.
+
+    Users and groups are paged in concurrently, then each group's memberships
+    are paged in on a pool of ``max_workers`` threads.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        users = pool.submit(_paginate, client, 'list_users', 'Users', IdentityStoreId=identity_store_id)
+        groups = _paginate(client, 'list_groups', 'Groups', IdentityStoreId=identity_store_id)
+        member_lists = pool.map(
+            lambda group: _paginate(client, 'list_group_memberships', 'GroupMemberships',
+                                    IdentityStoreId=identity_store_id, GroupId=group['GroupId']),
+            groups,
+        )
+        snapshot = DirectorySnapshot(
+            groups={g['DisplayName']: g for g in groups},
+            memberships={
+                group['GroupId']: {m['MemberId']['UserId']: m['MembershipId'] for m in members if 'UserId' in m['MemberId']}
+                for group, members in zip(groups, member_lists, strict=True)
+            },
+        )
+        snapshot.users = {u['UserName']: u for u in users.result()}
+    return snapshot
+
+
+def _user_operations(spec: UserSpec, user: dict) -> list:
+    name = user.get('Name', {})
+    emails = user.get('Emails') or [{}]
+    operations = []
+    if name.get('GivenName') != spec.given_name:
+        operations.append({'AttributePath': 'name.givenName', 'AttributeValue': spec.given_name})
+    if name.get('FamilyName') != spec.family_name:
+        operations.append({'AttributePath': 'name.familyName', 'AttributeValue': spec.family_name})
+    if user.get('DisplayName') != spec.display_name:
+        operations.append({'AttributePath': 'displayName', 'AttributeValue': spec.display_name})
+    if emails[0].get('Value') != spec.email:
+        operations.append({'AttributePath': 'emails', 'AttributeValue': [{'Value': spec.email, 'Type': 'Work', 'Primary': True}]})
+    return operations
+
+
+@dataclass
+class ProvisioningPlan:
+    """
+    The writes needed to move an Identity Store to a DesiredState.
+
+    Creates and updates carry the spec to apply; deletes carry the name and the
+    ID to delete.
+    """
+
+    create_users: list = field(default_factory=list)
+    update_users: list = field(default_factory=list)
+    delete_users: list = field(default_factory=list)
+    create_groups: list = field(default_factory=list)
+    update_groups: list = field(default_factory=list)
+    delete_groups: list = field(default_factory=list)
+    add_memberships: list = field(default_factory=list)
+    remove_memberships: list = field(default_factory=list)
+
+    @property
+    def writes(self) -> int:
+        """int: Write calls the plan will make."""
+        return sum(len(getattr(self, f.name)) for f in fields(self))
+
+
+def plan_changes(snapshot: DirectorySnapshot, desired: DesiredState, prune: bool = False) -> ProvisioningPlan:
+    """
+    Diffs the current directory against the desired state.
+
+    Args:
+        snapshot (DirectorySnapshot): The current directory from ``fetch_directory``.
+        desired (DesiredState): What should exist.
+        prune (bool): Also delete users, groups and memberships absent from ``desired``.
+
+    Returns:
+        ProvisioningPlan: Only the writes needed; empty when nothing changed.
+    """
+    plan = ProvisioningPlan()
+    for spec in desired.users:
+        user = snapshot.users.get(spec.username)
+        if user is None:
+            plan.create_users.append(spec)
+        elif operations := _user_operations(spec, user):
+            plan.update_users.append((spec, user['UserId'], operations))
+    for spec in desired.groups:
+        group = snapshot.groups.get(spec.display_name)
+        if group is None:
+            plan.create_groups.append(spec)
+        elif spec.description and group.get('Description', '') != spec.description:
+            plan.update_groups.append((spec, group['GroupId']))
+    user_names = {u['UserId']: name for name, u in snapshot.users.items()}
+    current = {
+        (group_name, user_names[user_id]): membership_id
+        for group_name, group in snapshot.groups.items()
+        for user_id, membership_id in snapshot.memberships.get(group['GroupId'], {}).items()
+        if user_id in user_names
+    }
+    plan.add_memberships = sorted(desired.memberships - current.keys())
+    if prune:
+        plan.remove_memberships = sorted((pair, current[pair]) for pair in current.keys() - desired.memberships)
+        wanted_users = {spec.username for spec in desired.users}
+        wanted_groups = {spec.display_name for spec in desired.groups}
+        plan.delete_users = sorted((name, u['UserId']) for name, u in snapshot.users.items() if name not in wanted_users)
+        plan.delete_groups = sorted((name, g['GroupId']) for name, g in snapshot.groups.items() if name not in wanted_groups)
+    return plan
+
+
+@dataclass
+class EntityResult:
+    """
+    Outcome of one write in a provisioning run.
+
+    Attributes:
+        kind (str): 'user', 'group' or 'membership'.
+        name (str): Username, group name, or "group/username".
+        action (str): 'create', 'update' or 'delete'.
+        status (str): 'ok', 'exists' (created concurrently elsewhere), 'skipped' or 'failed'.
+        error (Exception): The error for a failed write.
+    """
+
+    kind: str
+    name: str
+    action: str
+    status: str
+    error: Exception | None = None
+
+
+@dataclass
+class ProvisioningReport:
+    """Per-entity results of ``provision`` plus the plan that produced them."""
+
+    plan: ProvisioningPlan
+    results: list = field(default_factory=list)
+
+    @property
+    def failed(self) -> list:
+        """list: Results whose write failed."""
+        return [r for r in self.results if r.status == 'failed']
+
+    def counts(self) -> dict:
+        """Returns the number of results per status."""
+        counts = {}
+        for result in self.results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        return counts
+
+
+def _call(limiter: TokenBucket, max_attempts: int, fn, **kwargs):
+    attempt = 0
+    while True:
+        attempt += 1
+        limiter.acquire()
+        try:
+            return fn(**kwargs)
+        except (ClientError, BotoCoreError) as e:
+            if isinstance(e, ClientError):
+                retryable, reason = e.response['Error']['Code'] in RETRYABLE_ERRORS, e.response['Error']['Code']
+            else:
+                retryable, reason = isinstance(e, RETRYABLE_BOTOCORE_ERRORS), type(e).__name__
+            if not retryable or attempt >= max_attempts:
+                raise
+            logger.debug("Retrying %s after %s", getattr(fn, '__name__', fn), reason, extra={
+                'service': 'identitystore', 'retries': attempt, **aws_fields(e),
+            })
+            time.sleep(backoff_delay(attempt))
+
+
+def provision(client, identity_store_id, desired: DesiredState, prune=False, max_workers=8,
+              requests_per_second=20.0, max_attempts=5, snapshot: DirectorySnapshot | None = None) -> ProvisioningReport:
+    """
+    Brings an Identity Store in line with a desired set of users, groups and memberships.
+
+    The current directory is read with ``fetch_directory`` and diffed with
+    ``plan_changes``, so only missing creates, changed attributes and (with
+    ``prune``) surplus entities are written; re-running with no changes makes
+    no write calls. Writes run concurrently on ``max_workers`` threads under a
+    shared rate limit, throttled calls and transport errors are retried with backoff, and a create
+    that finds the entity already present is recorded as 'exists'. A failure
+    is recorded against its entity and never aborts the run.
+
+    Args:
+        client: boto3 'identitystore' client.
+        identity_store_id (str): The Identity Store to provision.
+        desired (DesiredState): What should exist.
+        prune (bool): Delete users, groups and memberships absent from ``desired``.
+        max_workers (int): Writes in flight at once.
+        requests_per_second (float): Rate limit across all calls.
+        max_attempts (int): Attempts per call before a throttle or transport error is reported as a failure.
+        snapshot (DirectorySnapshot): Current directory to diff against, e.g. from an
+            IdentityStoreMirror, instead of reading it from the Identity Store.
+
+    Returns:
+        ProvisioningReport: One EntityResult per write.
+    """
+    limiter = TokenBucket(requests_per_second)
+    if snapshot is None:
+        snapshot = fetch_directory(client, identity_store_id, max_workers)
+    plan = plan_changes(snapshot, desired, prune)
+    report = ProvisioningReport(plan)
+    user_ids = {name: u['UserId'] for name, u in snapshot.users.items()}
+    group_ids = {name: g['GroupId'] for name, g in snapshot.groups.items()}
+
+    def job(kind, name, action, fn, *args, **kwargs):
+        return kind, name, action, partial(fn, *args, **kwargs)
+
+    def run(entry):
+        kind, name, action, call = entry
+        try:
+            call()
+            return EntityResult(kind, name, action, 'ok')
+        except (ClientError, BotoCoreError) as e:
+            if action == 'create' and isinstance(e, ClientError) and e.response['Error']['Code'] in CONFLICT_ERRORS:
+                return EntityResult(kind, name, action, 'exists')
+            return EntityResult(kind, name, action, 'failed', e)
+
+    def write(call, **kwargs):
+        return _call(limiter, max_attempts, call, IdentityStoreId=identity_store_id, **kwargs)
+
+    def new_user(spec):
+        user_ids[spec.username] = _call(
+            limiter, max_attempts, create_user, client=client, identity_store_id=identity_store_id,
+            username=spec.username, email=spec.email, given_name=spec.given_name, family_name=spec.family_name,
+            display_name=spec.display_name,
+        )['UserId']
+
+    def new_group(spec):
+        group_ids[spec.display_name] = _call(
+            limiter, max_attempts, create_group, client=client, identity_store_id=identity_store_id,
+            display_name=spec.display_name, description=spec.description,
+        )['GroupId']
+
+    def new_membership(group_name, username):
+        _call(limiter, max_attempts, assign_user_to_group, client=client, identity_store_id=identity_store_id,
+              group_id=group_ids[group_name], user_id=user_ids[username])
+
+    def resolve_existing(result):
+        # Another writer created the entity between our read and our create.
+        if result.kind == 'user':
+            user_ids[result.name] = write(client.get_user_id, AlternateIdentifier={
+                'UniqueAttribute': {'AttributePath': 'userName', 'AttributeValue': result.name}})['UserId']
+        else:
+            group_ids[result.name] = write(client.get_group_id, AlternateIdentifier={
+                'UniqueAttribute': {'AttributePath': 'displayName', 'AttributeValue': result.name}})['GroupId']
+
+    entities = [
+        *(job('user', s.username, 'create', new_user, s) for s in plan.create_users),
+        *(job('group', s.display_name, 'create', new_group, s) for s in plan.create_groups),
+        *(job('user', s.username, 'update', write, client.update_user, UserId=uid, Operations=ops)
+          for s, uid, ops in plan.update_users),
+        *(job('group', s.display_name, 'update', write, client.update_group, GroupId=gid,
+              Operations=[{'AttributePath': 'description', 'AttributeValue': s.description}])
+          for s, gid in plan.update_groups),
+    ]
+    membership_deletes = [
+        job('membership', f"{group}/{user}", 'delete', write, client.delete_group_membership, MembershipId=mid)
+        for (group, user), mid in plan.remove_memberships
+    ]
+    entity_deletes = [
+        *(job('user', name, 'delete', write, client.delete_user, UserId=uid) for name, uid in plan.delete_users),
+        *(job('group', name, 'delete', write, client.delete_group, GroupId=gid) for name, gid in plan.delete_groups),
+    ]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Users and groups first, so new memberships can reference their IDs.
+        report.results.extend(pool.map(run, entities))
+        for result in report.results:
+            if result.status == 'exists':
+                try:
+                    resolve_existing(result)
+                except (ClientError, BotoCoreError) as e:
+                    result.status, result.error = 'failed', e
+        memberships = []
+        for group_name, username in plan.add_memberships:
+            name = f"{group_name}/{username}"
+            if group_name in group_ids and username in user_ids:
+                memberships.append(job('membership', name, 'create', new_membership, group_name, username))
+            else:
+                report.results.append(EntityResult('membership', name, 'create', 'skipped'))
+        report.results.extend(pool.map(run, memberships))
+        # Memberships go before the users and groups they reference.
+        report.results.extend(pool.map(run, membership_deletes))
+        report.results.extend(pool.map(run, entity_deletes))
+    return report
+
+
+def _compact_user(user: dict) -> list:
+    name = user.get('Name', {})
+    emails = user.get('Emails') or [{}]
+    return [user['UserId'], user['UserName'], user.get('DisplayName', ''),
+            name.get('GivenName', ''), name.get('FamilyName', ''), emails[0].get('Value', '')]
+
+
+def _expand_user(row: list) -> dict:
+    user_id, username, display_name, given_name, family_name, email = row
+    return {'UserId': user_id, 'UserName': username, 'DisplayName': display_name,
+            'Name': {'GivenName': given_name, 'FamilyName': family_name},
+            'Emails': [{'Value': email, 'Type': 'Work'}] if email else []}
+
+
+class IdentityStoreMirror:
+    """
+    Local, indexed copy of an Identity Store for O(1) lookups.
+
+    ``refresh`` pages users, groups and every group's memberships in
+    concurrently and swaps in new indexes: users by username, email and ID,
+    groups by display name and ID, and membership adjacency in both directions.
+    Lookups never call AWS. The mirror can be saved to a compact gzip file for
+    fast warm starts and kept current by a background refresh thread; single
+    groups or users can be refreshed on demand after a known change.
+
+    Args:
+        client: boto3 'identitystore' client.
+        identity_store_id (str): The Identity Store to mirror.
+        path (str): File to persist the mirror to, or None to keep it in memory.
+        max_workers (int): Threads used to page memberships.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, client, identity_store_id, path=None, max_workers=8):
+        self.client = client
+        self.identity_store_id = identity_store_id
+        self.path = path
+        self.max_workers = max_workers
+        self.refreshed_at = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._install(DirectorySnapshot())
+
+    def _install(self, snapshot: DirectorySnapshot) -> None:
+        users_by_id = {u['UserId']: u for u in snapshot.users.values()}
+        groups_by_id = {g['GroupId']: g for g in snapshot.groups.values()}
+        groups_of_user = {}
+        for group_id, members in snapshot.memberships.items():
+            for user_id in members:
+                groups_of_user.setdefault(user_id, set()).add(group_id)
+        with self._lock:
+            self._snapshot = snapshot
+            self._users_by_id = users_by_id
+            self._users_by_email = {
+                email['Value'].lower(): u
+                for u in snapshot.users.values() for email in u.get('Emails', ()) if email.get('Value')
+            }
+            self._groups_by_id = groups_by_id
+            self._groups_of_user = groups_of_user
+
+    def snapshot(self) -> DirectorySnapshot:
+        """Returns the mirrored directory, e.g. to pass to ``plan_changes`` or ``provision``."""
+        return self._snapshot
+
+    def refresh(self) -> dict:
+        """
+        Re-pages the Identity Store and applies the changes to the indexes.
+
+        Returns:
+            dict: Counts of users, groups and memberships added and removed.
+        """
+        fresh = fetch_directory(self.client, self.identity_store_id, self.max_workers)
+        old = self._snapshot
+        old_pairs = {(g, u) for g, members in old.memberships.items() for u in members}
+        new_pairs = {(g, u) for g, members in fresh.memberships.items() for u in members}
+        changes = {
+            'users_added': len(fresh.users.keys() - old.users.keys()),
+            'users_removed': len(old.users.keys() - fresh.users.keys()),
+            'groups_added': len(fresh.groups.keys() - old.groups.keys()),
+            'groups_removed': len(old.groups.keys() - fresh.groups.keys()),
+            'memberships_added': len(new_pairs - old_pairs),
+            'memberships_removed': len(old_pairs - new_pairs),
+        }
+        self._install(fresh)
+        self.refreshed_at = time.time()
+        if self.path is not None:
+            self.save()
+        return changes
+
+    def refresh_group(self, display_name: str) -> None:
+        """
+        Re-pages one group and its memberships after a known change.
+
+        A group that no longer exists is evicted, and a renamed group's entry
+        under its old display name is replaced.
+        """
+        try:
+            group_id = self.client.get_group_id(IdentityStoreId=self.identity_store_id, AlternateIdentifier={
+                'UniqueAttribute': {'AttributePath': 'displayName', 'AttributeValue': display_name}})['GroupId']
+            group = self.client.describe_group(IdentityStoreId=self.identity_store_id, GroupId=group_id)
+            members = _paginate(self.client, 'list_group_memberships', 'GroupMemberships',
+                                IdentityStoreId=self.identity_store_id, GroupId=group_id)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            group_id = group = None
+        with self._lock:
+            snapshot = DirectorySnapshot(dict(self._snapshot.users), dict(self._snapshot.groups),
+                                         dict(self._snapshot.memberships))
+            stale = snapshot.groups.pop(display_name, None)
+            if stale is not None and stale['GroupId'] != group_id:
+                snapshot.memberships.pop(stale['GroupId'], None)
+            if group is not None:
+                for name in [n for n, g in snapshot.groups.items() if g['GroupId'] == group_id]:
+                    del snapshot.groups[name]
+                snapshot.groups[display_name] = group
+                snapshot.memberships[group_id] = {
+                    m['MemberId']['UserId']: m['MembershipId'] for m in members if 'UserId' in m['MemberId']
+                }
+            self._install(snapshot)
+
+    def refresh_user(self, username: str) -> None:
+        """
+        Re-reads one user after a known change.
+
+        A user that no longer exists is evicted, along with their memberships,
+        and a renamed user's entry under the old username is replaced.
+        """
+        try:
+            user_id = self.client.get_user_id(IdentityStoreId=self.identity_store_id, AlternateIdentifier={
+                'UniqueAttribute': {'AttributePath': 'userName', 'AttributeValue': username}})['UserId']
+            user = self.client.describe_user(IdentityStoreId=self.identity_store_id, UserId=user_id)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            user_id = user = None
+        with self._lock:
+            snapshot = DirectorySnapshot(dict(self._snapshot.users), self._snapshot.groups,
+                                         self._snapshot.memberships)
+            stale = snapshot.users.pop(username, None)
+            if user is not None:
+                for name in [n for n, u in snapshot.users.items() if u['UserId'] == user_id]:
+                    del snapshot.users[name]
+                snapshot.users[username] = user
+            elif stale is not None:
+                snapshot.memberships = {
+                    group_id: {u: m for u, m in members.items() if u != stale['UserId']}
+                    for group_id, members in snapshot.memberships.items()
+                }
+            self._install(snapshot)
+
+    def save(self, path=None) -> None:
+        """Writes the mirror to ``path`` (default: the mirror's path) as compact gzip JSON."""
+        path = path or self.path
+        snapshot = self._snapshot
+        data = {
+            'version': self.FORMAT_VERSION,
+            'identity_store_id': self.identity_store_id,
+            'refreshed_at': self.refreshed_at,
+            'users': [_compact_user(u) for u in snapshot.users.values()],
+            'groups': [[g['GroupId'], g['DisplayName'], g.get('Description', '')] for g in snapshot.groups.values()],
+            'memberships': [[group_id, user_id, membership_id]
+                            for group_id, members in snapshot.memberships.items()
+                            for user_id, membership_id in members.items()],
+        }
+        partial_path = f"{path}.tmp"
+        with gzip.open(partial_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(partial_path, path)
+
+    def load(self, path=None) -> bool:
+        """
+        Loads a mirror saved by ``save``.
+
+        Returns:
+            bool: False if there was no usable file for this Identity Store.
+        """
+        path = path or self.path
+        if path is None or not os.path.exists(path):
+            return False
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != self.FORMAT_VERSION or data.get('identity_store_id') != self.identity_store_id:
+            return False
+        snapshot = DirectorySnapshot(
+            users={row[1]: _expand_user(row) for row in data['users']},
+            groups={name: {'GroupId': group_id, 'DisplayName': name, 'Description': description}
+                    for group_id, name, description in data['groups']},
+        )
+        for group_id, user_id, membership_id in data['memberships']:
+            snapshot.memberships.setdefault(group_id, {})[user_id] = membership_id
+        self._install(snapshot)
+        self.refreshed_at = data['refreshed_at']
+        return True
+
+    def start(self, interval: float = 300.0) -> None:
+        """Refreshes the mirror every ``interval`` seconds on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                # Any failure, e.g. a connection or credential error, is logged
+                # and retried on the next tick rather than ending the thread.
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.exception("Error refreshing identity store mirror", extra={
+                        'service': 'identitystore', 'identity_store_id': self.identity_store_id, **aws_fields(e),
+                    })
+
+        self._thread = threading.Thread(target=loop, name='identitystore-mirror', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def user(self, username: str) -> dict | None:
+        """Returns the user with ``username``."""
+        return self._snapshot.users.get(username)
+
+    def user_by_email(self, email: str) -> dict | None:
+        """Returns the user with ``email`` (case-insensitive)."""
+        return self._users_by_email.get(email.lower())
+
+    def group(self, display_name: str) -> dict | None:
+        """Returns the group named ``display_name``."""
+        return self._snapshot.groups.get(display_name)
+
+    def groups_for_user(self, username: str) -> list:
+        """Returns the display names of the groups ``username`` belongs to."""
+        user = self.user(username)
+        if user is None:
+            return []
+        groups = self._groups_by_id
+        return sorted(groups[g]['DisplayName'] for g in self._groups_of_user.get(user['UserId'], ()) if g in groups)
+
+    def members_of(self, display_name: str) -> list:
+        """Returns the usernames of the members of group ``display_name``."""
+        group = self.group(display_name)
+        if group is None:
+            return []
+        users = self._users_by_id
+        return sorted(users[u]['UserName'] for u in self._snapshot.memberships.get(group['GroupId'], ()) if u in users)
+
+    def is_member(self, username: str, display_name: str) -> bool:
+        """Returns True if ``username`` belongs to group ``display_name``."""
+        user, group = self.user(username), self.group(display_name)
+        return user is not None and group is not None and group['GroupId'] in self._groups_of_user.get(user['UserId'], ())
@@ -0,0 +1,211 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from aws_management.src.utils.config import get_client
+from aws_management.src.utils.logging import aws_fields, get_logger
+
+logger = get_logger(__name__)
+
+_DONE = object()
+
+
+class InstanceRecord:
+    """
+    Compact, normalized view of one EC2 instance.
+
+    Only the fields the inventory uses are kept, in ``__slots__``, so a few
+    hundred thousand records stay small in memory.
+    """
+
+    __slots__ = (
+        'profile', 'region', 'instance_id', 'instance_type', 'state', 'availability_zone',
+        'private_ip', 'public_ip', 'vpc_id', 'subnet_id', 'image_id', 'launch_time', 'name', 'tags',
+    )
+
+    def __init__(self, profile, region, instance_id, instance_type, state, availability_zone=None,
+                 private_ip=None, public_ip=None, vpc_id=None, subnet_id=None, image_id=None,
+                 launch_time=None, name=None, tags=None):
+        self.profile = profile
+        self.region = region
+        self.instance_id = instance_id
+        self.instance_type = instance_type
+        self.state = state
+        self.availability_zone = availability_zone
+        self.private_ip = private_ip
+        self.public_ip = public_ip
+        self.vpc_id = vpc_id
+        self.subnet_id = subnet_id
+        self.image_id = image_id
+        self.launch_time = launch_time
+        self.name = name
+        self.tags = tags
+
+    @classmethod
+    def from_api(cls, instance: dict, region: str, profile: str | None = None,
+                 include_tags: bool = True) -> 'InstanceRecord':
+        """Builds a record from one ``describe_instances`` instance entry."""
+        tags = {t['Key']: t['Value'] for t in instance.get('Tags', ())}
+        return cls(
+            profile=profile,
+            region=region,
+            instance_id=instance['InstanceId'],
+            instance_type=instance.get('InstanceType'),
+            state=instance.get('State', {}).get('Name'),
+            availability_zone=instance.get('Placement', {}).get('AvailabilityZone'),
+            private_ip=instance.get('PrivateIpAddress'),
+            public_ip=instance.get('PublicIpAddress'),
+            vpc_id=instance.get('VpcId'),
+            subnet_id=instance.get('SubnetId'),
+            image_id=instance.get('ImageId'),
+            launch_time=instance.get('LaunchTime'),
+            name=tags.get('Name'),
+            tags=tags if include_tags else None,
+        )
+
+    def as_dict(self) -> dict:
+        """Returns the record as a plain dict."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"InstanceRecord({self.region}/{self.instance_id} {self.instance_type} {self.state})"
+
+
+def to_columns(records) -> dict:
+    """
+    Converts records to a columnar dict of lists, one list per field.
+
+    Args:
+        records (iterable): InstanceRecord objects, e.g. from ``iter_instances``.
+
+    Returns:
+        dict: Field name to a list of values, all lists the same length.
+    """
+    columns = {field: [] for field in InstanceRecord.__slots__}
+    appenders = [(field, columns[field].append) for field in InstanceRecord.__slots__]
+    for record in records:
+        for field, append in appenders:
+            append(getattr(record, field))
+    return columns
+
+
+def enabled_regions(profile: str | None = None) -> list:
+    """
+    Lists the regions enabled for an account.
+
+    Args:
+        profile (str): Registry profile whose account to query.
+
+    Returns:
+        list: Region names, sorted.
+    """
+    response = get_client('ec2', profile=profile).describe_regions(
+        Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}],
+    )
+    return sorted(r['RegionName'] for r in response['Regions'])
+
+
+def _log_error(profile, region, error):
+    # A region of None means the enabled regions could not be listed.
+    operation = 'DescribeInstances' if region else 'DescribeRegions'
+    logger.error("Error scanning %s (%s): %s", region or 'regions', profile or 'default', error, extra={
+        'service': 'ec2', 'operation': operation, 'region': region, 'profile': profile,
+        **aws_fields(error),
+    }, exc_info=None if isinstance(error, ClientError | BotoCoreError) else error)
+
+
+def iter_instances(regions=None, profiles=(None,), filters: dict | None = None, max_workers: int = 16,
+                   page_size: int = 1000, include_tags: bool = True, on_error=None):
+    """
+    Streams EC2 instances from many regions and credential sets concurrently.
+
+    Every (profile, region) pair is paged with ``describe_instances`` on its own
+    worker thread; pages are handed to the caller through a bounded queue as
+    soon as they arrive, so memory stays flat and the slowest region does not
+    hold up the rest. Filtering happens server-side.
+
+    Args:
+        regions (list): Regions to scan, or None for every enabled region of each profile.
+        profiles (iterable): Registry profiles to scan with; None is the default
+            credential chain. Use ``register_users`` for the USERS credential sets.
+        filters (dict): EC2 filters, e.g. ``{'instance-state-name': ['running']}``.
+        max_workers (int): (profile, region) pairs scanned at once.
+        page_size (int): Instances per ``describe_instances`` page (5-1000).
+        include_tags (bool): Keep each instance's full tag dict, not just its Name.
+        on_error (callable): Called with (profile, region, error) when a scan fails,
+            or with region None when a profile's enabled regions cannot be listed;
+            the other scans continue. Defaults to logging the error, with a
+            traceback for anything other than an AWS error.
+
+    Yields:
+        InstanceRecord: Instances in arrival order.
+    """
+    on_error = on_error or _log_error
+    targets = []
+    for profile in profiles:
+        if regions is not None:
+            targets.extend((profile, region) for region in regions)
+            continue
+        try:
+            targets.extend((profile, region) for region in enabled_regions(profile))
+        except Exception as e:  # noqa: BLE001 - reported through on_error like a failed scan
+            on_error(profile, None, e)
+    paginate_kwargs = {'PaginationConfig': {'PageSize': page_size}}
+    if filters:
+        paginate_kwargs['Filters'] = [{'Name': name, 'Values': list(values)} for name, values in filters.items()]
+    pages = queue.Queue(maxsize=max_workers * 2)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the consumer has stopped iterating.
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan(profile, region):
+        try:
+            paginator = get_client('ec2', region, profile).get_paginator('describe_instances')
+            for page in paginator.paginate(**paginate_kwargs):
+                records = [
+                    InstanceRecord.from_api(instance, region, profile, include_tags)
+                    for reservation in page['Reservations'] for instance in reservation['Instances']
+                ]
+                if records and not put(records):
+                    return
+        except Exception as e:  # noqa: BLE001 - the worker's future is never awaited
+            on_error(profile, region, e)
+        finally:
+            put(_DONE)
+
+    if not targets:
+        return
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(targets)), thread_name_prefix='ec2-inventory')
+    try:
+        for profile, region in targets:
+            pool.submit(scan, profile, region)
+        remaining = len(targets)
+        while remaining:
+            item = pages.get()
+            if item is _DONE:
+                remaining -= 1
+            else:
+                yield from item
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def list_instances(regions=None, profiles=(None,), filters: dict | None = None, **kwargs) -> list:
+    """
+    Collects ``iter_instances`` into a list.
+
+    Returns:
+        list: InstanceRecord objects from every scanned region.
+    """
+    return list(iter_instances(regions, profiles, filters, **kwargs))
@@ -0,0 +1,300 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from botocore import xform_name
+from botocore.exceptions import BotoCoreError, ClientError
+
+from aws_management.src.utils.config import get_client
+from aws_management.src.utils.logging import aws_fields, get_logger
+
+logger = get_logger(__name__)
+
+# Paginated describe operation and result key for each inventory resource type.
+RESOURCES = {
+    'instances': ('DescribeDBInstances', 'DBInstances'),
+    'clusters': ('DescribeDBClusters', 'DBClusters'),
+    'snapshots': ('DescribeDBSnapshots', 'DBSnapshots'),
+    'cluster_snapshots': ('DescribeDBClusterSnapshots', 'DBClusterSnapshots'),
+}
+
+# GetMetricData accepts at most this many queries per call.
+MAX_METRIC_QUERIES = 500
+
+DEFAULT_METRICS = (
+    'CPUUtilization', 'FreeableMemory', 'DatabaseConnections',
+    'ReadIOPS', 'WriteIOPS', 'ReadLatency', 'WriteLatency', 'FreeStorageSpace',
+)
+
+
+def _log_error(profile, region, error, operation=None):
+    logger.error("Error describing RDS resources in %s (%s): %s", region, profile or 'default', error, extra={
+        'service': 'rds', 'operation': operation, 'region': region, 'profile': profile, **aws_fields(error),
+    })
+
+
+def _describe(resource, profile, region):
+    operation, key = RESOURCES[resource]
+    paginator = get_client('rds', region, profile).get_paginator(xform_name(operation))
+    items = []
+    for page in paginator.paginate(PaginationConfig={'PageSize': 100}):
+        for item in page[key]:
+            item['Region'] = region
+            item['Profile'] = profile
+            items.append(item)
+    return items
+
+
+def inventory(regions, profiles=(None,), resources=tuple(RESOURCES),
+              max_workers: int = 16, on_error=None) -> dict:
+    """
+    Describes RDS resources across regions and credential sets concurrently.
+
+    Every (resource, profile, region) combination is paged on its own worker
+    thread, so the total time is close to that of the slowest single listing.
+
+    Args:
+        regions (list): Regions to scan.
+        profiles (iterable): Registry profiles to scan with; None is the default credential chain.
+        resources (iterable): Keys of ``RESOURCES`` to list; all of them by default,
+            cluster snapshots included.
+        max_workers (int): Listings run at once.
+        on_error (callable): Called with (profile, region, error) when a listing
+            fails; the others continue. Defaults to logging the error.
+
+    Returns:
+        dict: Resource name to a list of API dicts, each with added 'Region'
+        and 'Profile' keys.
+    """
+    results = {resource: [] for resource in resources}
+    targets = [(resource, profile, region) for resource in resources for profile in profiles for region in regions]
+    if not targets:
+        return results
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets))) as pool:
+        futures = {pool.submit(_describe, *target): target for target in targets}
+        for future in as_completed(futures):
+            resource, profile, region = futures[future]
+            try:
+                results[resource].extend(future.result())
+            except (ClientError, BotoCoreError) as e:
+                if on_error is None:
+                    _log_error(profile, region, e, RESOURCES[resource][0])
+                else:
+                    on_error(profile, region, e)
+    return results
+
+
+@dataclass
+class SnapshotCopy:
+    """Outcome of copying one snapshot."""
+
+    source: str
+    target: str
+    status: str = 'pending'
+    error: str | None = None
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    @property
+    def ok(self) -> bool:
+        """True once the copy is available in the destination region."""
+        return self.status == 'available'
+
+    @property
+    def elapsed(self) -> float | None:
+        """Seconds from starting the copy to its completion, or None while it is unfinished."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class CopyReport:
+    """Per-snapshot results of ``copy_snapshots``, plus the describe calls spent polling."""
+
+    copies: list = field(default_factory=list)
+    polls: int = 0
+
+    @property
+    def failed(self) -> list:
+        """Copies that did not become available: failed, timed out or still running."""
+        return [c for c in self.copies if not c.ok]
+
+
+def _target_name(source: str) -> str:
+    # Snapshot ARNs end in ':snapshot:<name>'.
+    return f"{source.rsplit(':', 1)[-1]}-copy"
+
+
+def copy_snapshots(snapshots, destination_region: str, source_region: str | None = None,
+                   target_name=_target_name, kms_key_id: str | None = None, copy_tags: bool = True,
+                   max_in_flight: int = 5, poll_interval: float = 5.0, max_poll_interval: float = 60.0,
+                   timeout: float = 6 * 3600, profile: str | None = None, sleep=time.sleep) -> CopyReport:
+    """
+    Copies many DB snapshots to another region, keeping a bounded number in flight.
+
+    RDS limits concurrent cross-region copies per account, so at most
+    ``max_in_flight`` copies are running at a time; a new one starts as soon
+    as one finishes. All running copies are checked with a single
+    ``describe_db_snapshots`` call per poll. The poll interval doubles (with
+    jitter) while nothing changes, up to ``max_poll_interval``, and drops back
+    to ``poll_interval`` when a copy completes.
+
+    Args:
+        snapshots (iterable): Source snapshot ARNs.
+        destination_region (str): Region to copy into.
+        source_region (str): Region of the source snapshots, for the presigned copy URL;
+            None for same-region copies.
+        target_name (callable): Maps a source ARN to the target snapshot identifier.
+        kms_key_id (str): KMS key in the destination region, required for encrypted snapshots.
+        copy_tags (bool): Copy the source snapshot's tags.
+        max_in_flight (int): Copies running at once.
+        poll_interval (float): Initial seconds between status checks.
+        max_poll_interval (float): Upper bound on the seconds between status checks.
+        timeout (float): Seconds after which copies still running are reported as timed out.
+        profile (str): Registry profile to act as.
+        sleep (callable): Sleep function, injectable for tests.
+
+    Returns:
+        CopyReport: One SnapshotCopy per source, in input order.
+    """
+    client = get_client('rds', destination_region, profile)
+    report = CopyReport(copies=[SnapshotCopy(source, target_name(source)) for source in snapshots])
+    pending = list(reversed(report.copies))
+    running = {}
+    deadline = time.monotonic() + timeout
+    interval = poll_interval
+
+    def start(copy):
+        kwargs = {
+            'SourceDBSnapshotIdentifier': copy.source,
+            'TargetDBSnapshotIdentifier': copy.target,
+            'CopyTags': copy_tags,
+        }
+        if source_region is not None:
+            kwargs['SourceRegion'] = source_region
+        if kms_key_id is not None:
+            kwargs['KmsKeyId'] = kms_key_id
+        copy.started_at = time.monotonic()
+        try:
+            copy.status = client.copy_db_snapshot(**kwargs)['DBSnapshot']['Status']
+        except (ClientError, BotoCoreError) as e:
+            copy.status, copy.error, copy.finished_at = 'failed', str(e), time.monotonic()
+            return
+        if copy.status == 'available':
+            copy.finished_at = copy.started_at
+        else:
+            running[copy.target] = copy
+
+    while pending or running:
+        while pending and len(running) < max_in_flight:
+            start(pending.pop())
+        if not running:
+            continue
+        if time.monotonic() >= deadline:
+            for copy in running.values():
+                copy.status, copy.error = 'timeout', f"still {copy.status} after {timeout}s"
+            break
+        sleep(interval * random.uniform(0.8, 1.2))  # noqa: S311
+        report.polls += 1
+        try:
+            response = client.describe_db_snapshots(
+                Filters=[{'Name': 'db-snapshot-id', 'Values': list(running)}],
+            )
+        except (ClientError, BotoCoreError) as e:
+            logger.warning("Error polling snapshot copies in %s: %s", destination_region, e, extra={
+                'service': 'rds', 'operation': 'DescribeDBSnapshots', 'region': destination_region,
+                **aws_fields(e),
+            })
+            interval = min(max_poll_interval, interval * 2)
+            continue
+        finished = False
+        for snapshot in response['DBSnapshots']:
+            copy = running.get(snapshot['DBSnapshotIdentifier'])
+            if copy is None:
+                continue
+            copy.status = snapshot['Status']
+            if copy.status in ('available', 'failed', 'incompatible-parameters'):
+                copy.finished_at = time.monotonic()
+                del running[copy.target]
+                finished = True
+        interval = poll_interval if finished else min(max_poll_interval, interval * 2)
+    return report
+
+
+def _metric_queries(instance_ids, metrics, period, stat):
+    """Yields (query id, instance id, metric name, query) for every pair."""
+    n = 0
+    for instance_id in instance_ids:
+        for metric in metrics:
+            query = {
+                'Id': f"m{n}",
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/RDS',
+                        'MetricName': metric,
+                        'Dimensions': [{'Name': 'DBInstanceIdentifier', 'Value': instance_id}],
+                    },
+                    'Period': period,
+                    'Stat': stat,
+                },
+                'ReturnData': True,
+            }
+            yield query['Id'], instance_id, metric, query
+            n += 1
+
+
+def _fetch_metric_batch(client, queries, start_time, end_time):
+    paginator = client.get_paginator('get_metric_data')
+    results = {}
+    for page in paginator.paginate(MetricDataQueries=queries, StartTime=start_time, EndTime=end_time):
+        for result in page['MetricDataResults']:
+            points = results.setdefault(result['Id'], [])
+            points.extend(zip(result['Timestamps'], result['Values'], strict=True))
+    return results
+
+
+def get_instance_metrics(instance_ids, start_time, end_time, metrics=DEFAULT_METRICS, period: int = 300,
+                         stat: str = 'Average', region: str | None = None, profile: str | None = None,
+                         max_workers: int = 4) -> dict:
+    """
+    Retrieves CloudWatch metrics for many DB instances with batched GetMetricData calls.
+
+    One query per (instance, metric) pair is packed into calls of up to 500
+    queries, instead of one ``get_metric_statistics`` call per pair. Batches
+    are fetched concurrently and each is paginated.
+
+    Args:
+        instance_ids (iterable): DB instance identifiers.
+        start_time (datetime): Start of the time range.
+        end_time (datetime): End of the time range.
+        metrics (iterable): AWS/RDS metric names.
+        period (int): Seconds per data point.
+        stat (str): Statistic, e.g. 'Average', 'Maximum' or 'p99'.
+        region (str): Region of the instances.
+        profile (str): Registry profile to act as.
+        max_workers (int): Batches fetched at once.
+
+    Returns:
+        dict: Instance id to a dict of metric name to a list of (timestamp, value)
+        pairs sorted by timestamp. Pairs with no data have an empty list.
+    """
+    client = get_client('cloudwatch', region, profile)
+    series = {}
+    targets = {}
+    queries = []
+    for query_id, instance_id, metric, query in _metric_queries(instance_ids, tuple(metrics), period, stat):
+        series.setdefault(instance_id, {})[metric] = []
+        targets[query_id] = (instance_id, metric)
+        queries.append(query)
+    batches = [queries[i:i + MAX_METRIC_QUERIES] for i in range(0, len(queries), MAX_METRIC_QUERIES)]
+    if not batches:
+        return series
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        futures = [pool.submit(_fetch_metric_batch, client, batch, start_time, end_time) for batch in batches]
+        for future in as_completed(futures):
+            for query_id, points in future.result().items():
+                instance_id, metric = targets[query_id]
+                series[instance_id][metric] = sorted(points)
+    return series
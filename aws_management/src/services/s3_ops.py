@@ -1,31 +1,59 @@
-import boto3
+import hashlib
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
+from s3transfer.utils import ChunksizeAdjuster
+
+from aws_management.src.utils.config import get_client
+from aws_management.src.utils.logging import aws_fields, get_logger
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+# Part size and per-file part concurrency for managed uploads and downloads.
+DEFAULT_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * MB,
+    multipart_chunksize=16 * MB,
+    max_concurrency=8,
+)
+# Bytes each download worker reads per call; bounds memory per worker.
+READ_CHUNK_SIZE = 256 * 1024
+
 
 def create_bucket(bucket_name, region=None):
     """
-    Create an S3 bucket in a specified region
+    Create an S3 bucket in a specified region.
 
     :param bucket_name: Bucket to create
     :param region: String region to create bucket in, e.g., 'us-west-2'
     :return: True if bucket created, else False
     """
     try:
+        s3_client = get_client('s3', region)
         if region is None:
-            s3_client = boto3.client('s3')
             s3_client.create_bucket(Bucket=bucket_name)
         else:
-            s3_client = boto3.client('s3', region_name=region)
             location = {'LocationConstraint': region}
             s3_client.create_bucket(Bucket=bucket_name,
                                     CreateBucketConfiguration=location)
     except ClientError as e:
-        print(f"Error creating bucket: {e}")
+        logger.exception("Error creating bucket", extra={
+            'service': 's3', 'operation': 'CreateBucket', 'bucket': bucket_name, **aws_fields(e),
+        })
         return False
     return True
 
 def upload_file(file_name, bucket, object_name=None):
     """
-    Upload a file to an S3 bucket
+    Upload a file to an S3 bucket.
 
     :param file_name: File to upload
     :param bucket: Bucket to upload to
@@ -37,10 +65,300 @@ def upload_file(file_name, bucket, object_name=None):
         object_name = file_name
 
     # Upload the file
-    s3_client = boto3.client('s3')
+    s3_client = get_client('s3')
     try:
         s3_client.upload_file(file_name, bucket, object_name)
     except ClientError as e:
-        print(f"Error uploading file: {e}")
+        logger.exception("Error uploading file", extra={
+            'service': 's3', 'operation': 'UploadFile', 'bucket': bucket, 'key': object_name, **aws_fields(e),
+        })
         return False
-    return True
\ No newline at end of file
+    return True
+
+
+def upload_fileobj(fileobj, bucket, object_name, extra_args=None, transfer_config=None):
+    """
+    Upload a readable binary file-like object, e.g. an in-memory buffer, to an S3 bucket.
+
+    :param fileobj: Object with a ``read`` method, read from its current position
+    :param bucket: Bucket to upload to
+    :param object_name: S3 object name
+    :param extra_args: Optional ExtraArgs for the upload, e.g. {'ContentType': 'image/png'}
+    :param transfer_config: TransferConfig for multipart uploads (default: DEFAULT_TRANSFER_CONFIG)
+    :return: True if the object was uploaded, else False
+    """
+    s3_client = get_client('s3')
+    try:
+        s3_client.upload_fileobj(fileobj, bucket, object_name, ExtraArgs=extra_args,
+                                 Config=transfer_config or DEFAULT_TRANSFER_CONFIG)
+    except (ClientError, S3UploadFailedError) as e:
+        logger.exception("Error uploading object", extra={
+            'service': 's3', 'operation': 'UploadFileobj', 'bucket': bucket, 'key': object_name, **aws_fields(e),
+        })
+        return False
+    return True
+
+
+def list_object_index(bucket, prefix=''):
+    """
+    Index the objects under a prefix with a paginated list_objects_v2 scan.
+
+    :param bucket: Bucket to list
+    :param prefix: Only index keys starting with this prefix
+    :return: Dict mapping each key to a (size, etag) tuple, etag without quotes
+    """
+    paginator = get_client('s3').get_paginator('list_objects_v2')
+    index = {}
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', ()):
+            index[obj['Key']] = (obj['Size'], obj['ETag'].strip('"'))
+    return index
+
+
+def compute_etag(file_name, transfer_config=DEFAULT_TRANSFER_CONFIG):
+    """
+    Compute the ETag S3 assigns to a file uploaded with a TransferConfig.
+
+    Files below the multipart threshold get the MD5 of their content; larger
+    files get the MD5 of the concatenated part MD5s, suffixed with the part count.
+
+    :param file_name: Local file to hash
+    :param transfer_config: TransferConfig the file is (or was) uploaded with
+    :return: The expected ETag, without quotes
+    """
+    size = os.path.getsize(file_name)
+    with open(file_name, 'rb') as f:
+        if size < transfer_config.multipart_threshold:
+            return hashlib.md5(f.read(), usedforsecurity=False).hexdigest()
+        part_size = ChunksizeAdjuster().adjust_chunksize(transfer_config.multipart_chunksize, size)
+        digests = [
+            hashlib.md5(chunk, usedforsecurity=False).digest()
+            for chunk in iter(lambda: f.read(part_size), b'')
+        ]
+    combined = hashlib.md5(b''.join(digests), usedforsecurity=False).hexdigest()
+    return f"{combined}-{len(digests)}"
+
+
+@dataclass
+class SyncReport:
+    """
+    Outcome of an upload_directory or sync_to_s3 run.
+
+    :ivar uploaded: Keys that were uploaded
+    :ivar skipped: Keys left alone because the object was unchanged
+    :ivar failed: Keys that failed, mapped to their error
+    :ivar bytes_transferred: Bytes uploaded, as reported by the transfer callbacks
+    :ivar elapsed: Wall-clock seconds for the whole run
+    """
+
+    uploaded: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+    failed: dict = field(default_factory=dict)
+    bytes_transferred: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def throughput_mbps(self):
+        """Aggregate upload throughput in MB/s."""
+        return self.bytes_transferred / MB / self.elapsed if self.elapsed else 0.0
+
+
+def _walk(local_dir, prefix):
+    for root, _, files in os.walk(local_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, local_dir).replace(os.sep, '/')
+            yield path, f"{prefix.rstrip('/')}/{relative}" if prefix else relative
+
+
+def sync_to_s3(local_dir, bucket, prefix='', transfer_config=None, max_workers=8,
+               skip_unchanged=True, progress=None):
+    """
+    Upload a local directory tree to S3 concurrently, skipping unchanged files.
+
+    Existing objects are indexed with one paginated list_objects_v2 scan. A file
+    is skipped when an object with the same size and the ETag the file would
+    produce already exists. The rest are uploaded by a pool of worker threads,
+    each running a managed (multipart when large) transfer.
+
+    :param local_dir: Directory to upload
+    :param bucket: Bucket to upload to
+    :param prefix: Key prefix for the uploaded objects
+    :param transfer_config: TransferConfig for part size and per-file concurrency
+    :param max_workers: Files uploaded at once
+    :param skip_unchanged: Skip files whose object is already up to date
+    :param progress: Optional callable(key, bytes_amount), called from worker threads
+    :return: SyncReport with per-file outcomes and aggregate throughput
+    """
+    transfer_config = transfer_config or DEFAULT_TRANSFER_CONFIG
+    s3_client = get_client('s3')
+    report = SyncReport()
+    lock = threading.Lock()
+    start = time.perf_counter()
+    remote = list_object_index(bucket, prefix) if skip_unchanged else {}
+
+    def unchanged(path, key):
+        existing = remote.get(key)
+        if existing is None or existing[0] != os.path.getsize(path):
+            return False
+        return existing[1] == compute_etag(path, transfer_config)
+
+    def upload(path, key):
+        def callback(bytes_amount):
+            with lock:
+                report.bytes_transferred += bytes_amount
+            if progress is not None:
+                progress(key, bytes_amount)
+
+        if skip_unchanged and unchanged(path, key):
+            return False
+        s3_client.upload_file(path, bucket, key, Config=transfer_config, Callback=callback)
+        return True
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(upload, path, key): key for path, key in _walk(local_dir, prefix)}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                if future.result():
+                    report.uploaded.append(key)
+                else:
+                    report.skipped.append(key)
+            except (ClientError, S3UploadFailedError, OSError) as e:
+                logger.exception("Error uploading file", extra={
+                    'service': 's3', 'operation': 'UploadFile', 'bucket': bucket, 'key': key, **aws_fields(e),
+                })
+                report.failed[key] = e
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def upload_directory(local_dir, bucket, prefix='', transfer_config=None, max_workers=8, progress=None):
+    """
+    Upload every file in a local directory tree to S3 concurrently.
+
+    :param local_dir: Directory to upload
+    :param bucket: Bucket to upload to
+    :param prefix: Key prefix for the uploaded objects
+    :param transfer_config: TransferConfig for part size and per-file concurrency
+    :param max_workers: Files uploaded at once
+    :param progress: Optional callable(key, bytes_amount), called from worker threads
+    :return: SyncReport with per-file outcomes and aggregate throughput
+    """
+    return sync_to_s3(local_dir, bucket, prefix, transfer_config, max_workers,
+                      skip_unchanged=False, progress=progress)
+
+
+def iter_lines(bucket, key, encoding='utf-8', chunk_size=READ_CHUNK_SIZE):
+    """
+    Stream an object line by line without loading it into memory.
+
+    :param bucket: Bucket holding the object
+    :param key: Object key
+    :param encoding: Text encoding to decode lines with, or None to yield bytes
+    :param chunk_size: Bytes read from the network at a time
+    :return: Generator of lines without their line endings
+    """
+    body = get_client('s3').get_object(Bucket=bucket, Key=key)['Body']
+    try:
+        for line in body.iter_lines(chunk_size=chunk_size):
+            yield line if encoding is None else line.decode(encoding)
+    finally:
+        body.close()
+
+
+SHORT_READ_ERROR = "Short read for s3://{bucket}/{key} bytes {start}-{end}"
+
+
+def download_ranged(bucket, key, file_name, part_size=DEFAULT_TRANSFER_CONFIG.multipart_chunksize,
+                    max_workers=8, chunk_size=READ_CHUNK_SIZE):
+    """
+    Download an object with parallel ranged GETs into a pre-allocated file.
+
+    The file is sized up front and each worker writes its byte range in place
+    with os.pwrite, one chunk at a time, so peak memory is
+    max_workers * chunk_size however large the object is. Ranges are fetched
+    with If-Match on the object's ETag so a concurrent overwrite fails the
+    download instead of mixing versions.
+
+    :param bucket: Bucket holding the object
+    :param key: Object key
+    :param file_name: Local file to write
+    :param part_size: Bytes per ranged GET
+    :param max_workers: Ranges fetched at once
+    :param chunk_size: Bytes buffered per worker
+    :return: The ETag of the downloaded object, without quotes
+    """
+    s3_client = get_client('s3')
+    head = s3_client.head_object(Bucket=bucket, Key=key)
+    size = head['ContentLength']
+    etag = head['ETag']
+
+    def fetch(fd, start):
+        end = min(start + part_size, size) - 1
+        body = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag)['Body']
+        offset = start
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                offset += os.pwrite(fd, chunk, offset)
+        finally:
+            body.close()
+        if offset != end + 1:
+            raise OSError(SHORT_READ_ERROR.format(bucket=bucket, key=key, start=start, end=end))
+
+    with open(file_name, 'wb') as f:
+        f.truncate(size)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # list() re-raises the first failed range.
+            list(pool.map(lambda start: fetch(f.fileno(), start), range(0, size, part_size)))
+    return etag.strip('"')
+
+
+def cached_download(bucket, key, cache_dir, **kwargs):
+    """
+    Return a local copy of an object, downloading it only if its ETag changed.
+
+    Copies are stored under cache_dir keyed by bucket, key and ETag, so a HEAD
+    request is the only network call for an unchanged object.
+
+    :param bucket: Bucket holding the object
+    :param key: Object key
+    :param cache_dir: Directory for cached copies
+    :param kwargs: Passed to download_ranged
+    :return: Path of the local copy
+    """
+    etag = get_client('s3').head_object(Bucket=bucket, Key=key)['ETag'].strip('"')
+    name = hashlib.sha256(f"{bucket}/{key}".encode()).hexdigest()
+    path = os.path.join(cache_dir, f"{name}-{etag}")
+    if os.path.exists(path):
+        return path
+    os.makedirs(cache_dir, exist_ok=True)
+    partial = f"{path}.{threading.get_ident()}.part"
+    try:
+        download_ranged(bucket, key, partial, **kwargs)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    for stale in os.listdir(cache_dir):
+        if stale.startswith(f"{name}-") and not stale.endswith('.part') and stale != os.path.basename(path):
+            os.remove(os.path.join(cache_dir, stale))
+    return path
+
+
+def mmap_object(bucket, key, cache_dir, **kwargs):
+    """
+    Memory-map a cached local copy of an object for zero-copy, read-only access.
+
+    :param bucket: Bucket holding the object
+    :param key: Object key
+    :param cache_dir: Directory for cached copies
+    :param kwargs: Passed to download_ranged
+    :return: A read-only mmap.mmap of the object, or b'' for an empty object
+        (which cannot be mapped); close a mapping when done
+    """
+    path = cached_download(bucket, key, cache_dir, **kwargs)
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
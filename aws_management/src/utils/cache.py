@@ -0,0 +1,210 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_key(*parts) -> str:
+    """
+    Returns a stable SHA-256 key for JSON-serializable ``parts``.
+
+    Dictionaries are serialized with sorted keys and compact separators, so two
+    requests that differ only in key order or whitespace share a key.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier, content-addressed LRU cache of byte strings.
+
+    Entries live in an in-memory LRU bounded by entry count and bytes. When
+    ``path`` is given they are also written to a SQLite database that survives
+    restarts; disk hits are promoted back into memory, and the disk tier is
+    trimmed least-recently-used first once it exceeds ``max_disk_bytes``. Every
+    entry expires ``ttl`` seconds after it was stored. All methods are
+    thread-safe; those that may touch disk block.
+
+    Args:
+        path (str): SQLite file for the disk tier, or None for memory only.
+        max_entries (int): Entries kept in memory.
+        max_bytes (int): Bytes kept in memory.
+        max_disk_bytes (int): Bytes kept on disk.
+        ttl (float): Seconds an entry stays valid, or None to keep entries until evicted.
+        clock (callable): Wall-clock time source, injectable for tests.
+    """
+
+    def __init__(self, path: str | None = None, max_entries: int = 1024,
+                 max_bytes: int = 64 * 1024 * 1024, max_disk_bytes: int = 1024 * 1024 * 1024,
+                 ttl: float | None = 24 * 3600, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._db = None
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.bytes_served = 0
+        self.bytes_stored = 0
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                'expires_at REAL, accessed_at REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+            self._db.execute('DELETE FROM entries WHERE expires_at < ?', (clock(),))
+            self._disk_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _remember(self, key: str, value: bytes, expires_at: float | None) -> None:
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old[0])
+        if len(value) > self.max_bytes:
+            return
+        self._memory[key] = (value, expires_at)
+        self._memory_bytes += len(value)
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def _forget(self, key: str) -> None:
+        value, _ = self._memory.pop(key)
+        self._memory_bytes -= len(value)
+
+    def get(self, key: str, memory_only: bool = False) -> bytes | None:
+        """
+        Returns the cached value for ``key``, or None on a miss.
+
+        Args:
+            key (str): The content key, usually from ``content_key``.
+            memory_only (bool): Check only the in-memory tier. A miss here is
+                not counted, so the caller can retry the disk tier off-thread.
+
+        Returns:
+            bytes | None: The cached value.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    self.bytes_served += len(value)
+                    return value
+                self._forget(key)
+            if memory_only and self._db is not None:
+                return None
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT value, expires_at FROM entries WHERE key = ?', (key,),
+                ).fetchone()
+                if row is not None:
+                    value, expires_at = row
+                    if expires_at is None or expires_at > now:
+                        self._db.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+                        self._remember(key, value, expires_at)
+                        self.disk_hits += 1
+                        self.bytes_served += len(value)
+                        return value
+                    self._delete_row(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: bytes) -> None:
+        """Stores ``value`` under ``key`` in memory and, if configured, on disk."""
+        now = self._clock()
+        expires_at = None if self.ttl is None else now + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self.bytes_stored += len(value)
+            if self._db is None:
+                return
+            self._delete_row(key)
+            self._db.execute(
+                'INSERT INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), expires_at, now),
+            )
+            self._disk_bytes += len(value)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._trim_disk(now)
+
+    def record_coalesced(self) -> None:
+        """Counts a lookup that joined another caller's in-flight fetch instead of missing."""
+        with self._lock:
+            self.coalesced += 1
+
+    def _delete_row(self, key: str) -> None:
+        row = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._disk_bytes -= row[0]
+
+    def _trim_disk(self, now: float) -> None:
+        self._db.execute('DELETE FROM entries WHERE expires_at < ?', (now,))
+        self._disk_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        rows = self._db.execute('SELECT key, size FROM entries ORDER BY accessed_at')
+        evict = []
+        for key, size in rows:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            evict.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany('DELETE FROM entries WHERE key = ?', evict)
+        self.evictions += len(evict)
+
+    def clear(self) -> None:
+        """Removes every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute('DELETE FROM entries')
+                self._disk_bytes = 0
+
+    def close(self) -> None:
+        """Closes the disk tier's database connection."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        """
+        Returns the cache's counters.
+
+        Returns:
+            dict: Hit, miss, coalescing and eviction counts plus byte totals.
+        """
+        with self._lock:
+            return {
+                'hits': self.memory_hits + self.disk_hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+                'bytes_served': self.bytes_served,
+                'bytes_stored': self.bytes_stored,
+            }
@@ -0,0 +1,247 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import boto3
+from botocore.config import Config
+
+from aws_management.src.utils.metrics import metrics
+
+# Connections kept per client; should cover the threads that share a client.
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "64"))
+
+DEFAULT_CLIENT_CONFIG = Config(
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=60,
+    retries={'max_attempts': 3, 'mode': 'standard'},
+)
+
+# Set to 0 to build clients without latency/retry instrumentation.
+AWS_CLIENT_METRICS = os.environ.get("AWS_CLIENT_METRICS", "1") != "0"
+
+# Per-service adjustments merged over DEFAULT_CLIENT_CONFIG.
+SERVICE_CLIENT_CONFIGS = {
+    # Long completions and streamed responses can stay open for minutes.
+    'bedrock-runtime': Config(read_timeout=300),
+}
+
+
+class ClientRegistry:
+    """
+    Lazily created, shared boto3 clients keyed by (service, region, profile).
+
+    boto3 clients are thread-safe once built, but building one is slow (endpoint
+    resolution, credential lookup) and sessions are not safe to share while
+    clients are being created. The registry builds each client once, under a
+    lock, from one Session per profile, using a tuned ``botocore.config.Config``,
+    and hands the same instance to every caller so connections are reused.
+
+    Every client it builds is attached to ``instrumentation``; tests inject
+    stubbed clients with ``override``.
+
+    Args:
+        config (Config): Base client configuration.
+        service_configs (dict): Per-service Config objects merged over ``config``.
+        instrumentation (Instrumentation): Collector attached to each new client;
+            defaults to the package-wide ``metrics`` unless AWS_CLIENT_METRICS=0.
+    """
+
+    def __init__(self, config: Config = DEFAULT_CLIENT_CONFIG, service_configs: dict | None = None,
+                 instrumentation=None):
+        self.config = config
+        self.service_configs = SERVICE_CLIENT_CONFIGS if service_configs is None else service_configs
+        if instrumentation is None and AWS_CLIENT_METRICS:
+            instrumentation = metrics
+        self.instrumentation = instrumentation
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._registered_sessions = {}
+        self._clients = {}
+        self._overrides = {}
+
+    def session(self, profile: str | None = None) -> boto3.Session:
+        """
+        Returns the shared Session for ``profile``.
+
+        Args:
+            profile (str): Named AWS profile, or None for the default credential chain.
+
+        Returns:
+            boto3.Session: The session clients for ``profile`` are built from.
+        """
+        with self._lock:
+            return self._session(profile)
+
+    def _session(self, profile: str | None) -> boto3.Session:
+        session = self._registered_sessions.get(profile) or self._sessions.get(profile)
+        if session is None:
+            session = self._sessions[profile] = boto3.Session(profile_name=profile)
+        return session
+
+    def add_session(self, name: str, session: boto3.Session) -> None:
+        """
+        Registers ``session`` under the profile label ``name``.
+
+        Clients requested with ``profile=name`` are then built from it; any
+        already built for that label are dropped.
+        """
+        with self._lock:
+            self._registered_sessions[name] = session
+            for key in [key for key in self._clients if key[2] == name]:
+                del self._clients[key]
+
+    def remove_session(self, name: str, session: boto3.Session | None = None) -> None:
+        """
+        Removes the session registered under ``name`` and the clients built from it.
+
+        If ``session`` is given, nothing happens unless it is still the one
+        registered, so a label taken over by a newer session is left alone.
+        """
+        with self._lock:
+            registered = self._registered_sessions.get(name)
+            if registered is None or (session is not None and registered is not session):
+                return
+            del self._registered_sessions[name]
+            for key in [key for key in self._clients if key[2] == name]:
+                del self._clients[key]
+
+    def client(self, service: str, region: str | None = None, profile: str | None = None):
+        """
+        Returns the shared client for ``service`` in ``region`` under ``profile``.
+
+        Args:
+            service (str): The boto3 service name, e.g. 's3' or 'bedrock-runtime'.
+            region (str): Region name, or None for the profile's default region.
+            profile (str): Named AWS profile, or None for the default credential chain.
+
+        Returns:
+            botocore.client.BaseClient: The client, created on first use.
+        """
+        key = (service, region, profile)
+        client = self._overrides.get(key) or self._overrides.get((service, None, profile))
+        if client is not None:
+            return client
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                config = self.config
+                if service in self.service_configs:
+                    config = config.merge(self.service_configs[service])
+                client = self._session(profile).client(service, region_name=region, config=config)
+                if self.instrumentation is not None:
+                    self.instrumentation.attach(client)
+                self._clients[key] = client
+            return client
+
+    def register(self, service: str, client, region: str | None = None, profile: str | None = None) -> None:
+        """
+        Installs ``client`` in place of the one the registry would build.
+
+        An override registered without a region is returned for every region.
+        """
+        self._overrides[(service, region, profile)] = client
+
+    def unregister(self, service: str, region: str | None = None, profile: str | None = None) -> None:
+        """Removes an override installed with ``register``."""
+        self._overrides.pop((service, region, profile), None)
+
+    @contextmanager
+    def override(self, service: str, client, region: str | None = None, profile: str | None = None):
+        """
+        Temporarily installs ``client``, e.g. a Stubber-wrapped or moto-backed client.
+
+        Args:
+            service (str): The boto3 service name to override.
+            client: The client to return instead.
+            region (str): Region to override, or None for every region.
+            profile (str): Profile to override.
+
+        Yields:
+            The injected client.
+        """
+        key = (service, region, profile)
+        previous = self._overrides.get(key)
+        self._overrides[key] = client
+        try:
+            yield client
+        finally:
+            if previous is None:
+                self._overrides.pop(key, None)
+            else:
+                self._overrides[key] = previous
+
+    def clear(self) -> None:
+        """Drops every cached client and profile session; overrides and added sessions are kept."""
+        with self._lock:
+            self._clients.clear()
+            self._sessions.clear()
+
+
+registry = ClientRegistry()
+
+
+def get_client(service: str, region: str | None = None, profile: str | None = None):
+    """
+    Returns the shared client for ``service`` from the package's ClientRegistry.
+
+    Args:
+        service (str): The boto3 service name.
+        region (str): Region name, or None for the default region.
+        profile (str): Named AWS profile, or None for the default credential chain.
+
+    Returns:
+        botocore.client.BaseClient: The shared client.
+    """
+    return registry.client(service, region, profile)
+
+
+def load_users(raw: str | None = None) -> dict:
+    """
+    Parses the ``USERS`` credential sets described in .env.example.
+
+    Args:
+        raw (str): JSON to parse, or None to read the USERS environment variable.
+
+    Returns:
+        dict: User name to a dict of AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY and
+        AWS_DEFAULT_REGION; empty if USERS is not set.
+    """
+    raw = os.environ.get("USERS") if raw is None else raw
+    return json.loads(raw) if raw else {}
+
+
+# TenantPool behind the sessions added by register_users, if it has been called.
+tenant_pool = None
+
+
+def register_users(users: dict | None = None) -> list:
+    """
+    Adds one registry session per ``USERS`` credential set.
+
+    Afterwards ``get_client(service, region, profile=<user name>)`` acts as that user.
+    The sessions come from a started ``TenantPool``, kept in ``tenant_pool``:
+    entries with AWS_ROLE_ARN get assumed-role sessions that it renews in the
+    background, and its ``slot``/``run`` enforce per-tenant quotas. Calling
+    this again replaces the previous pool: its refresher is stopped and the
+    sessions of users no longer listed are removed from the registry.
+
+    Args:
+        users (dict): Parsed credential sets, or None to read them with ``load_users``.
+
+    Returns:
+        list: The registered user names, usable as ``profile`` values.
+    """
+    global tenant_pool
+    from aws_management.src.utils.tenants import TenantPool
+
+    previous = tenant_pool
+    tenant_pool = TenantPool(users, registry=registry).start()
+    if previous is not None:
+        previous.detach()
+    return list(tenant_pool.tenants)
@@ -0,0 +1,229 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Root of every logger in the package; services log to children of it.
+PACKAGE_LOGGER = 'aws_management'
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+# Fraction of DEBUG records kept; see SamplingFilter.
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# Attributes every LogRecord has; anything else was passed with ``extra``.
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects.
+
+    Besides the timestamp, level, logger name and message, every field passed
+    with ``extra`` is included, e.g. request_id, service, operation,
+    latency_ms and retries. Values that are not JSON types are converted with
+    ``str``.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != 'sample_rate':
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random fraction of high-volume records.
+
+    Records at or below ``max_level`` are kept with probability ``rate``. A
+    record logged with ``extra={'sample_rate': r}`` is kept with probability
+    ``r`` whatever its level, so individual hot-path events can be sampled
+    while errors always get through.
+
+    Args:
+        rate (float): Fraction of records at or below ``max_level`` to keep.
+        max_level (int): Highest level subject to ``rate``.
+    """
+
+    def __init__(self, rate: float = 1.0, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, 'sample_rate', None)
+        if rate is None:
+            if record.levelno > self.max_level:
+                return True
+            rate = self.rate
+        return rate >= 1.0 or random.random() < rate  # noqa: S311
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks or formats in the logging thread.
+
+    The stock handler formats each record before enqueueing it. This one
+    enqueues the record as-is, so ``%`` arguments are only interpolated on
+    the listener thread, and drops records (counting them in ``dropped``)
+    instead of blocking when the queue is full. Arguments should therefore
+    be values that are not mutated after the call.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class Lazy:
+    """
+    Defers an expensive log argument until the record is actually formatted.
+
+    ``logger.debug("body %s", Lazy(json.dumps, body))`` costs nothing when
+    DEBUG is disabled or the record is sampled out.
+    """
+
+    __slots__ = ('fn', 'args')
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self):
+        return str(self.fn(*self.args))
+
+
+def aws_fields(response) -> dict:
+    """
+    Extracts the request ID, retry count and HTTP status of an AWS call.
+
+    Args:
+        response: A boto3 response dict, or a botocore ClientError.
+
+    Returns:
+        dict: request_id, retries and http_status, for use as logging ``extra``.
+    """
+    response = getattr(response, 'response', response)
+    if not isinstance(response, dict):
+        return {}
+    metadata = response.get('ResponseMetadata', {})
+    return {
+        'request_id': metadata.get('RequestId'),
+        'retries': metadata.get('RetryAttempts', 0),
+        'http_status': metadata.get('HTTPStatusCode'),
+    }
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room rather than fail when the queue is full at shutdown.
+        self.queue.put(self._sentinel)
+
+
+_lock = threading.RLock()
+_handler = None
+_listener = None
+
+
+def configure_logging(level: str | int | None = None, stream=None, sample_rate: float | None = None,
+                      formatter: logging.Formatter | None = None, queue_size: int | None = None) -> NonBlockingQueueHandler:
+    """
+    Routes the package's logs through a queue to a background writer thread.
+
+    Services log to children of the ``aws_management`` logger. Their records
+    are put on a bounded queue by a NonBlockingQueueHandler and written by a
+    QueueListener thread, so logging in a request path never waits on I/O.
+    Nothing is configured on import: the CLI and daemon call this, and an
+    application embedding the package may call it or keep its own handlers,
+    which otherwise receive the package's records as usual. Calling this
+    again replaces the previous configuration.
+
+    Args:
+        level (str | int): Package log level; defaults to the LOG_LEVEL environment variable.
+        stream: Where lines are written; defaults to stderr.
+        sample_rate (float): Fraction of DEBUG records kept; defaults to LOG_SAMPLE_RATE.
+        formatter (logging.Formatter): Line format; defaults to JsonFormatter.
+        queue_size (int): Records buffered before new ones are dropped.
+
+    Returns:
+        NonBlockingQueueHandler: The installed handler.
+    """
+    global _handler, _listener
+    with _lock:
+        _stop()
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(formatter or JsonFormatter())
+        handler = NonBlockingQueueHandler(queue.Queue(queue_size or LOG_QUEUE_SIZE))
+        handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE if sample_rate is None else sample_rate))
+        logger = logging.getLogger(PACKAGE_LOGGER)
+        logger.setLevel(level or LOG_LEVEL)
+        logger.addHandler(handler)
+        logger.propagate = False
+        _listener = _QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        _handler = handler
+        return handler
+
+
+def _stop() -> None:
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        logger = logging.getLogger(PACKAGE_LOGGER)
+        logger.removeHandler(_handler)
+        logger.setLevel(logging.NOTSET)
+        logger.propagate = True
+        _handler = _listener = None
+
+
+def logging_configured() -> bool:
+    """Returns True if ``configure_logging`` is in effect."""
+    return _handler is not None
+
+
+def shutdown_logging() -> None:
+    """Writes out queued records, stops the background writer and restores default propagation."""
+    with _lock:
+        _stop()
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns the logger for a package module.
+
+    No handlers are installed; see ``configure_logging``.
+
+    Args:
+        name (str): The module's ``__name__``.
+
+    Returns:
+        logging.Logger: A child of the ``aws_management`` logger.
+    """
+    return logging.getLogger(name)
@@ -0,0 +1,318 @@
+import threading
+import time
+
+# Error codes counted as throttles.
+THROTTLING_ERRORS = frozenset({
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'TooManyRequestsException',
+    'RequestThrottled', 'RequestThrottledException', 'SlowDown', 'RequestLimitExceeded',
+    'ProvisionedThroughputExceededException', 'BandwidthLimitExceeded',
+})
+
+# Bucket bounds, in seconds, of the Prometheus histogram exposition.
+PROMETHEUS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_SUB_BITS = 4
+_SUB_COUNT = 1 << _SUB_BITS
+_LINEAR = 2 * _SUB_COUNT
+_MAX_VALUE = (1 << 36) - 1  # microseconds, about 19 hours
+
+
+def _bucket(value: int) -> int:
+    if value < _LINEAR:
+        return value
+    shift = value.bit_length() - _SUB_BITS - 1
+    return _LINEAR + (shift - 1) * _SUB_COUNT + (value >> shift) - _SUB_COUNT
+
+
+def _bucket_bounds(index: int) -> tuple:
+    """Returns the [low, high) microsecond range of bucket ``index``."""
+    if index < _LINEAR:
+        return index, index + 1
+    shift, sub = divmod(index - _LINEAR, _SUB_COUNT)
+    shift += 1
+    low = (sub + _SUB_COUNT) << shift
+    return low, low + (1 << shift)
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies in microseconds.
+
+    Values below 32us get exact buckets; above that every power of two is
+    split into 16 linear sub-buckets, so any recorded value is known to
+    within 1/16 (about 6%) while the whole range up to ~19 hours fits in
+    fewer than 550 counters. Recording is a bit_length, a shift and an
+    increment.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (_bucket(_MAX_VALUE) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, micros: int) -> None:
+        """Adds one observation of ``micros`` microseconds."""
+        with self._lock:
+            self._record(micros)
+
+    def _record(self, micros: int) -> None:
+        # Caller holds self._lock.
+        if micros > _MAX_VALUE:
+            micros = _MAX_VALUE
+        elif micros < 0:
+            micros = 0
+        self.counts[micros if micros < _LINEAR else _bucket(micros)] += 1
+        self.count += 1
+        self.total += micros
+        if micros > self.max:
+            self.max = micros
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns the ``q``-th percentile (0-100) in microseconds.
+
+        The midpoint of the bucket holding the percentile is returned, capped
+        at the largest recorded value.
+        """
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, round(q / 100 * self.count))
+            seen = 0
+            for index, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank:
+                    low, high = _bucket_bounds(index)
+                    return min(float(self.max), (low + high - 1) / 2)
+            return float(self.max)
+
+    def cumulative(self, bounds) -> list:
+        """
+        Returns the number of observations at or below each bound.
+
+        Args:
+            bounds (iterable): Ascending upper bounds in microseconds.
+
+        Returns:
+            list: One cumulative count per bound. Counts are exact up to the
+            bucket resolution around each bound.
+        """
+        with self._lock:
+            counts = list(self.counts)
+        result = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            while index < len(counts) and _bucket_bounds(index)[1] <= bound + 1:
+                seen += counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+class OperationStats:
+    """Counters and latency histogram for one (service, operation) pair."""
+
+    __slots__ = ('_lock', 'latency', 'calls', 'errors', 'retries', 'throttles', 'request_bytes', 'response_bytes')
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        # One lock for the histogram and the counters keeps observe() cheap.
+        self._lock = self.latency._lock
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def observe(self, micros: int, error: bool, retries: int, request_bytes: int, response_bytes: int) -> None:
+        """Records one completed call."""
+        with self._lock:
+            self.latency._record(micros)
+            self.calls += 1
+            self.errors += error
+            self.retries += retries
+            self.request_bytes += request_bytes
+            self.response_bytes += response_bytes
+
+    def throttled(self) -> None:
+        """Records one throttled attempt."""
+        with self._lock:
+            self.throttles += 1
+
+
+def _body_size(body) -> int:
+    if isinstance(body, bytes | bytearray | str):
+        return len(body)
+    if hasattr(body, 'seekable') and body.seekable():
+        # e.g. the BytesIO or file S3 wraps PutObject/UploadPart bodies in.
+        position = body.tell()
+        size = body.seek(0, 2) - position
+        body.seek(position)
+        return size
+    return 0
+
+
+class Instrumentation:
+    """
+    Per-operation latency, retry, throttle and byte counts for boto3 clients.
+
+    ``attach`` registers handlers on a client's ``before-call``,
+    ``after-call``, ``after-call-error`` and ``needs-retry`` events. Latency
+    covers the whole call as the caller sees it, retries included.
+    Throttles count every throttled attempt, retried or not; retries are
+    taken from the response metadata. Request bytes are counted for
+    in-memory bodies and response bytes from Content-Length, so streaming
+    bodies are never read.
+
+    The ClientRegistry attaches the package-wide ``metrics`` instance to
+    every client it builds.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {}
+        # OperationModel objects are cached per client, so they make a cheap lookup key.
+        self._by_model = {}
+
+    def _for_model(self, model) -> OperationStats:
+        stats = self._by_model.get(model)
+        if stats is None:
+            stats = self._by_model[model] = self._get(model.service_model.service_name, model.name)
+        return stats
+
+    def _get(self, service: str, operation: str) -> OperationStats:
+        key = (service, operation)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(key, OperationStats())
+        return stats
+
+    def attach(self, client) -> None:
+        """Instruments ``client``; attaching the same client twice has no extra effect."""
+        events = client.meta.events
+        events.register('before-call', self._before_call, unique_id='aws-management-metrics-before-call')
+        events.register('after-call', self._after_call, unique_id='aws-management-metrics-after-call')
+        events.register('after-call-error', self._after_call_error, unique_id='aws-management-metrics-after-call-error')
+        events.register('needs-retry', self._needs_retry, unique_id='aws-management-metrics-needs-retry')
+
+    def _before_call(self, model, params, context, **kwargs):
+        context['metrics_started'] = self._clock()
+        context['metrics_request_bytes'] = _body_size(params.get('body'))
+
+    def _finish(self, model, context, error: bool, retries: int = 0, response_bytes: int = 0):
+        started = context.get('metrics_started')
+        if started is None:
+            return
+        self._for_model(model).observe(
+            int((self._clock() - started) * 1_000_000), error, retries,
+            context.get('metrics_request_bytes', 0), response_bytes,
+        )
+
+    def _after_call(self, http_response, parsed, model, context, **kwargs):
+        metadata = parsed.get('ResponseMetadata', {})
+        # The parsed copy of the headers is a plain dict, far cheaper to query.
+        length = metadata.get('HTTPHeaders', {}).get('content-length')
+        self._finish(
+            model, context, http_response.status_code >= 300,
+            retries=metadata.get('RetryAttempts', 0),
+            response_bytes=int(length) if length else 0,
+        )
+
+    def _after_call_error(self, context, **kwargs):
+        # Not given the operation model; it was stashed by _needs_retry when available.
+        model = context.get('metrics_model')
+        if model is not None:
+            self._finish(model, context, True)
+
+    def _needs_retry(self, response, operation, request_dict, **kwargs):
+        context = request_dict.get('context', {})
+        context['metrics_model'] = operation
+        if response is None:
+            return
+        code = response[1].get('Error', {}).get('Code')
+        if code in THROTTLING_ERRORS:
+            self._for_model(operation).throttled()
+
+    def reset(self) -> None:
+        """Discards everything recorded so far."""
+        with self._lock:
+            self._stats = {}
+            self._by_model = {}
+
+    def snapshot(self) -> dict:
+        """
+        Returns a point-in-time summary of every instrumented operation.
+
+        Returns:
+            dict: Service name to operation name to a dict of calls, errors,
+            retries, throttles, request_bytes, response_bytes, and mean, p50,
+            p90, p99 and max latency in milliseconds.
+        """
+        with self._lock:
+            items = list(self._stats.items())
+        result = {}
+        for (service, operation), stats in sorted(items):
+            latency = stats.latency
+            result.setdefault(service, {})[operation] = {
+                'calls': stats.calls,
+                'errors': stats.errors,
+                'retries': stats.retries,
+                'throttles': stats.throttles,
+                'request_bytes': stats.request_bytes,
+                'response_bytes': stats.response_bytes,
+                'mean_ms': latency.total / latency.count / 1000 if latency.count else 0.0,
+                'p50_ms': latency.percentile(50) / 1000,
+                'p90_ms': latency.percentile(90) / 1000,
+                'p99_ms': latency.percentile(99) / 1000,
+                'max_ms': latency.max / 1000,
+            }
+        return result
+
+    def render_prometheus(self, buckets=PROMETHEUS_BUCKETS) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Args:
+            buckets (iterable): Histogram bucket bounds in seconds.
+
+        Returns:
+            str: The exposition, ending in a newline.
+        """
+        with self._lock:
+            items = sorted(self._stats.items())
+        bounds = [int(b * 1_000_000) for b in buckets]
+        lines = [
+            '# HELP aws_client_request_duration_seconds Latency of AWS API calls, retries included.',
+            '# TYPE aws_client_request_duration_seconds histogram',
+        ]
+        for (service, operation), stats in items:
+            labels = f'service="{service}",operation="{operation}"'
+            for bound, count in zip(buckets, stats.latency.cumulative(bounds), strict=True):
+                lines.append(f'aws_client_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'aws_client_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.latency.count}')
+            lines.append(f'aws_client_request_duration_seconds_sum{{{labels}}} {stats.latency.total / 1_000_000}')
+            lines.append(f'aws_client_request_duration_seconds_count{{{labels}}} {stats.latency.count}')
+        counters = (
+            ('requests', 'calls', 'AWS API calls.'),
+            ('errors', 'errors', 'AWS API calls that failed.'),
+            ('retries', 'retries', 'Retries made by botocore.'),
+            ('throttles', 'throttles', 'Attempts rejected with a throttling error.'),
+            ('request_bytes', 'request_bytes', 'Request body bytes sent.'),
+            ('response_bytes', 'response_bytes', 'Response body bytes received.'),
+        )
+        for name, attr, help_text in counters:
+            lines.append(f'# HELP aws_client_{name}_total {help_text}')
+            lines.append(f'# TYPE aws_client_{name}_total counter')
+            for (service, operation), stats in items:
+                labels = f'service="{service}",operation="{operation}"'
+                lines.append(f'aws_client_{name}_total{{{labels}}} {getattr(stats, attr)}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Instrumentation()
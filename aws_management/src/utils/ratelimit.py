@@ -0,0 +1,186 @@
+import asyncio
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills continuously at ``rate`` per second.
+
+    Acquisitions are reservations: a caller that finds the bucket short takes
+    the tokens anyway, driving the balance negative, and is told how long to
+    wait. Later callers queue behind that debt, so waiters are served in
+    arrival order and requests larger than ``capacity`` still make progress.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum tokens held; the size of a burst.
+        clock (callable): Monotonic time source, injectable for tests.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None, clock=time.monotonic):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate: float) -> None:
+        """Changes the refill rate, keeping the tokens accrued so far."""
+        with self._lock:
+            self._refill(self._clock())
+            self.rate = rate
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Takes ``amount`` tokens and returns the seconds to wait before using them.
+
+        Args:
+            amount (float): Tokens to take.
+
+        Returns:
+            float: 0.0 if the tokens were available, otherwise the wait in seconds.
+        """
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """Blocks the calling thread until ``amount`` tokens are available."""
+        wait = self.reserve(amount)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1.0) -> None:
+        """Waits without blocking the event loop until ``amount`` tokens are available."""
+        wait = self.reserve(amount)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class AdaptiveRateLimiter:
+    """
+    Request and token budgets that back off multiplicatively on throttling.
+
+    Two token buckets enforce a requests-per-minute and an optional
+    tokens-per-minute budget. The limiter follows AIMD: every throttled call
+    multiplies both rates by ``decrease``, every successful call adds
+    ``increase`` requests per minute back, and the rates never exceed the
+    configured maximums. Throttles arriving within ``cooldown`` seconds of the
+    last decrease count as the same congestion event.
+
+    Args:
+        requests_per_minute (float): Maximum request rate.
+        tokens_per_minute (float): Maximum token rate, or None for no token budget.
+        increase (float): Requests per minute added back after each success.
+        decrease (float): Factor applied to the rates after a throttle.
+        min_requests_per_minute (float): Floor for the request rate.
+        cooldown (float): Seconds during which further throttles are ignored.
+        clock (callable): Monotonic time source, injectable for tests.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float | None = None,
+                 increase: float = 1.0, decrease: float = 0.5,
+                 min_requests_per_minute: float = 1.0, cooldown: float = 1.0,
+                 clock=time.monotonic):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.max_requests_per_minute = requests_per_minute
+        self.max_tokens_per_minute = tokens_per_minute
+        self.increase = increase
+        self.decrease = decrease
+        self.min_requests_per_minute = min_requests_per_minute
+        self.cooldown = cooldown
+        self.requests_per_minute = requests_per_minute
+        self._last_decrease = None
+        self.throttles = 0
+        self._requests = TokenBucket(requests_per_minute / 60, clock=clock)
+        self._tokens = None
+        if tokens_per_minute is not None:
+            self._tokens = TokenBucket(tokens_per_minute / 60, capacity=tokens_per_minute / 60, clock=clock)
+
+    def _apply(self, requests_per_minute: float) -> None:
+        self.requests_per_minute = requests_per_minute
+        self._requests.set_rate(requests_per_minute / 60)
+        if self._tokens is not None:
+            scale = requests_per_minute / self.max_requests_per_minute
+            self._tokens.set_rate(self.max_tokens_per_minute * scale / 60)
+
+    def set_maximums(self, requests_per_minute: float, tokens_per_minute: float | None = None) -> None:
+        """
+        Replaces the configured maximum rates.
+
+        A lower request maximum takes effect at once. A higher one is adopted
+        at once unless the limiter has backed off below its old maximum, in
+        which case the rate climbs back additively as usual.
+        """
+        with self._lock:
+            backed_off = self.requests_per_minute < self.max_requests_per_minute
+            self.max_requests_per_minute = requests_per_minute
+            if tokens_per_minute != self.max_tokens_per_minute:
+                self.max_tokens_per_minute = tokens_per_minute
+                self._tokens = None
+                if tokens_per_minute is not None:
+                    self._tokens = TokenBucket(tokens_per_minute / 60, capacity=tokens_per_minute / 60,
+                                               clock=self._clock)
+            current = min(self.requests_per_minute, requests_per_minute) if backed_off else requests_per_minute
+            self._apply(current)
+
+    def reserve(self, tokens: float = 0.0) -> float:
+        """Reserves one request and ``tokens`` tokens; returns the seconds to wait."""
+        wait = self._requests.reserve(1)
+        if self._tokens is not None and tokens:
+            wait = max(wait, self._tokens.reserve(tokens))
+        return wait
+
+    def acquire(self, tokens: float = 0.0) -> None:
+        """Blocks the calling thread until one request and ``tokens`` tokens are available."""
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 0.0) -> None:
+        """Waits on the event loop until one request and ``tokens`` tokens are available."""
+        wait = self.reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        """Additively raises the request rate after a successful call."""
+        with self._lock:
+            if self.requests_per_minute < self.max_requests_per_minute:
+                self._apply(min(self.max_requests_per_minute, self.requests_per_minute + self.increase))
+
+    def on_throttle(self) -> None:
+        """Multiplicatively lowers the rates after a throttled call."""
+        with self._lock:
+            self.throttles += 1
+            now = self._clock()
+            if self._last_decrease is not None and now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self._apply(max(self.min_requests_per_minute, self.requests_per_minute * self.decrease))
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """
+    Returns a "full jitter" exponential backoff delay for a retry.
+
+    Args:
+        attempt (int): The 1-based number of the attempt that just failed.
+        base (float): Delay scale in seconds.
+        cap (float): Upper bound on the delay in seconds.
+
+    Returns:
+        float: Seconds to sleep before the next attempt.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))  # noqa: S311
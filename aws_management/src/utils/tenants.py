@@ -0,0 +1,308 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import boto3
+import botocore.session
+from botocore.credentials import (
+    CredentialProvider,
+    CredentialResolver,
+    RefreshableCredentials,
+)
+
+from aws_management.src.utils import config
+from aws_management.src.utils.config import load_users
+from aws_management.src.utils.logging import aws_fields, get_logger
+
+logger = get_logger(__name__)
+
+# Operations one tenant may have in flight at once, unless its USERS entry sets MAX_CONCURRENCY.
+TENANT_MAX_CONCURRENCY = int(os.environ.get("TENANT_MAX_CONCURRENCY", "8"))
+# Assumed-role credentials are renewed in the background this many seconds before they expire.
+TENANT_REFRESH_MARGIN = float(os.environ.get("TENANT_REFRESH_MARGIN", "1200"))
+
+
+@dataclass
+class Tenant:
+    """
+    One ``USERS`` entry and the session that acts for it.
+
+    Attributes:
+        name (str): The USERS key, also the registry profile label.
+        region (str): The tenant's AWS_DEFAULT_REGION.
+        role_arn (str): Role assumed on the tenant's behalf, if any.
+        max_concurrency (int): Operations allowed in flight for the tenant.
+        session (boto3.Session): The session registered for the tenant.
+    """
+
+    name: str
+    region: str | None
+    role_arn: str | None
+    max_concurrency: int
+    session: boto3.Session
+    semaphore: threading.BoundedSemaphore = field(repr=False)
+    external_id: str | None = None
+    sts: object = field(default=None, repr=False)
+    credentials: RefreshableCredentials | None = field(default=None, repr=False)
+    latest: dict | None = field(default=None, repr=False)
+
+    def expires_in(self) -> float | None:
+        """Seconds until the newest assumed-role credentials expire, or None for static keys."""
+        if self.latest is None:
+            return None
+        expiry = datetime.fromisoformat(self.latest['expiry_time'])
+        return (expiry - datetime.now(timezone.utc)).total_seconds()
+
+
+@dataclass
+class TenantResult:
+    """Outcome of one tenant's share of ``TenantPool.run``."""
+
+    tenant: str
+    value: object = None
+    error: Exception | None = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """bool: True if the tenant's call returned without raising."""
+        return self.error is None
+
+
+class _TenantCredentialProvider(CredentialProvider):
+    """Credential provider that always resolves to one tenant's refreshable credentials."""
+
+    METHOD = 'assume-role'
+
+    def __init__(self, credentials: RefreshableCredentials):
+        """Wraps the tenant's credentials."""
+        super().__init__()
+        self.credentials = credentials
+
+    def load(self) -> RefreshableCredentials:
+        """Returns the tenant's credentials."""
+        return self.credentials
+
+
+def _refreshable_session(credentials: RefreshableCredentials, region: str | None) -> boto3.Session:
+    """Returns a Session whose clients sign with ``credentials`` and pick up their renewals."""
+    # Replacing the session's credential chain with one provider keeps the
+    # environment and config files out of the lookup entirely.
+    core = botocore.session.Session()
+    core.register_component('credential_provider', CredentialResolver([_TenantCredentialProvider(credentials)]))
+    return boto3.Session(botocore_session=core, region_name=region)
+
+
+class TenantPool:
+    """
+    One cached Session per ``USERS`` tenant, registered with the client registry.
+
+    ``USERS`` is parsed once. Each tenant gets a Session built from its keys;
+    an entry with AWS_ROLE_ARN instead gets AssumeRole credentials (using its
+    keys, or the default chain, to call STS). Sessions are registered under
+    the tenant's name, so ``get_client(service, region, profile=name)``
+    returns a shared client acting as that tenant.
+
+    Assumed-role credentials are renewed by a background thread once they are
+    within ``refresh_margin`` seconds of expiry. botocore only asks for new
+    credentials in the last ``refresh_margin / 2`` seconds, and by then the
+    renewed set is already waiting, so requests never wait on STS. An inline
+    STS call only happens if the background thread has fallen behind; these
+    are counted in ``inline_refreshes``.
+
+    Each tenant has a concurrency quota (its MAX_CONCURRENCY, or
+    ``max_concurrency``), enforced by ``slot`` and by ``run``.
+
+    Args:
+        users (dict): Parsed USERS entries, or None to read them with ``load_users``.
+        max_concurrency (int): Default per-tenant quota.
+        refresh_margin (float): Seconds before expiry at which credentials are renewed.
+        check_interval (float): Seconds between background expiry checks.
+        duration_seconds (int): Lifetime requested for assumed-role credentials.
+        role_session_name (str): RoleSessionName used for AssumeRole.
+        registry (ClientRegistry): Registry to register sessions with (default: the package registry).
+    """
+
+    def __init__(self, users: dict | None = None, max_concurrency: int = TENANT_MAX_CONCURRENCY,
+                 refresh_margin: float = TENANT_REFRESH_MARGIN, check_interval: float = 60.0,
+                 duration_seconds: int = 3600, role_session_name: str = 'bedrock-k',
+                 registry=None):
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.duration_seconds = duration_seconds
+        self.role_session_name = role_session_name
+        self.registry = registry or config.registry
+        self.background_refreshes = 0
+        self.inline_refreshes = 0
+        self._counter_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.tenants = {}
+        users = load_users() if users is None else users
+        for name, entry in users.items():
+            self.tenants[name] = tenant = self._build(name, entry, max_concurrency)
+            self.registry.add_session(name, tenant.session)
+
+    def _build(self, name: str, entry: dict, max_concurrency: int) -> Tenant:
+        region = entry.get('AWS_DEFAULT_REGION')
+        keys = boto3.Session(
+            aws_access_key_id=entry.get('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=entry.get('AWS_SECRET_ACCESS_KEY'),
+            aws_session_token=entry.get('AWS_SESSION_TOKEN'),
+            region_name=region,
+        )
+        limit = int(entry.get('MAX_CONCURRENCY', max_concurrency))
+        tenant = Tenant(name=name, region=region, role_arn=entry.get('AWS_ROLE_ARN'), max_concurrency=limit,
+                        session=keys, semaphore=threading.BoundedSemaphore(limit),
+                        external_id=entry.get('AWS_EXTERNAL_ID'))
+        if tenant.role_arn is None:
+            return tenant
+        tenant.sts = keys.client('sts', region_name=region)
+        tenant.latest = self._assume(tenant)
+        tenant.credentials = RefreshableCredentials.create_from_metadata(
+            tenant.latest, refresh_using=lambda: self._refresh_using(tenant), method='assume-role',
+            advisory_timeout=self.refresh_margin / 2, mandatory_timeout=self.refresh_margin / 4,
+        )
+        tenant.session = _refreshable_session(tenant.credentials, region)
+        return tenant
+
+    def _assume(self, tenant: Tenant) -> dict:
+        kwargs = {
+            'RoleArn': tenant.role_arn,
+            'RoleSessionName': self.role_session_name,
+            'DurationSeconds': self.duration_seconds,
+        }
+        if tenant.external_id is not None:
+            kwargs['ExternalId'] = tenant.external_id
+        credentials = tenant.sts.assume_role(**kwargs)['Credentials']
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': credentials['Expiration'].isoformat(),
+        }
+
+    def _refresh_using(self, tenant: Tenant) -> dict:
+        # botocore wants newer credentials: hand over the background renewal,
+        # or fetch inline if the refresher has not produced one in time.
+        if tenant.expires_in() <= self.refresh_margin / 4:
+            with self._counter_lock:
+                self.inline_refreshes += 1
+            tenant.latest = self._assume(tenant)
+        return tenant.latest
+
+    def refresh_due(self) -> int:
+        """
+        Renews the assumed-role credentials that are within ``refresh_margin`` of expiry.
+
+        Returns:
+            int: The number of tenants renewed.
+        """
+        renewed = 0
+        for tenant in self.tenants.values():
+            remaining = tenant.expires_in()
+            if remaining is None or remaining > self.refresh_margin:
+                continue
+            try:
+                tenant.latest = self._assume(tenant)
+            except Exception as e:
+                logger.warning("Error renewing credentials for tenant %s: %s", tenant.name, e, extra={
+                    'service': 'sts', 'operation': 'AssumeRole', 'tenant': tenant.name, **aws_fields(e),
+                })
+                continue
+            renewed += 1
+            with self._counter_lock:
+                self.background_refreshes += 1
+        return renewed
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            self.refresh_due()
+
+    def start(self) -> 'TenantPool':
+        """
+        Starts the background credential refresher; returns the pool.
+
+        No thread is started when no tenant uses assumed-role credentials.
+        """
+        if not any(tenant.role_arn for tenant in self.tenants.values()):
+            return self
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name='tenant-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stops the background refresher."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def detach(self) -> None:
+        """
+        Stops the refresher and removes the pool's sessions from its registry.
+
+        Profile labels another pool has since registered a session under are
+        left alone.
+        """
+        self.close()
+        for name, tenant in self.tenants.items():
+            self.registry.remove_session(name, tenant.session)
+
+    def __enter__(self) -> 'TenantPool':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def client(self, service: str, tenant: str, region: str | None = None):
+        """Returns the shared ``service`` client acting as ``tenant``, in its region unless ``region`` is given."""
+        return self.registry.client(service, region or self.tenants[tenant].region, tenant)
+
+    @contextmanager
+    def slot(self, tenant: str):
+        """Holds one of ``tenant``'s concurrency slots, waiting for one if all are taken."""
+        semaphore = self.tenants[tenant].semaphore
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def run(self, fn, tenants=None, max_workers: int | None = None) -> dict:
+        """
+        Calls ``fn(tenant_name)`` for every tenant in parallel, each inside one of its slots.
+
+        Args:
+            fn (callable): Operation taking the tenant name, e.g.
+                ``lambda t: pool.client('bedrock', t).list_foundation_models()``.
+            tenants (iterable): Tenant names to run for (default: all).
+            max_workers (int): Threads to use (default: one per tenant).
+
+        Returns:
+            dict: Tenant name to TenantResult; one tenant's failure does not affect the others.
+        """
+        names = list(self.tenants if tenants is None else tenants)
+
+        def call(name):
+            result = TenantResult(name)
+            start = time.perf_counter()
+            try:
+                with self.slot(name):
+                    result.value = fn(name)
+            except Exception as e:
+                logger.exception("Error running for tenant %s", name, extra={'tenant': name, **aws_fields(e)})
+                result.error = e
+            result.seconds = time.perf_counter() - start
+            return result
+
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers or len(names), thread_name_prefix='tenant') as pool:
+            return {result.tenant: result for result in pool.map(call, names)}
@@ -0,0 +1,389 @@
+import json
+import os
+
+import numpy as np
+
+# Query rows scored against the whole matrix at once; bounds the temporary
+# score matrix to QUERY_BLOCK x len(index) floats.
+QUERY_BLOCK = 256
+
+METRIC_ERROR = "Unsupported metric '{metric}'"
+LENGTH_MISMATCH_ERROR = "Got {ids} ids for {vectors} vectors"
+TOO_FEW_VECTORS_ERROR = "Need at least {nlist} vectors to build {nlist} lists, have {have}"
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the ``k`` highest scores in each row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """
+    Local top-k vector search over a contiguous float32 matrix.
+
+    Vectors live in one ``(n, dim)`` float32 array, so a search is a single
+    matrix product followed by ``argpartition``. Search is exact by default.
+    ``build_ivf`` clusters the vectors with k-means and then only scores the
+    ``nprobe`` closest clusters per query. ``quantize`` keeps an int8 copy
+    that is scored first, and only the best candidates are re-ranked at full
+    precision.
+
+    The ``upsert``/``query``/``delete``/``describe_index_stats`` methods follow
+    the Pinecone index API, so the class can stand in for Pinecone in tests
+    and small deployments. Each non-default namespace is a separate
+    ``VectorIndex`` created on its first upsert; ``add``/``search`` and the
+    IVF and quantization settings apply to the default namespace only.
+
+    Args:
+        dim (int): Vector dimension.
+        metric (str): "cosine" (vectors and queries are normalized) or "dotproduct".
+        capacity (int): Rows to preallocate; the array doubles when full.
+    """
+
+    def __init__(self, dim: int, metric: str = 'cosine', capacity: int = 1024):
+        if metric not in ('cosine', 'dotproduct'):
+            raise ValueError(METRIC_ERROR.format(metric=metric))
+        self.dim = dim
+        self.metric = metric
+        self._vectors = np.empty((max(capacity, 1), dim), dtype=np.float32)
+        self._live = np.zeros(len(self._vectors), dtype=bool)
+        self._size = 0
+        self.ids = []
+        self.metadata = []
+        self._positions = {}
+        self._centroids = None
+        self._assignments = None
+        self._lists = None
+        self.nprobe = 1
+        self._codes = None
+        self._scales = None
+        self._namespaces = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """np.ndarray: The stored rows, including deleted ones, as a float32 view."""
+        return self._vectors[:self._size]
+
+    def _grow(self, rows: int) -> None:
+        needed = self._size + rows
+        if needed <= len(self._vectors) and self._vectors.flags.writeable:
+            return
+        capacity = max(needed, 2 * len(self._vectors))
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        live = np.zeros(capacity, dtype=bool)
+        live[:self._size] = self._live[:self._size]
+        self._vectors, self._live = vectors, live
+        if self._codes is not None:
+            codes = np.zeros((capacity, self.dim), dtype=np.int8)
+            codes[:self._size] = self._codes[:self._size]
+            scales = np.ones(capacity, dtype=np.float32)
+            scales[:self._size] = self._scales[:self._size]
+            self._codes, self._scales = codes, scales
+
+    def add(self, ids, vectors, metadata=None) -> None:
+        """
+        Inserts vectors, replacing any existing ones with the same ID.
+
+        Args:
+            ids (list): One string ID per vector.
+            vectors (array-like): An ``(n, dim)`` array of vectors.
+            metadata (list): Optional per-vector metadata dicts.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError(LENGTH_MISMATCH_ERROR.format(ids=len(ids), vectors=len(vectors)))
+        if self.metric == 'cosine':
+            vectors = _normalize(vectors)
+        metadata = metadata or [None] * len(ids)
+        self._grow(len(ids))
+        rows = np.empty(len(ids), dtype=np.intp)
+        for i, (vector_id, meta) in enumerate(zip(ids, metadata, strict=True)):
+            row = self._positions.get(vector_id)
+            if row is None:
+                row = self._positions[vector_id] = self._size
+                self._size += 1
+                self.ids.append(vector_id)
+                self.metadata.append(meta)
+            else:
+                self.metadata[row] = meta
+            rows[i] = row
+        self._vectors[rows] = vectors
+        self._live[rows] = True
+        if self._centroids is not None:
+            self._assignments = np.resize(self._assignments, self._size)
+            self._assignments[rows] = self._nearest_centroids(vectors, 1)[:, 0]
+            self._lists = None
+        if self._codes is not None:
+            self._encode(rows)
+
+    def remove(self, ids) -> None:
+        """Deletes the vectors with the given IDs; unknown IDs are ignored."""
+        for vector_id in ids:
+            row = self._positions.pop(vector_id, None)
+            if row is not None:
+                self._live[row] = False
+                self.metadata[row] = None
+
+    def build_ivf(self, nlist: int, nprobe: int = 8, iterations: int = 10,
+                  sample: int = 50_000, seed: int = 0) -> None:
+        """
+        Clusters the vectors for approximate inverted-file (IVF) search.
+
+        Args:
+            nlist (int): Number of k-means clusters.
+            nprobe (int): Clusters scored per query; higher trades speed for recall.
+            iterations (int): k-means iterations.
+            sample (int): Vectors the centroids are trained on.
+            seed (int): Random seed for the training sample and initial centroids.
+        """
+        rows = np.flatnonzero(self._live[:self._size])
+        if len(rows) < nlist:
+            raise ValueError(TOO_FEW_VECTORS_ERROR.format(nlist=nlist, have=len(rows)))
+        rng = np.random.default_rng(seed)
+        training = self._vectors[rng.choice(rows, size=min(sample, len(rows)), replace=False)]
+        centroids = training[rng.choice(len(training), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            nearest = np.argmax(training @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = training[nearest == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            if self.metric == 'cosine':
+                centroids = _normalize(centroids)
+        self._centroids = centroids
+        self.nprobe = nprobe
+        self._assignments = np.zeros(self._size, dtype=np.intp)
+        for start in range(0, self._size, 8192):
+            block = self._vectors[start:start + 8192]
+            self._assignments[start:start + len(block)] = self._nearest_centroids(block, 1)[:, 0]
+        self._lists = None
+
+    def _nearest_centroids(self, vectors: np.ndarray, n: int) -> np.ndarray:
+        return _top_k(vectors @ self._centroids.T, n)
+
+    def _inverted_lists(self) -> tuple:
+        # Rows grouped by cluster: lists[offsets[c]:offsets[c + 1]] are cluster c's rows.
+        if self._lists is None:
+            order = np.argsort(self._assignments, kind='stable')
+            counts = np.bincount(self._assignments, minlength=len(self._centroids))
+            offsets = np.concatenate(([0], np.cumsum(counts)))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def quantize(self) -> None:
+        """
+        Keeps an int8 copy of the vectors (per-vector scale) for a faster first scoring pass.
+
+        Later ``add`` calls encode only the rows they write.
+        """
+        self._codes = np.zeros((len(self._vectors), self.dim), dtype=np.int8)
+        self._scales = np.ones(len(self._vectors), dtype=np.float32)
+        self._encode(slice(0, self._size))
+
+    def _encode(self, rows) -> None:
+        vectors = self._vectors[rows]
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        self._codes[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+        self._scales[rows] = scales
+
+    def _score(self, queries: np.ndarray, rows: np.ndarray | None, k: int) -> tuple:
+        """Scores ``queries`` against ``rows`` (all rows if None); returns (rows, scores) of the top k."""
+        if self._codes is not None:
+            codes = self._codes[:self._size] if rows is None else self._codes[rows]
+            scales = self._scales[:self._size] if rows is None else self._scales[rows]
+            approx = (queries @ codes.T.astype(np.float32)) * scales
+            if rows is None:
+                approx[:, ~self._live[:self._size]] = -np.inf
+            # Re-rank a few times more candidates than asked for at full precision.
+            candidates = _top_k(approx, 4 * k)
+            candidate_rows = candidates if rows is None else rows[candidates]
+            exact = np.einsum('qd,qkd->qk', queries, self._vectors[candidate_rows])
+            exact[np.isneginf(np.take_along_axis(approx, candidates, axis=1))] = -np.inf
+            best = _top_k(exact, k)
+            return np.take_along_axis(candidate_rows, best, axis=1), np.take_along_axis(exact, best, axis=1)
+        vectors = self._vectors[:self._size] if rows is None else self._vectors[rows]
+        scores = queries @ vectors.T
+        if rows is None:
+            scores[:, ~self._live[:self._size]] = -np.inf
+        best = _top_k(scores, k)
+        found = best if rows is None else rows[best]
+        return found, np.take_along_axis(scores, best, axis=1)
+
+    def search(self, queries, k: int = 10, nprobe: int | None = None) -> tuple:
+        """
+        Finds the ``k`` best-scoring vectors for each query.
+
+        Args:
+            queries (array-like): A ``(dim,)`` query or an ``(m, dim)`` batch.
+            k (int): Results per query.
+            nprobe (int): Clusters to score per query when an IVF is built (default: ``self.nprobe``).
+
+        Returns:
+            tuple: ``(ids, scores)``, where ``ids`` is a list of ID lists and
+            ``scores`` an ``(m, k)`` float32 array, best first. Rows past the
+            number of live vectors are omitted.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if self.metric == 'cosine':
+            queries = _normalize(queries)
+        k = min(k, len(self))
+        all_rows, all_scores = [], []
+        if self._centroids is None:
+            for start in range(0, len(queries), QUERY_BLOCK):
+                rows, scores = self._score(queries[start:start + QUERY_BLOCK], None, k)
+                all_rows.extend(rows)
+                all_scores.extend(scores)
+        else:
+            order, offsets = self._inverted_lists()
+            probes = self._nearest_centroids(queries, nprobe or self.nprobe)
+            for query, clusters in zip(queries, probes, strict=True):
+                candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in clusters])
+                candidates = candidates[self._live[candidates]]
+                rows, scores = self._score(query[None, :], candidates, k)
+                all_rows.append(rows[0])
+                all_scores.append(scores[0])
+        ids, scores = [], np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, (rows, row_scores) in enumerate(zip(all_rows, all_scores, strict=True)):
+            keep = np.isfinite(row_scores)
+            ids.append([self.ids[row] for row in rows[keep]])
+            scores[i, :keep.sum()] = row_scores[keep]
+        return ids, scores
+
+    def _namespace(self, namespace: str, create: bool = False) -> 'VectorIndex | None':
+        """The index holding ``namespace``: this one for '', else a child index (None if missing)."""
+        if not namespace:
+            return self
+        if create and namespace not in self._namespaces:
+            self._namespaces[namespace] = type(self)(self.dim, self.metric)
+        return self._namespaces.get(namespace)
+
+    def upsert(self, vectors, namespace: str = '') -> dict:
+        """
+        Pinecone-style insert of ``(id, values[, metadata])`` tuples or ``{'id', 'values', 'metadata'}`` dicts.
+
+        Returns:
+            dict: ``{'upserted_count': n}``.
+        """
+        ids, values, metadata = [], [], []
+        for item in vectors:
+            if isinstance(item, dict):
+                item = (item['id'], item['values'], item.get('metadata'))
+            ids.append(item[0])
+            values.append(item[1])
+            metadata.append(item[2] if len(item) > 2 else None)
+        self._namespace(namespace, create=True).add(ids, values, metadata)
+        return {'upserted_count': len(ids)}
+
+    def query(self, vector, top_k: int = 10, include_values: bool = False,
+              include_metadata: bool = False, namespace: str = '') -> dict:
+        """
+        Pinecone-style single query.
+
+        Returns:
+            dict: ``{'matches': [{'id', 'score'[, 'values'][, 'metadata']}], 'namespace': namespace}``.
+        """
+        index = self._namespace(namespace)
+        if index is None:
+            return {'matches': [], 'namespace': namespace}
+        ids, scores = index.search(vector, top_k)
+        matches = []
+        for vector_id, score in zip(ids[0], scores[0], strict=True):
+            match = {'id': vector_id, 'score': float(score)}
+            row = index._positions[vector_id]
+            if include_values:
+                match['values'] = index._vectors[row].tolist()
+            if include_metadata:
+                match['metadata'] = index.metadata[row] or {}
+            matches.append(match)
+        return {'matches': matches, 'namespace': namespace}
+
+    def delete(self, ids=None, delete_all: bool = False, namespace: str = '') -> dict:
+        """Pinecone-style delete by ID, or of everything in the namespace with ``delete_all``."""
+        index = self._namespace(namespace)
+        if index is not None:
+            index.remove(list(index._positions) if delete_all else ids or ())
+        return {}
+
+    def describe_index_stats(self) -> dict:
+        """Pinecone-style index statistics."""
+        namespaces = {'': {'vector_count': len(self)}}
+        namespaces.update({name: {'vector_count': len(index)} for name, index in self._namespaces.items()})
+        return {
+            'dimension': self.dim, 'namespaces': namespaces,
+            'total_vector_count': sum(ns['vector_count'] for ns in namespaces.values()),
+        }
+
+    def save(self, directory: str) -> None:
+        """
+        Writes the live vectors to ``vectors.npy`` and IDs and metadata to ``index.json``.
+
+        Non-default namespaces are saved the same way into ``namespace-<n>``
+        subdirectories, listed in order under ``namespaces`` in ``index.json``.
+
+        Args:
+            directory (str): Directory to write into; created if missing.
+        """
+        os.makedirs(directory, exist_ok=True)
+        rows = np.flatnonzero(self._live[:self._size])
+        np.save(os.path.join(directory, 'vectors.npy'), self._vectors[rows])
+        with open(os.path.join(directory, 'index.json'), 'w') as f:
+            json.dump({
+                'dim': self.dim, 'metric': self.metric,
+                'ids': [self.ids[row] for row in rows], 'metadata': [self.metadata[row] for row in rows],
+                'namespaces': list(self._namespaces),
+            }, f)
+        for n, index in enumerate(self._namespaces.values()):
+            index.save(os.path.join(directory, f'namespace-{n}'))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'VectorIndex':
+        """
+        Loads an index written by ``save``.
+
+        Args:
+            directory (str): Directory holding ``vectors.npy`` and ``index.json``.
+            mmap (bool): Memory-map the vectors read-only instead of reading them;
+                they are copied into memory on the first write.
+
+        Returns:
+            VectorIndex: The loaded index, exact search until ``build_ivf`` is called.
+        """
+        with open(os.path.join(directory, 'index.json')) as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode='r' if mmap else None)
+        index = cls.from_array(meta['ids'], vectors, meta['metric'], meta['metadata'])
+        for n, namespace in enumerate(meta.get('namespaces', ())):
+            index._namespaces[namespace] = cls.load(os.path.join(directory, f'namespace-{n}'), mmap)
+        return index
+
+    @classmethod
+    def from_array(cls, ids, vectors: np.ndarray, metric: str = 'cosine', metadata=None) -> 'VectorIndex':
+        """
+        Wraps an existing ``(n, dim)`` float32 array, e.g. a memmap from ``embed_texts``, without copying it.
+
+        Cosine indexes expect the rows to be normalized already.
+        """
+        index = cls(vectors.shape[1], metric, capacity=1)
+        index._vectors = vectors
+        index._size = len(vectors)
+        index._live = np.ones(len(vectors), dtype=bool)
+        index.ids = list(ids)
+        index.metadata = list(metadata or [None] * len(vectors))
+        index._positions = {vector_id: row for row, vector_id in enumerate(index.ids)}
+        return index
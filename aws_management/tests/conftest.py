@@ -0,0 +1,100 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from aws_management.src.services import bedrock_ops
+from aws_management.src.utils.config import registry
+
+
+class FakeRuntimeClient:
+    """
+    Blocking bedrock-runtime stand-in for ``invoke_model``, configured per test.
+
+    Every call is recorded and sleeps ``latency`` like a network round trip.
+    The first ``throttles`` calls, and every call for a model in
+    ``throttled_models``, then fail with ThrottlingException. Otherwise the
+    reply is ``respond(request, model_id)`` for the parsed request body when
+    given, else ``payload``; ``respond`` may raise to fail a call.
+    """
+
+    def __init__(self, latency=0.0, payload=None, respond=None, throttles=0, throttled_models=()):
+        """Configure the latency, replies and throttling described above."""
+        self.latency = latency
+        self.payload = payload or {'completion': 'ok'}
+        self.respond = respond
+        self.throttles = throttles
+        self.throttled_models = set(throttled_models)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = []
+
+    def invoke_model(self, body, modelId, accept, contentType):  # noqa: N803
+        """Record the call, wait ``latency`` and reply, throttle or fail as configured."""
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.calls.append((modelId, body))
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+            throttle = self.throttles > 0 or modelId in self.throttled_models
+            self.throttles -= self.throttles > 0
+        if throttle:
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'InvokeModel')
+        payload = self.respond(json.loads(body), modelId) if self.respond else self.payload
+        return {'body': io.BytesIO(json.dumps(payload).encode())}
+
+
+@pytest.fixture
+def fake_runtime():
+    """Factory for FakeRuntimeClient, taking the same keyword arguments."""
+    return FakeRuntimeClient
+
+
+@pytest.fixture
+def install_runtime():
+    """Route bedrock-runtime calls to a stand-in client for the test's duration.
+
+    Yields ``install(client, region=None)``, which returns the client.
+    """
+    installed = set()
+
+    def install(client, region=None):
+        registry.register('bedrock-runtime', client, region=region)
+        installed.add(region)
+        return client
+
+    yield install
+    for region in installed:
+        registry.unregister('bedrock-runtime', region=region)
+
+
+@pytest.fixture
+def fresh_engine(monkeypatch):
+    """Install a new AsyncEngine as ``bedrock_ops.engine`` and shut it down afterwards.
+
+    Yields ``make(**kwargs)``, which builds, installs and returns the engine.
+    """
+    engines = []
+
+    def make(**kwargs):
+        engine = bedrock_ops.AsyncEngine(**kwargs)
+        monkeypatch.setattr(bedrock_ops, 'engine', engine)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.shutdown()
+
+
+@pytest.fixture
+def instant_backoff(monkeypatch):
+    """Give each test fresh per-model rate limiters and retry throttled calls without waiting."""
+    monkeypatch.setattr(bedrock_ops, 'rate_limiters', {})
+    monkeypatch.setattr(bedrock_ops, 'backoff_delay', lambda attempt: 0)
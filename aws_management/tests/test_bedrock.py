@@ -1,19 +1,40 @@
+import asyncio
+import base64
+import io
+import json
+import threading
+import time
+
+import boto3
 import pytest
 import pytest_asyncio
-from aws_management.src.services.bedrock_ops import invoke_model
 from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
 from botocore.stub import Stubber
-import boto3
+
+from aws_management.src.services import bedrock_ops
+from aws_management.src.services.bedrock_ops import invoke_model
+from aws_management.src.utils.config import registry
+
+
+def _streaming(data):
+    """Wraps ``data`` like the StreamingBody of a real invoke_model response."""
+    return StreamingBody(io.BytesIO(data), len(data))
 
 @pytest.fixture
-def bedrock_client():
+def bedrock_client(monkeypatch):
     """Create a stubbed Bedrock client for testing.
 
     Yeilds a tuple of (stubber, client) for the Bedrock service.
     """
     client = boto3.client('bedrock-runtime', region_name='us-east-1')
-    with Stubber(client) as stubber:
+    control = boto3.client('bedrock', region_name='us-east-1')
+    monkeypatch.setattr(bedrock_ops, 'model_catalog', bedrock_ops.ModelCatalog())
+    with registry.override('bedrock', control), Stubber(control) as catalog, \
+            registry.override('bedrock-runtime', client), Stubber(client) as stubber:
+        catalog.add_response('list_foundation_models', {'modelSummaries': MODEL_SUMMARIES})
         yield stubber, client
+        stubber.assert_no_pending_responses()
 
 async def test_invoke_model_success(bedrock_client):
     """Test invoking a model successfully."""
@@ -23,7 +44,7 @@ async def test_invoke_model_success(bedrock_client):
     
     # Stub the invoke_model response
     response = {
-        'body': b'{"completions": [{"data": "Bonjour"}]}',
+        'body': _streaming(b'{"completions": [{"data": "Bonjour"}]}'),
         'contentType': 'application/json',
     }
     expected_params = {
@@ -41,8 +62,7 @@ async def test_invoke_model_failure(bedrock_client):
     """Test invoking a non-existent model."""
     stubber, client = bedrock_client
     prompt = "This should fail"
-    with pytest.raises(ClientError):
-        await invoke_model(prompt, model="non_existent_model")
+    assert await invoke_model(prompt, model="non_existent_model") == ""  # noqa: S101
 
 @pytest.mark.parametrize("model, prompt, expected", [
     ("anthropic.claude-v2", "Capital of France", "Paris"),
@@ -50,6 +70,8 @@ async def test_invoke_model_failure(bedrock_client):
 async def test_invoke_model_parametrized(bedrock_client, model, prompt, expected):
     """Test the invoke_model function with various models and prompts."""
     stubber, client = bedrock_client
+    stubber.add_response('invoke_model', {'body': _streaming(json.dumps({'completion': expected}).encode()),
+                                          'contentType': 'application/json'})
     result = await invoke_model(prompt, model=model)
     assert expected in result  # noqa: S101
 
@@ -64,6 +86,7 @@ async def test_invoke_model_with_long_prompt(bedrock_client):
     """Test invoking a model with a very long prompt."""
     stubber, client = bedrock_client
     prompt = "x" * 10000  # Very long prompt
+    stubber.add_response('invoke_model', {'body': _streaming(b'{"completion": "ok"}'), 'contentType': 'application/json'})
     result = await invoke_model(prompt)
     assert len(result) > 0  # noqa: S101, PLR201
 
@@ -76,8 +99,7 @@ async def test_invoke_model_with_invalid_model_id(bedrock_client, invalid_model)
     """Test invoking a model with an invalid model ID."""
     stubber, client = bedrock_client
     prompt = "Test prompt"
-    with pytest.raises(ClientError):
-        await invoke_model(prompt, model=invalid_model)
+    assert await invoke_model(prompt, model=invalid_model) == ""  # noqa: S101
 
 
 async def test_invoke_model_success(bedrock_client):
@@ -88,7 +110,7 @@ async def test_invoke_model_success(bedrock_client):
     
     # Stub the invoke_model response
     response = {
-        'body': b'{"completions": [{"data": "Bonjour"}]}',
+        'body': _streaming(b'{"completions": [{"data": "Bonjour"}]}'),
         'contentType': 'application/json',
     }
     expected_params = {
@@ -102,4 +124,839 @@ async def test_invoke_model_success(bedrock_client):
     result = await invoke_model(prompt, model=model_id)
     assert "Bonjour" in result  # noqa: S101
 
-# Update other test functions to use the tuple(stubber, client) = bedrock_client
\ No newline at end of file
+# Update other test functions to use the tuple(stubber, client) = bedrock_client
+
+MODEL_SUMMARIES = [
+    {
+        'modelArn': 'arn:aws:bedrock:us-east-1::foundation-model/anthropic.claude-v2',
+        'modelId': 'anthropic.claude-v2',
+        'providerName': 'Anthropic',
+        'inputModalities': ['TEXT'],
+        'outputModalities': ['TEXT'],
+        'responseStreamingSupported': True,
+    },
+    {
+        'modelArn': 'arn:aws:bedrock:us-east-1::foundation-model/ai21.j2-ultra-v1',
+        'modelId': 'ai21.j2-ultra-v1',
+        'providerName': 'AI21 Labs',
+        'inputModalities': ['TEXT'],
+        'outputModalities': ['TEXT'],
+        'responseStreamingSupported': False,
+    },
+    {
+        'modelArn': 'arn:aws:bedrock:us-east-1::foundation-model/amazon.titan-embed-text-v1',
+        'modelId': 'amazon.titan-embed-text-v1',
+        'providerName': 'Amazon',
+        'inputModalities': ['TEXT'],
+        'outputModalities': ['EMBEDDING'],
+    },
+]
+
+
+class FakeClock:
+    """Manually advanced monotonic clock for TTL tests."""
+
+    def __init__(self):
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+@pytest.fixture
+def catalog_stubber(monkeypatch):
+    """Stub the control-plane Bedrock client and install a fresh model catalog.
+
+    Yields a tuple of (stubber, catalog, clock).
+    """
+    client = boto3.client('bedrock', region_name='us-east-1')
+    clock = FakeClock()
+    catalog = bedrock_ops.ModelCatalog(ttl=60, clock=clock)
+    monkeypatch.setattr(bedrock_ops, 'model_catalog', catalog)
+    with registry.override('bedrock', client), Stubber(client) as stubber:
+        yield stubber, catalog, clock
+        stubber.assert_no_pending_responses()
+
+
+async def test_model_catalog_single_flight(catalog_stubber):
+    """500 concurrent callers on a cold cache trigger one list_foundation_models call."""
+    stubber, catalog, clock = catalog_stubber
+    stubber.add_response('list_foundation_models', {'modelSummaries': MODEL_SUMMARIES})
+
+    results = await asyncio.gather(*(catalog.lookup('anthropic.claude-v2') for _ in range(500)))
+
+    assert all(r['providerName'] == 'Anthropic' for r in results)
+
+
+async def test_model_catalog_ttl_and_invalidate(catalog_stubber):
+    """The catalog is reused within its TTL and refetched after expiry or invalidation."""
+    stubber, catalog, clock = catalog_stubber
+    for _ in range(3):
+        stubber.add_response('list_foundation_models', {'modelSummaries': MODEL_SUMMARIES})
+
+    await bedrock_ops.list_available_models()
+    clock.now = 59
+    assert len(await bedrock_ops.list_available_models()) == 3
+    clock.now = 61
+    await bedrock_ops.list_available_models()
+    catalog.invalidate()
+    assert not catalog.is_fresh
+    await bedrock_ops.list_available_models()
+
+
+async def test_model_catalog_indexes(catalog_stubber):
+    """Provider, modality and streaming lookups are served from the cached index."""
+    stubber, catalog, clock = catalog_stubber
+    stubber.add_response('list_foundation_models', {'modelSummaries': MODEL_SUMMARIES})
+
+    await catalog.refresh()
+
+    assert catalog.by_provider('anthropic') == {'anthropic.claude-v2'}
+    assert catalog.by_modality('embedding') == {'amazon.titan-embed-text-v1'}
+    assert len(catalog.by_modality('TEXT', output=False)) == 3
+    assert catalog.supports_streaming('anthropic.claude-v2')
+    assert not catalog.supports_streaming('ai21.j2-ultra-v1')
+    assert await catalog.lookup('invalid.model') is None
+
+
+async def test_model_catalog_refresh_error_not_cached(catalog_stubber):
+    """A failed refresh is surfaced to callers and retried on the next lookup."""
+    stubber, catalog, clock = catalog_stubber
+    stubber.add_client_error('list_foundation_models', 'ThrottlingException')
+    stubber.add_response('list_foundation_models', {'modelSummaries': MODEL_SUMMARIES})
+
+    assert await bedrock_ops.list_available_models() == []
+    assert await catalog.lookup('ai21.j2-ultra-v1') is not None
+
+
+@pytest.fixture
+def slow_runtime(catalog_stubber, fake_runtime, install_runtime, fresh_engine):
+    """Install a runtime client with 0.2s latency and a fresh engine over a warm catalog.
+
+    Yields the FakeRuntimeClient.
+    """
+    stubber, catalog, clock = catalog_stubber
+    stubber.add_response('list_foundation_models', {'modelSummaries': MODEL_SUMMARIES})
+    fresh_engine(max_workers=64, max_concurrency=64, per_model_concurrency=64)
+    return install_runtime(fake_runtime(latency=0.2))
+
+
+async def test_event_loop_stays_responsive(slow_runtime):
+    """The event loop keeps ticking while 50 blocking invocations are outstanding."""
+    gaps = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    ticker = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    results = await asyncio.gather(*(invoke_model(f"prompt {i}") for i in range(50)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker
+
+    assert results == ['ok'] * 50
+    assert slow_runtime.peak > 1
+    assert elapsed < 50 * slow_runtime.latency / 5
+    assert max(gaps) < 0.1
+
+
+async def test_engine_per_model_and_global_limits(slow_runtime, fresh_engine):
+    """The per-model and global semaphores cap calls in flight."""
+    slow_runtime.latency = 0.05
+    fresh_engine(max_workers=32, max_concurrency=6, per_model_concurrency=4)
+
+    await asyncio.gather(*(invoke_model("p", model='anthropic.claude-v2') for _ in range(20)))
+    assert slow_runtime.peak == 4
+
+    slow_runtime.peak = 0
+    await asyncio.gather(*(
+        invoke_model("p", model=model)
+        for model in ('anthropic.claude-v2', 'ai21.j2-ultra-v1') for _ in range(10)
+    ))
+    assert slow_runtime.peak == 6
+
+
+async def test_engine_cancelled_call_keeps_its_slot_until_the_thread_ends():
+    """Cancelling a caller does not free its slot while the blocking call is still running."""
+    engine = bedrock_ops.AsyncEngine(max_workers=4, per_model_concurrency=1)
+    lock = threading.Lock()
+    running = []
+    peak = [0]
+
+    def call():
+        with lock:
+            running.append(1)
+            peak[0] = max(peak[0], len(running))
+        time.sleep(0.1)
+        with lock:
+            running.pop()
+
+    first = asyncio.ensure_future(engine.run(call, model='m'))
+    await asyncio.sleep(0.02)
+    first.cancel()
+    await engine.run(call, model='m')
+
+    assert first.cancelled()
+    assert peak[0] == 1
+    engine.shutdown()
+
+
+async def test_invoke_model_request_body(slow_runtime):
+    """invoke_model sends the provider-specific body and parses the reply."""
+    slow_runtime.latency = 0
+    slow_runtime.payload = {'completions': [{'data': {'text': 'Bonjour'}}]}
+
+    result = await invoke_model("Translate 'Hello' to French", model='ai21.j2-ultra-v1')
+
+    assert result == 'Bonjour'
+    assert slow_runtime.calls == [('ai21.j2-ultra-v1', '{"prompt": "Translate \'Hello\' to French"}')]
+
+
+class StreamingRuntimeClient:
+    """bedrock-runtime stand-in whose response body is a stubbed event stream."""
+
+    def __init__(self, payloads, delay=0.0):
+        """Serve ``payloads`` as chunks, sleeping ``delay`` before each."""
+        self.payloads = payloads
+        self.delay = delay
+        self.delivered = 0
+
+    def _events(self):
+        for payload in self.payloads:
+            time.sleep(self.delay)
+            self.delivered += 1
+            yield {'chunk': {'bytes': json.dumps(payload).encode()}}
+
+    def invoke_model_with_response_stream(self, body, modelId, accept, contentType):  # noqa: N803
+        """Return a response whose body is the stubbed event stream."""
+        return {'body': self._events(), 'contentType': contentType}
+
+
+STREAMING_SUMMARIES = [
+    {
+        'modelArn': f'arn:aws:bedrock:us-east-1::foundation-model/{model_id}',
+        'modelId': model_id,
+        'responseStreamingSupported': True,
+    }
+    for model_id in ('anthropic.claude-3-haiku-20240307-v1:0', 'amazon.titan-text-express-v1')
+]
+
+
+@pytest.fixture
+def warm_catalog(catalog_stubber, fresh_engine):
+    """Warm the model catalog and install a fresh engine."""
+    stubber, catalog, clock = catalog_stubber
+    stubber.add_response('list_foundation_models', {'modelSummaries': MODEL_SUMMARIES + STREAMING_SUMMARIES})
+    fresh_engine(max_workers=8)
+    return catalog
+
+
+@pytest.mark.parametrize("model, payloads", [
+    ("anthropic.claude-v2", [{'completion': 'Par'}, {'completion': 'is'}, {'completion': '', 'stop_reason': 'stop_sequence'}]),
+    ("anthropic.claude-3-haiku-20240307-v1:0", [
+        {'type': 'message_start'},
+        {'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': 'Par'}},
+        {'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': 'is'}},
+        {'type': 'message_stop', 'amazon-bedrock-invocationMetrics': {'outputTokenCount': 2}},
+    ]),
+    ("ai21.j2-ultra-v1", [{'choices': [{'delta': {'content': 'Par'}}]}, {'choices': [{'delta': {'content': 'is'}}]}]),
+    ("amazon.titan-text-express-v1", [{'outputText': 'Par', 'index': 0}, {'outputText': 'is', 'index': 0}]),
+])
+async def test_stream_model_decodes_provider_chunks(warm_catalog, install_runtime, model, payloads):
+    """stream_model yields each provider's text deltas in order."""
+    install_runtime(StreamingRuntimeClient(payloads))
+
+    tokens = [token async for token in bedrock_ops.stream_model("Capital of France", model=model)]
+
+    assert tokens == ['Par', 'is']
+
+
+async def test_stream_model_records_metrics(warm_catalog, install_runtime):
+    """Time-to-first-token and tokens-per-second are recorded for each call."""
+    payloads = [{'completion': f"t{i}"} for i in range(5)]
+    install_runtime(StreamingRuntimeClient(payloads, delay=0.02))
+    metrics = bedrock_ops.StreamMetrics(model='anthropic.claude-v2')
+
+    tokens = [t async for t in bedrock_ops.stream_model("p", metrics=metrics)]
+
+    assert len(tokens) == 5
+    assert metrics.chunks == 5
+    assert metrics.time_to_first_token >= 0.02
+    assert metrics.tokens_per_second > 0
+    assert bedrock_ops.stream_metrics[-1] is metrics
+
+
+async def test_stream_model_early_exit_stops_reader(warm_catalog, install_runtime):
+    """Abandoning the stream stops the reader thread instead of draining it."""
+    runtime = StreamingRuntimeClient([{'completion': 'x'}] * 100, delay=0.005)
+    install_runtime(runtime)
+
+    stream = bedrock_ops.stream_model("p")
+    assert await anext(stream) == 'x'
+    await stream.aclose()
+    await asyncio.sleep(0.05)
+
+    assert runtime.delivered < 100
+
+
+async def test_stream_model_reader_waits_for_slow_consumer(warm_catalog, install_runtime, monkeypatch):
+    """The reader thread stops a bounded number of events ahead of a consumer that is not reading."""
+    monkeypatch.setattr(bedrock_ops, 'BEDROCK_STREAM_BUFFER', 4)
+    runtime = StreamingRuntimeClient([{'completion': 'x'}] * 100)
+    install_runtime(runtime)
+
+    stream = bedrock_ops.stream_model("p")
+    assert await anext(stream) == 'x'
+    await asyncio.sleep(0.1)
+    ahead = runtime.delivered
+    tokens = [token async for token in stream]
+
+    assert ahead <= 1 + 4 + 2
+    assert len(tokens) == 99
+
+
+@pytest.fixture
+def batch_runtime(warm_catalog, fake_runtime, install_runtime, instant_backoff):
+    """Install a runtime client that upper-cases each prompt and rejects those containing 'reject'."""
+
+    def respond(request, model_id):
+        if 'reject' in request['prompt']:
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'Bad prompt'}}, 'InvokeModel')
+        return {'completion': request['prompt'].split('Human: ')[1].split('\n')[0].upper()}
+
+    return install_runtime(fake_runtime(latency=0.001, respond=respond))
+
+
+async def test_invoke_many_preserves_order_and_reports_errors(batch_runtime):
+    """Results come back in input order with per-item errors."""
+    prompts = [f"p{i}" for i in range(30)] + ['reject me']
+
+    results = await bedrock_ops.invoke_many(prompts, requests_per_minute=60000, max_in_flight=8)
+
+    assert [r.index for r in results] == list(range(31))
+    assert [r.output for r in results[:30]] == [f"P{i}" for i in range(30)]
+    assert not results[-1].ok
+    assert results[-1].error.response['Error']['Code'] == 'ValidationException'
+
+
+async def test_invoke_many_backs_off_on_throttling(batch_runtime):
+    """Throttled calls are retried and the model's request rate is cut."""
+    batch_runtime.throttles = 5
+
+    results = await bedrock_ops.invoke_many([f"p{i}" for i in range(10)], requests_per_minute=60000, max_in_flight=4)
+
+    limiter = bedrock_ops.rate_limiters['anthropic.claude-v2']
+    assert all(r.ok for r in results)
+    assert sum(r.attempts for r in results) == 15
+    assert limiter.throttles == 5
+    assert limiter.requests_per_minute < 60000
+
+
+async def test_invoke_many_gives_up_after_max_attempts(batch_runtime):
+    """A prompt that is throttled on every attempt is reported, not raised."""
+    batch_runtime.throttles = 100
+
+    results = await bedrock_ops.invoke_many(["p"], requests_per_minute=60000, max_attempts=3)
+
+    assert results[0].attempts == 3
+    assert results[0].error.response['Error']['Code'] == 'ThrottlingException'
+
+
+async def test_rate_limiter_applies_the_latest_budget(batch_runtime):
+    """A later call with a lower budget for the same model slows the shared limiter down."""
+    await bedrock_ops.invoke_many(["p"], requests_per_minute=60000)
+    limiter = bedrock_ops.rate_limiter('anthropic.claude-v2', requests_per_minute=600, tokens_per_minute=9000)
+
+    assert limiter is bedrock_ops.rate_limiters['anthropic.claude-v2']
+    assert (limiter.max_requests_per_minute, limiter.requests_per_minute) == (600, 600)
+    assert limiter.max_tokens_per_minute == 9000
+
+
+async def test_iter_invoke_many_streams_as_completed(batch_runtime):
+    """iter_invoke_many yields every result as soon as it completes."""
+    seen = [r.index async for r in bedrock_ops.iter_invoke_many(iter(["a", "b", "c"]), requests_per_minute=60000)]
+
+    assert sorted(seen) == [0, 1, 2]
+
+
+@pytest.fixture
+def cached_runtime(slow_runtime, monkeypatch, tmp_path):
+    """Enable a disk-backed response cache over the slow runtime client.
+
+    Yields a tuple of (runtime, cache).
+    """
+    slow_runtime.latency = 0.05
+    monkeypatch.setattr(bedrock_ops, 'response_cache', None)
+    cache = bedrock_ops.enable_response_cache(str(tmp_path / 'responses.db'))
+    yield slow_runtime, cache
+    bedrock_ops.disable_response_cache()
+
+
+async def test_response_cache_coalesces_and_hits(cached_runtime):
+    """Concurrent duplicates make one upstream call; later repeats are cache hits."""
+    runtime, cache = cached_runtime
+
+    greedy = {'temperature': 0}
+    results = await asyncio.gather(*(invoke_model("same prompt", params=greedy) for _ in range(20)))
+    again = await invoke_model("same prompt", params=greedy)
+
+    assert results == ['ok'] * 20
+    assert again == 'ok'
+    assert len(runtime.calls) == 1
+    stats = cache.stats()
+    assert stats['coalesced'] == 19
+    assert stats['memory_hits'] == 1
+    assert stats['bytes_served'] == 2
+
+
+async def test_response_cache_survives_cancelled_first_caller(cached_runtime):
+    """Cancelling the caller that started a fetch still delivers and caches its result."""
+    runtime, cache = cached_runtime
+    greedy = {'temperature': 0}
+
+    first = asyncio.ensure_future(invoke_model("same prompt", params=greedy))
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(invoke_model("same prompt", params=greedy))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == 'ok'
+    assert await invoke_model("same prompt", params=greedy) == 'ok'
+    assert first.cancelled()
+    assert len(runtime.calls) == 1
+    assert cache.stats()['coalesced'] == 1
+    assert cache.stats()['memory_hits'] == 1
+
+
+async def test_response_cache_keys_on_params_and_bypasses_temperature(cached_runtime):
+    """Different parameters miss; default or non-zero temperature never touches the cache."""
+    runtime, cache = cached_runtime
+
+    await invoke_model("p", params={'max_tokens_to_sample': 10, 'temperature': 0})
+    await invoke_model("p", params={'max_tokens_to_sample': 10, 'temperature': 0})
+    await invoke_model("p", params={'max_tokens_to_sample': 20, 'temperature': 0})
+    await invoke_model("p", params={'temperature': 0.7})
+    await invoke_model("p", params={'temperature': 0.7})
+    await invoke_model("p")
+    await invoke_model("p")
+
+    assert len(runtime.calls) == 6
+    assert cache.stats()['hits'] == 1
+    assert bedrock_ops._is_deterministic({'textGenerationConfig': {'temperature': 0}})
+    assert not bedrock_ops._is_deterministic({'textGenerationConfig': {}})
+
+
+class FakeBatchBedrock:
+    """Bedrock control plane whose batch jobs finish after a fixed number of polls, writing output to S3."""
+
+    def __init__(self, polls_to_finish=2, failing_records=(), failing_jobs=()):
+        """Configure how long jobs run and which records and jobs fail."""
+        self.polls_to_finish = polls_to_finish
+        self.failing_records = set(failing_records)
+        self.failing_jobs = set(failing_jobs)
+        self.jobs = {}
+        self.max_running = 0
+        self.list_calls = 0
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+
+    def create_model_invocation_job(self, jobName, roleArn, modelId, inputDataConfig, outputDataConfig, **kwargs):  # noqa: N803
+        """Read the job's input records from S3 and start the job."""
+        bucket, key = inputDataConfig['s3InputDataConfig']['s3Uri'][5:].split('/', 1)
+        records = [json.loads(line) for line in self.s3.get_object(Bucket=bucket, Key=key)['Body'].iter_lines()]
+        self.jobs[jobName] = {
+            'arn': f'arn:aws:bedrock:us-east-1:123456789012:model-invocation-job/{jobName[-5:]}id',
+            'records': records, 'polls': 0, 'status': 'InProgress', 'input_key': key,
+            'output': outputDataConfig['s3OutputDataConfig']['s3Uri'][5:].split('/', 1)[1],
+        }
+        self.max_running = max(self.max_running, sum(j['status'] == 'InProgress' for j in self.jobs.values()))
+        return {'jobArn': self.jobs[jobName]['arn']}
+
+    def get_paginator(self, name):
+        """Return this client as the job-listing paginator."""
+        return self
+
+    def paginate(self, nameContains):  # noqa: N803
+        """List every job, advancing and finishing the ones still in progress."""
+        self.list_calls += 1
+        summaries = []
+        for name, job in self.jobs.items():
+            if job['status'] == 'InProgress':
+                job['polls'] += 1
+                if job['polls'] >= self.polls_to_finish:
+                    self._finish(name, job)
+            summaries.append({'jobName': name, 'jobArn': job['arn'], 'status': job['status']})
+        yield {'invocationJobSummaries': summaries}
+
+    def _finish(self, name, job):
+        if name in self.failing_jobs:
+            job['status'] = 'Failed'
+            return
+        lines = []
+        for record in job['records']:
+            if record['recordId'] in self.failing_records:
+                lines.append({'recordId': record['recordId'], 'error': {'errorMessage': 'Input is too long'}})
+            else:
+                completion = record['modelInput']['prompt'].split('Human: ')[1].split('\n')[0].upper()
+                lines.append({'recordId': record['recordId'], 'modelOutput': {'completion': completion}})
+        folder = f"{job['output']}{job['arn'].rsplit('/', 1)[-1]}/"
+        body = '\n'.join(json.dumps(line) for line in lines)
+        self.s3.put_object(Bucket='batch', Key=f"{folder}{job['input_key'].rsplit('/', 1)[-1]}.out", Body=body)
+        self.s3.put_object(Bucket='batch', Key=f"{folder}manifest.json.out", Body='{}')
+        job['status'] = 'Completed'
+
+
+@pytest.fixture
+def batch_bedrock(monkeypatch):
+    """Moto S3 with a 'batch' bucket and a FakeBatchBedrock installed as the bedrock client."""
+    from moto import mock_aws
+
+    from aws_management.src.utils import config
+    from aws_management.src.utils.config import ClientRegistry
+
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='batch')
+        monkeypatch.setattr(config, 'registry', ClientRegistry())
+        with config.registry.override('bedrock', FakeBatchBedrock()) as fake:
+            yield fake
+
+
+async def _collect_batch(prompts, **kwargs):
+    return [
+        result async for result in bedrock_ops.iter_batch_inference(
+            prompts, 'batch', 'arn:aws:iam::123456789012:role/batch', run_name='run', poll_interval=0, **kwargs,
+        )
+    ]
+
+
+async def test_batch_inference_shards_and_joins_results(batch_bedrock):
+    """250 prompts become three jobs, at most two running, with every output joined to its record ID."""
+    fake = batch_bedrock
+    fake.failing_records = {'00000000007'}
+
+    results = await _collect_batch((f'prompt {i}' for i in range(250)), records_per_job=100, max_jobs=2)
+
+    by_id = {result.record_id: result for result in results}
+    assert len(results) == len(by_id) == 250
+    assert sorted(fake.jobs) == ['run-00000', 'run-00001', 'run-00002']
+    assert fake.max_running == 2
+    assert by_id['00000000042'].output == 'PROMPT 42'
+    assert by_id['00000000249'].job_arn.endswith('/00002id')
+    assert by_id['00000000007'].error == 'Input is too long'
+    assert [r.record_id for r in results if not r.ok] == ['00000000007']
+
+
+async def test_batch_inference_reports_failed_jobs_per_record(batch_bedrock):
+    """Every record of a failed job is reported with an error; other jobs still produce output."""
+    batch_bedrock.failing_jobs = {'run-00000'}
+
+    results = await _collect_batch([(f'doc-{i}', f'text {i}') for i in range(4)], records_per_job=2)
+
+    assert {r.record_id: r.ok for r in results} == {'doc-0': False, 'doc-1': False, 'doc-2': True, 'doc-3': True}
+    assert {r.error for r in results if not r.ok} == {'Job ended Failed'}
+
+
+@pytest.fixture
+def embedding_runtime(fake_runtime, install_runtime, fresh_engine, instant_backoff):
+    """Install a runtime client embedding each text as [len(text), index-in-request, 1], and a fresh engine."""
+
+    def respond(request, model_id):
+        if 'texts' in request:
+            return {'embeddings': [[len(t), i, 1] for i, t in enumerate(request['texts'])]}
+        return {'embedding': [len(request['inputText']), 0, 1]}
+
+    fresh_engine(max_workers=8)
+    return install_runtime(fake_runtime(latency=0.005, respond=respond))
+
+
+async def test_embed_texts_batches_cohere_into_memmap(embedding_runtime, tmp_path):
+    """Cohere texts go 96 per request, concurrently, into an on-disk float32 matrix in input order."""
+    np = pytest.importorskip('numpy')
+    texts = ['x' * (i % 50) for i in range(200)]
+    path = str(tmp_path / 'vectors.npy')
+
+    vectors = await bedrock_ops.embed_texts(texts, model='cohere.embed-english-v3', path=path,
+                                            requests_per_minute=60000)
+
+    assert len(embedding_runtime.calls) == 3
+    assert embedding_runtime.peak > 1
+    assert vectors.dtype == np.float32 and vectors.shape == (200, 3)
+    stored = np.load(path, mmap_mode='r')
+    assert stored[:, 0].tolist() == [i % 50 for i in range(200)]
+    assert stored[100, 1] == 4  # position 4 of the second request
+
+
+async def test_embed_texts_titan_retries_throttles_and_normalizes(embedding_runtime):
+    """Titan gets one text per request; throttled requests are retried, and vectors can be normalized."""
+    np = pytest.importorskip('numpy')
+    embedding_runtime.throttles = 3
+
+    vectors = await bedrock_ops.embed_texts(['abc', 'abcd'], normalize=True, requests_per_minute=60000)
+
+    assert len(embedding_runtime.calls) == 5
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert vectors[1, 0] > vectors[0, 0]
+
+
+async def test_embed_texts_rejects_oversized_batches_and_handles_empty_input(embedding_runtime, tmp_path):
+    """Titan cannot batch, so batch_size > 1 is refused; no texts still yields a reloadable file."""
+    np = pytest.importorskip('numpy')
+    with pytest.raises(ValueError, match='batch_size'):
+        await bedrock_ops.embed_texts(['a', 'b'], batch_size=2)
+
+    path = str(tmp_path / 'empty.npy')
+    vectors = await bedrock_ops.embed_texts([], path=path)
+
+    assert isinstance(vectors, np.memmap) and vectors.shape == (0, 0)
+    assert np.load(path, mmap_mode='r').shape == (0, 0)
+    assert not embedding_runtime.calls
+
+
+@pytest.fixture
+def regional_runtimes(fake_runtime, install_runtime, fresh_engine):
+    """Install one runtime client per region, answering '<region>:<model>', with a fresh engine.
+
+    Yields ``install(**{region: (latency, throttled_models)})``, which returns the clients by region.
+    """
+    fresh_engine(max_workers=8)
+
+    def install(**regions):
+        clients = {}
+        for region, (latency, throttled_models) in regions.items():
+            client = fake_runtime(latency=latency, throttled_models=throttled_models,
+                                  respond=lambda request, model_id, region=region: {'completion': f'{region}:{model_id}'})
+            clients[region] = install_runtime(client, region=region)
+        return clients
+
+    return install
+
+
+def test_router_requires_regions():
+    """A router with nothing to route to is rejected up front."""
+    with pytest.raises(ValueError, match='region'):
+        bedrock_ops.RegionRouter([])
+
+
+async def test_router_learns_the_fastest_region(regional_runtimes):
+    """After every region has been measured, calls go to the one with the lowest latency EWMA."""
+    clients = regional_runtimes(**{
+        'us-east-1': (0.06, ()),
+        'us-west-2': (0.005, ()),
+    })
+    router = bedrock_ops.RegionRouter(list(clients), explore=0, initial_hedge_delay=10)
+
+    outputs = [await router.invoke('hi', 'anthropic.claude-v2') for _ in range(10)]
+
+    assert outputs[-8:] == ['us-west-2:anthropic.claude-v2'] * 8
+    assert len(clients['us-east-1'].calls) == 1
+    stats = router.stats()['regions']
+    assert stats[('us-west-2', 'anthropic.claude-v2')]['latency_ms'] < stats[('us-east-1', 'anthropic.claude-v2')]['latency_ms']
+
+
+async def test_router_hedges_a_slow_region_and_keeps_the_winner(regional_runtimes):
+    """A request stuck past the region's p95 is duplicated to the next region, which answers first."""
+    clients = regional_runtimes(**{
+        'us-east-1': (0.5, ()),
+        'eu-west-1': (0.01, ()),
+    })
+    router = bedrock_ops.RegionRouter(list(clients), explore=0, min_hedge_delay=0.02)
+    for _ in range(20):
+        router.record('us-east-1', 'anthropic.claude-v2', 0.02)
+        router.record('eu-west-1', 'anthropic.claude-v2', 0.04)
+
+    start = time.perf_counter()
+    output = await router.invoke('hi', 'anthropic.claude-v2')
+    elapsed = time.perf_counter() - start
+
+    assert output == 'eu-west-1:anthropic.claude-v2'
+    assert elapsed < 0.3
+    assert router.hedges == router.hedge_wins == 1
+    await asyncio.sleep(0.6)
+    # The cancelled request still reported its latency once its thread finished.
+    assert router.stats()['regions'][('us-east-1', 'anthropic.claude-v2')]['latency_ms'] > 20
+
+
+async def test_invoke_model_fails_over_regions_then_to_fallback_model(warm_catalog, regional_runtimes):
+    """Throttling in every region moves invoke_model on to the configured fallback model."""
+    primary, fallback = 'anthropic.claude-v2', 'anthropic.claude-instant-v1'
+    clients = regional_runtimes(**{
+        'us-east-1': (0.001, {primary}),
+        'us-west-2': (0.001, {primary}),
+    })
+    router = bedrock_ops.enable_region_routing(list(clients), fallbacks={primary: fallback}, explore=0)
+    try:
+        output = await invoke_model('hi', primary)
+    finally:
+        bedrock_ops.disable_region_routing()
+
+    assert output.endswith(f':{fallback}')
+    assert router.failovers == 1
+    # One throttled call per region for the primary, then one call for the fallback.
+    assert sum(len(c.calls) for c in clients.values()) == 3
+
+
+class ConverseRuntimeClient:
+    """Runtime stand-in for Converse that reports cache reads once a cached prefix has been seen."""
+
+    def __init__(self):
+        """Start with no requests and no cached prefixes."""
+        self.requests = []
+        self.cached_prefixes = set()
+        self.content = None
+
+    def converse(self, **request):
+        """Record the request and answer with usage reflecting cache reads and writes."""
+        self.requests.append(request)
+        content = request['messages'][0]['content']
+        prefix = json.dumps([request.get('system'), content[:-1]])
+        cached = any('cachePoint' in block for block in content + request.get('system', []))
+        hit = cached and prefix in self.cached_prefixes
+        if cached:
+            self.cached_prefixes.add(prefix)
+        usage = {'inputTokens': 10, 'outputTokens': 5, 'totalTokens': 15}
+        if cached:
+            usage['cacheReadInputTokens' if hit else 'cacheWriteInputTokens'] = 1000
+        return {
+            'output': {'message': {'role': 'assistant',
+                                   'content': self.content or [{'text': content[-1]['text'].upper()}]}},
+            'stopReason': 'end_turn', 'usage': usage, 'metrics': {'latencyMs': 100 if hit else 900},
+        }
+
+
+@pytest.fixture
+def converse_runtime(install_runtime, fresh_engine, monkeypatch):
+    """Install a Converse stand-in, a fresh engine and fresh usage totals."""
+    fresh_engine(max_workers=4)
+    monkeypatch.setattr(bedrock_ops, 'converse_usage', bedrock_ops.TokenUsage())
+    return install_runtime(ConverseRuntimeClient())
+
+
+async def test_converse_template_caches_shared_prefix(converse_runtime):
+    """System prompt and context are marked with cache points, and later calls read them from the cache."""
+    template = bedrock_ops.ConverseTemplate(
+        'us.anthropic.claude-3-7-sonnet-20250219-v1:0', system='You are terse.', context='<docs>...</docs>',
+        params={'max_tokens': 200, 'temperature': 0, 'top_k': 5},
+    )
+
+    results = [await bedrock_ops.converse(f'q{i}', template=template) for i in range(3)]
+
+    request = converse_runtime.requests[0]
+    assert request['system'] == [{'text': 'You are terse.'}, {'cachePoint': {'type': 'default'}}]
+    assert request['messages'][0]['content'] == [
+        {'text': '<docs>...</docs>'}, {'cachePoint': {'type': 'default'}}, {'text': 'q0'},
+    ]
+    assert request['inferenceConfig'] == {'maxTokens': 200, 'temperature': 0}
+    assert request['additionalModelRequestFields'] == {'top_k': 5}
+    assert [r.text for r in results] == ['Q0', 'Q1', 'Q2']
+    assert [r.cache_read_tokens for r in results] == [0, 1000, 1000]
+    assert template.usage.cache_write_tokens == 1000
+    assert template.usage.cache_hit_ratio == pytest.approx(2000 / 3030)
+    assert bedrock_ops.converse_usage.calls == 3
+
+
+async def test_converse_skips_cache_points_for_unsupported_models(converse_runtime):
+    """Models without prompt caching get the same prefix without cache points."""
+    template = bedrock_ops.ConverseTemplate('anthropic.claude-v2', system='sys', context='ctx')
+
+    result = await bedrock_ops.converse('hello', template=template)
+
+    assert result.text == 'HELLO' and result.cache_read_tokens == 0
+    request = converse_runtime.requests[0]
+    assert 'cachePoint' not in json.dumps(request)
+    assert request['messages'][0]['content'] == [{'text': 'ctx'}, {'text': 'hello'}]
+
+
+async def test_converse_joins_text_and_skips_non_text_blocks(converse_runtime):
+    """A reply made only of non-text blocks has empty text; mixed replies keep just the text."""
+    converse_runtime.content = [{'toolUse': {'toolUseId': 't1', 'name': 'lookup', 'input': {}}}]
+    assert (await bedrock_ops.converse('hi')).text == ''
+
+    converse_runtime.content = [{'reasoningContent': {'reasoningText': {'text': 'hmm'}}}, {'text': 'A'}, {'text': 'B'}]
+    assert (await bedrock_ops.converse('hi')).text == 'AB'
+
+
+async def test_converse_with_real_client_validates(fresh_engine):
+    """A real client only gets cache points if its botocore release can validate them."""
+    fresh_engine(max_workers=2)
+    client = boto3.client('bedrock-runtime', region_name='us-east-1')
+    template = bedrock_ops.ConverseTemplate('anthropic.claude-3-5-haiku-20241022-v1:0', system='sys')
+    with registry.override('bedrock-runtime', client), Stubber(client) as stubber:
+        stubber.add_response('converse', {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': 'ok'}]}},
+            'stopReason': 'end_turn', 'usage': {'inputTokens': 3, 'outputTokens': 1, 'totalTokens': 4},
+            'metrics': {'latencyMs': 12},
+        }, template.request('hi', bedrock_ops._accepts_cache_points(client)))
+        result = await bedrock_ops.converse('hi', template=template)
+
+    assert (result.text, result.input_tokens, result.latency_ms) == ('ok', 3, 12)
+
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 64
+
+
+@pytest.fixture
+def image_runtime(batch_bedrock, fake_runtime, fresh_engine, instant_backoff, monkeypatch):
+    """Moto S3 with a 'batch' bucket, a runtime client returning base64 PNGs, a fresh engine, and no temp files."""
+    from aws_management.src.utils import config
+
+    def respond(request, model_id):
+        image = base64.b64encode(PNG).decode()
+        if 'text_prompts' in request:
+            reason = 'CONTENT_FILTERED' if 'blocked' in request['text_prompts'][0]['text'] else 'SUCCESS'
+            return {'artifacts': [{'base64': image, 'finishReason': reason}]}
+        return {'images': [image] * request['imageGenerationConfig'].get('numberOfImages', 1)}
+
+    fresh_engine(max_workers=16)
+    monkeypatch.setattr(bedrock_ops.tempfile, 'NamedTemporaryFile', None)
+    with config.registry.override('bedrock-runtime', fake_runtime(latency=0.02, respond=respond)) as runtime:
+        yield runtime
+
+
+async def test_generate_images_streams_decoded_images_to_s3(image_runtime):
+    """SDXL prompts run concurrently; images are uploaded from memory and filtered ones reported."""
+    prompts = (f'a lighthouse {i}' if i != 3 else 'blocked' for i in range(12))
+
+    results, metrics = await bedrock_ops.generate_images(prompts, 'batch', prefix='run/', requests_per_minute=60000,
+                                                         max_in_flight=6, decode_workers=2)
+
+    assert image_runtime.peak > 1
+    assert [r.index for r in results] == list(range(12))
+    assert not results[3].ok and 'no images' in str(results[3].error)
+    assert results[0].keys == ['run/000000-0.png']
+    s3 = boto3.client('s3', region_name='us-east-1')
+    stored = s3.get_object(Bucket='batch', Key='run/000011-0.png')
+    assert stored['ContentType'] == 'image/png' and stored['Body'].read() == PNG
+    assert (metrics.prompts, metrics.images, metrics.failed, metrics.bytes) == (12, 11, 1, 11 * len(PNG))
+    assert metrics.images_per_minute > 0 and metrics.peak_rss_bytes > 0
+
+
+async def test_iter_generate_images_titan_retries_throttles(image_runtime):
+    """Titan requests carry the generation config, throttles are retried, and every image gets its own key."""
+    image_runtime.throttles = 2
+
+    results = [
+        result async for result in bedrock_ops.iter_generate_images(
+            ['a', 'b'], 'batch', model='amazon.titan-image-generator-v2:0', params={'numberOfImages': 2},
+            requests_per_minute=60000,
+        )
+    ]
+
+    assert sorted(key for r in results for key in r.keys) == [
+        'images/000000-0.png', 'images/000000-1.png', 'images/000001-0.png', 'images/000001-1.png',
+    ]
+    assert sum(r.attempts for r in results) == 4
+    request = json.loads(image_runtime.calls[-1][1])
+    assert request['taskType'] == 'TEXT_IMAGE' and request['imageGenerationConfig'] == {'numberOfImages': 2}
+    with pytest.raises(ValueError):
+        await anext(bedrock_ops.iter_generate_images(['a'], 'batch', model='anthropic.claude-v2'))
@@ -0,0 +1,48 @@
+import json
+
+from aws_management.benchmarks.suite import compare, main, run_benchmarks
+
+
+def _report(**results):
+    return {'meta': {}, 'results': results}
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    """Slower throughput or higher latency beyond the tolerance is reported; improvements are not."""
+    baseline = _report(a={'throughput': 100.0, 'p50_ms': 10.0, 'p99_ms': 20.0}, b={'throughput': 50.0})
+    current = _report(
+        a={'throughput': 80.0, 'p50_ms': 10.5, 'p99_ms': 30.0},
+        b={'throughput': 90.0},
+        c={'throughput': 1.0},
+    )
+
+    regressions = compare(current, baseline, tolerance=0.1)
+
+    assert regressions == [
+        'a throughput: 100.0 -> 80.0 (-20%)',
+        'a p99_ms: 20.0 -> 30.0 (+50%)',
+    ]
+
+
+def test_run_benchmarks_offline():
+    """A benchmark runs against the stub backend and reports throughput and percentiles."""
+    report = run_benchmarks(['bedrock.invoke_single'], scale=0.1)
+
+    result = report['results']['bedrock.invoke_single']
+    assert set(report['results']) == {'bedrock.invoke_single'}
+    assert result['ops'] == 10
+    assert result['p50_ms'] >= 20.0
+    assert result['p99_ms'] >= result['p50_ms']
+
+
+def test_main_exits_nonzero_on_regression(tmp_path):
+    """The comparison mode fails the run when a stored baseline was faster."""
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps(_report(**{'bedrock.invoke_single': {'throughput': 1e9}})))
+    output = tmp_path / 'current.json'
+
+    status = main(['--only', 'bedrock.invoke_single', '--scale', '0.1',
+                   '--output', str(output), '--baseline', str(baseline)])
+
+    assert status == 1
+    assert 'bedrock.invoke_single' in json.loads(output.read_text())['results']
@@ -0,0 +1,73 @@
+from aws_management.src.utils.cache import ResponseCache, content_key
+
+
+class FakeClock:
+    """Manually advanced wall clock."""
+
+    def __init__(self):
+        """Start the clock at a fixed time."""
+        self.now = 1000.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+def test_content_key_normalizes_key_order():
+    """Bodies that differ only in key order share a key."""
+    assert content_key('m', {'a': 1, 'b': 2}) == content_key('m', {'b': 2, 'a': 1})
+    assert content_key('m', {'a': 1}) != content_key('n', {'a': 1})
+
+
+def test_memory_tier_lru_eviction():
+    """The least recently used entry is evicted first."""
+    cache = ResponseCache(max_entries=2)
+    cache.put('a', b'1')
+    cache.put('b', b'2')
+    cache.get('a')
+    cache.put('c', b'3')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    """Entries written to disk are served, and promoted, by a new cache instance."""
+    path = str(tmp_path / 'cache.db')
+    cache = ResponseCache(path)
+    cache.put('k', b'value')
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get('k', memory_only=True) is None
+    assert reopened.get('k') == b'value'
+    assert reopened.get('k') == b'value'
+    assert reopened.stats()['disk_hits'] == 1
+    assert reopened.stats()['memory_hits'] == 1
+
+
+def test_disk_tier_size_eviction(tmp_path):
+    """The disk tier drops least recently used entries past its byte limit."""
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_entries=1, max_disk_bytes=25)
+    clock = FakeClock()
+    cache._clock = clock
+    for key in 'abc':
+        clock.now += 1
+        cache.put(key, b'x' * 10)
+
+    assert cache.stats()['disk_bytes'] == 20
+    assert cache.get('a') is None
+    assert cache.get('b') == b'x' * 10
+
+
+def test_ttl_expiry(tmp_path):
+    """Expired entries are misses in both tiers."""
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttl=10, clock=clock)
+    cache.put('k', b'v')
+    clock.now += 11
+
+    assert cache.get('k') is None
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['disk_bytes'] == 0
@@ -0,0 +1,112 @@
+import asyncio
+
+from aws_management.src.services.chat_ops import (
+    ChatMemory,
+    ConversationStore,
+    count_tokens,
+)
+
+
+class FakeSummarizer:
+    """Records each fold and returns a short summary naming how many turns it has seen."""
+
+    def __init__(self, delay=0.0):
+        """Sleep ``delay`` seconds in each summary call."""
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, summary, turns):
+        """Record the fold and summarize it as a running turn count."""
+        self.calls.append((summary, [text for _, text in turns]))
+        await asyncio.sleep(self.delay)
+        seen = int(summary.split()[1]) if summary else 0
+        return f"covers {seen + len(turns)} turns"
+
+
+async def test_prompt_stays_bounded_over_long_conversation():
+    """Prompt size stays under the hard cap for hundreds of turns while history is folded away."""
+    summarizer = FakeSummarizer(delay=0.001)
+    memory = ChatMemory(summarize=summarizer, token_budget=300)
+
+    sizes = []
+    for i in range(400):
+        sizes.append(count_tokens(await memory.prompt('c1', f'message {i} ' + 'x' * 80)))
+        memory.add_turn('c1', 'user', f'message {i} ' + 'x' * 80)
+        await asyncio.sleep(0)
+    await memory.flush()
+
+    conversation = memory.conversation('c1')
+    assert max(sizes) <= memory.max_tokens + 30
+    assert conversation.folded + len(conversation.turns) == 400
+    assert conversation.summary == f"covers {conversation.folded} turns"
+
+
+async def test_folds_are_incremental_and_keep_concurrent_turns():
+    """A fold sends only the old summary and new turns; turns added meanwhile survive it."""
+    summarizer = FakeSummarizer(delay=0.05)
+    memory = ChatMemory(summarize=summarizer, token_budget=100, min_recent_turns=2)
+
+    for i in range(6):
+        memory.add_turn('c1', 'user', f'turn {i} ' + 'y' * 80)
+    memory.add_turn('c1', 'assistant', 'added during the fold')
+    await memory.flush('c1')
+    for i in range(6, 10):
+        memory.add_turn('c1', 'user', f'turn {i} ' + 'y' * 80)
+    await memory.flush('c1')
+
+    first, second = summarizer.calls[:2]
+    assert first[0] == '' and second[0] == f'covers {len(first[1])} turns'
+    assert not set(first[1]) & set(second[1])
+    texts = [text for _, text in memory.conversation('c1').turns]
+    assert texts[-1] == 'turn 9 ' + 'y' * 80
+    assert memory.folds == len(summarizer.calls)
+
+
+async def test_store_persists_conversations(tmp_path):
+    """State is stored compressed per conversation ID and reloads into a new ChatMemory."""
+    path = str(tmp_path / 'chat.db')
+    memory = ChatMemory(ConversationStore(path), summarize=FakeSummarizer(), token_budget=100)
+    for i in range(8):
+        memory.add_turn('a', 'user', f'hello {i} ' + 'z' * 200)
+    memory.add_turn('b', 'user', 'separate')
+    await memory.flush()
+    memory.store.close()
+
+    store = ConversationStore(path)
+    reloaded = ChatMemory(store, summarize=FakeSummarizer())
+    a = reloaded.conversation('a')
+    assert a.summary == f'covers {a.folded} turns' and a.folded + len(a.turns) == 8
+    assert reloaded.conversation('b').turns == [['user', 'separate']]
+    assert 0 < store.size('a') < 8 * 200
+    store.delete('b')
+    assert store.get('b').turns == []
+
+
+async def test_turns_added_without_a_loop_fold_on_next_prompt():
+    """add_turn works outside an event loop; the deferred fold runs when the prompt is built."""
+    summarizer = FakeSummarizer()
+    memory = ChatMemory(summarize=summarizer, token_budget=100, max_tokens=150)
+
+    def add_turns():
+        for i in range(8):
+            memory.add_turn('c1', 'user', f'turn {i} ' + 'w' * 80)
+
+    await asyncio.to_thread(add_turns)
+    assert not summarizer.calls
+
+    prompt = await memory.prompt('c1', 'next')
+
+    assert summarizer.calls
+    assert count_tokens(prompt) <= memory.max_tokens + 10
+
+
+async def test_live_conversations_are_bounded():
+    """Least recently used conversations are dropped from memory and reloaded from the store."""
+    memory = ChatMemory(summarize=FakeSummarizer(), max_conversations=3)
+    for n in range(5):
+        memory.add_turn(f'c{n}', 'user', f'hello {n}')
+    memory.conversation('c2')
+    memory.add_turn('c5', 'user', 'hello 5')
+
+    assert list(memory._conversations) == ['c4', 'c2', 'c5']
+    assert memory.conversation('c0').turns == [['user', 'hello 0']]
@@ -1,8 +1,9 @@
 import uuid
+
 import boto3
 import pytest
-from moto import mock_aws
 from botocore.stub import Stubber
+from moto import mock_aws
 
 dummy_token = str(uuid.uuid4())
 
@@ -59,4 +60,31 @@ def bedrock_client(aws_credentials, monkeypatch):
     
     yield mock_client
     
-    stubber.deactivate()
\ No newline at end of file
+    stubber.deactivate()
+
+def test_registry_reuses_clients(aws_credentials):
+    """One client is built per (service, region, profile) and shared across threads."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from aws_management.src.utils.config import ClientRegistry
+
+    registry = ClientRegistry()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        clients = list(pool.map(lambda _: registry.client("s3", "us-east-1"), range(64)))
+
+    assert all(client is clients[0] for client in clients)
+    assert registry.client("s3", "us-west-2") is not clients[0]
+    assert clients[0].meta.config.max_pool_connections == registry.config.max_pool_connections
+    assert registry.client("bedrock-runtime", "us-east-1").meta.config.read_timeout == 300
+
+
+def test_registry_override(aws_credentials):
+    """An injected client is returned for every region until the override ends."""
+    from aws_management.src.utils.config import ClientRegistry
+
+    registry = ClientRegistry()
+    stub = boto3.client("s3", region_name="us-east-1")
+    with registry.override("s3", stub):
+        assert registry.client("s3") is stub
+        assert registry.client("s3", "eu-west-1") is stub
+    assert registry.client("s3", "us-east-1") is not stub
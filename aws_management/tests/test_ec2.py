@@ -0,0 +1,200 @@
+import threading
+import time
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from aws_management.src.services.ec2_ops import (
+    InstanceRecord,
+    iter_instances,
+    list_instances,
+    to_columns,
+)
+from aws_management.src.utils import config
+from aws_management.src.utils.config import ClientRegistry, register_users
+
+REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-2']
+
+
+@pytest.fixture
+def moto_ec2(monkeypatch):
+    """Moto EC2 with 25 instances per region and a fresh client registry.
+
+    Yields the registry, whose default session adds 0.1s latency to each
+    DescribeInstances call to stand in for the network round trip.
+    """
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        for region in REGIONS:
+            client = boto3.client('ec2', region_name=region)
+            client.run_instances(ImageId='ami-12c6146b', MinCount=20, MaxCount=20, InstanceType='t3.micro')
+            client.run_instances(
+                ImageId='ami-12c6146b', MinCount=5, MaxCount=5, InstanceType='m5.large',
+                TagSpecifications=[{'ResourceType': 'instance', 'Tags': [{'Key': 'Name', 'Value': f'db-{region}'}]}],
+            )
+        registry = ClientRegistry()
+        registry.session().events.register(
+            'before-call.ec2.DescribeInstances', lambda **kwargs: time.sleep(0.1),
+        )
+        monkeypatch.setattr(config, 'registry', registry)
+        yield registry
+
+
+def test_iter_instances_across_regions(moto_ec2):
+    """Every region is scanned and instances are normalized into compact records."""
+    records = list_instances(REGIONS, page_size=10)
+
+    assert len(records) == 100
+    assert {r.region for r in records} == set(REGIONS)
+    named = [r for r in records if r.name]
+    assert len(named) == 20
+    assert all(r.instance_type == 'm5.large' and r.name == f'db-{r.region}' for r in named)
+    assert not hasattr(records[0], '__dict__')
+
+
+def test_iter_instances_server_side_filters(moto_ec2):
+    """Filters are applied by EC2, not after the fact."""
+    records = list_instances(REGIONS, filters={'instance-type': ['m5.large']}, include_tags=False)
+
+    assert len(records) == 20
+    assert all(r.tags is None for r in records)
+
+
+def test_iter_instances_scans_regions_concurrently(moto_ec2):
+    """Regions are scanned at the same time, not one after another."""
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def started(**kwargs):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.1)
+
+    def finished(**kwargs):
+        with lock:
+            in_flight[0] -= 1
+
+    moto_ec2.session().events.register('before-call.ec2.DescribeInstances', started)
+    moto_ec2.session().events.register('after-call.ec2.DescribeInstances', finished)
+
+    records = list_instances(REGIONS, page_size=10, max_workers=len(REGIONS))
+
+    assert len(records) == 100
+    assert peak[0] > 1
+
+
+def test_iter_instances_per_user_credentials(moto_ec2):
+    """USERS credential sets are scanned as separate profiles."""
+    names = register_users({
+        user: {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing', 'AWS_DEFAULT_REGION': 'us-east-1'}
+        for user in ('user1', 'user2')
+    })
+
+    records = list_instances(['us-east-1'], profiles=names)
+
+    assert sorted({r.profile for r in records}) == ['user1', 'user2']
+    assert len(records) == 50
+
+
+class FakePaginator:
+    """describe_instances paginator over synthetic instances with per-page latency."""
+
+    def __init__(self, region, count, latency):
+        """Serve ``count`` instances for ``region``, sleeping ``latency`` per page."""
+        self.region, self.count, self.latency = region, count, latency
+
+    def paginate(self, PaginationConfig, Filters=None):  # noqa: N803
+        """Yield pages of ``PageSize`` instances."""
+        size = PaginationConfig['PageSize']
+        for start in range(0, self.count, size):
+            time.sleep(self.latency)
+            yield {'Reservations': [{'Instances': [
+                {'InstanceId': f'i-{self.region}-{n}', 'InstanceType': 't3.micro', 'State': {'Name': 'running'}}
+                for n in range(start, min(start + size, self.count))
+            ]}]}
+
+
+class FakeEC2:
+    """EC2 client stand-in for one region."""
+
+    def __init__(self, region, count, latency):
+        """Serve ``count`` instances for ``region`` through one paginator."""
+        self.paginator = FakePaginator(region, count, latency)
+
+    def get_paginator(self, name):
+        """Return the shared describe_instances paginator."""
+        return self.paginator
+
+
+def test_iter_instances_thousands_streamed(monkeypatch):
+    """4,000 instances over 8 regions stream through in a fraction of the sequential time."""
+    regions = [f'region-{n}' for n in range(8)]
+    registry = ClientRegistry()
+    for region in regions:
+        registry.register('ec2', FakeEC2(region, 500, latency=0.02), region=region)
+    monkeypatch.setattr(config, 'registry', registry)
+
+    start = time.perf_counter()
+    sequential = sum(1 for _ in iter_instances(regions, page_size=100, max_workers=1))
+    sequential_time = time.perf_counter() - start
+    start = time.perf_counter()
+    columns = to_columns(iter_instances(regions, page_size=100, max_workers=8))
+    concurrent_time = time.perf_counter() - start
+
+    assert sequential == len(columns['instance_id']) == 4000
+    assert len(set(columns['instance_id'])) == 4000
+    assert concurrent_time < sequential_time / 3
+
+
+def test_iter_instances_early_exit_and_errors(monkeypatch):
+    """A failing region is reported without stopping others, and early exit releases workers."""
+    registry = ClientRegistry()
+    registry.register('ec2', FakeEC2('ok', 5000, latency=0.001), region='ok')
+    registry.register('ec2', FakeEC2('bad', 0, latency=0), region='bad')
+    monkeypatch.setattr(config, 'registry', registry)
+    errors = []
+
+    def broken(**kwargs):
+        raise ClientError({'Error': {'Code': 'UnauthorizedOperation', 'Message': 'no'}}, 'DescribeInstances')
+
+    reported = threading.Event()
+
+    def on_error(*args):
+        errors.append(args[:2])
+        reported.set()
+
+    monkeypatch.setattr(registry.client('ec2', 'bad').paginator, 'paginate', broken)
+    stream = iter_instances(['ok', 'bad'], page_size=5, on_error=on_error)
+    first = [next(stream) for _ in range(10)]
+    stream.close()
+
+    assert all(isinstance(r, InstanceRecord) for r in first)
+    assert reported.wait(timeout=5)
+    assert errors == [(None, 'bad')]
+
+
+def test_iter_instances_reports_region_listing_and_unexpected_errors(monkeypatch):
+    """Failures listing regions and non-AWS scan errors both reach on_error."""
+    registry = ClientRegistry()
+    registry.register('ec2', FakeEC2('ok', 5, latency=0), region='ok')
+    registry.register('ec2', FakeEC2('broken', 5, latency=0), region='broken')
+    monkeypatch.setattr(config, 'registry', registry)
+    monkeypatch.setattr(registry.client('ec2', 'broken').paginator, 'paginate', lambda **kwargs: 1 / 0)
+    errors = []
+
+    def describe_regions(**kwargs):
+        raise ClientError({'Error': {'Code': 'UnauthorizedOperation', 'Message': 'no'}}, 'DescribeRegions')
+
+    no_regions = FakeEC2('none', 0, latency=0)
+    no_regions.describe_regions = describe_regions
+    registry.register('ec2', no_regions)
+    on_error = lambda profile, region, error: errors.append((region, type(error)))  # noqa: E731
+
+    assert list_instances(profiles=(None,), on_error=on_error) == []
+    assert len(list_instances(['ok', 'broken'], on_error=on_error)) == 5
+    assert errors == [(None, ClientError), ('broken', ZeroDivisionError)]
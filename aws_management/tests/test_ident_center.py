@@ -1,15 +1,32 @@
+import time
+
+import boto3
 import pytest
-from botocore.exceptions import ClientError
+from botocore.exceptions import (
+    ClientError,
+    EndpointConnectionError,
+    ParamValidationError,
+)
 from botocore.stub import Stubber
-import boto3
+from moto import mock_aws
 
+from aws_management.src.services import conf_ops
 from aws_management.src.services.conf_ops import (
+    DesiredState,
+    DirectorySnapshot,
+    GroupSpec,
+    IdentityStoreMirror,
+    UserSpec,
     assign_group_to_user,
     assign_user_to_group,
     create_group,
     create_user,
+    load_desired_state,
+    plan_changes,
+    provision,
 )
 
+
 @pytest.fixture
 def identity_center_client():
     """Fixture for mocked AWS Identity Center client."""
@@ -244,4 +261,279 @@ def test_assign_group_to_nonexistent_user(identity_center_client, identity_store
     with stubber:
         group_id = create_group(client, identity_store_id, group_name, description)['GroupId']
         with pytest.raises(ClientError):
-            assign_group_to_user(client, identity_store_id, group_id, nonexistent_user)
\ No newline at end of file
+            assign_group_to_user(client, identity_store_id, group_id, nonexistent_user)
+
+@pytest.fixture
+def moto_identitystore(monkeypatch):
+    """Moto-backed Identity Store client that counts write calls.
+
+    Yields a tuple of (client, writes).
+    """
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    writes = []
+
+    def count_writes(model, **kwargs):
+        if model.name.startswith(('Create', 'Update', 'Delete')):
+            writes.append(model.name)
+
+    with mock_aws():
+        client = boto3.client('identitystore', region_name='us-east-1')
+        client.meta.events.register('before-call.identitystore.*', count_writes)
+        yield client, writes
+
+
+def _org(size):
+    return DesiredState(
+        users=[UserSpec(f"user{i}", f"user{i}@example.com", "Test", f"User{i}") for i in range(size)],
+        groups=[GroupSpec("engineering", "Engineers"), GroupSpec("everyone")],
+        memberships={("everyone", f"user{i}") for i in range(size)} | {("engineering", "user0")},
+    )
+
+
+def test_provision_is_idempotent(moto_identitystore, identity_store_id):
+    """A first run creates everything concurrently; a re-run makes zero writes."""
+    client, writes = moto_identitystore
+
+    report = provision(client, identity_store_id, _org(120), max_workers=8, requests_per_second=1000)
+
+    assert report.counts() == {'ok': 120 + 2 + 121}
+    assert len(writes) == 243
+    assert len(client.list_group_memberships(
+        IdentityStoreId=identity_store_id,
+        GroupId=client.get_group_id(IdentityStoreId=identity_store_id, AlternateIdentifier={
+            'UniqueAttribute': {'AttributePath': 'displayName', 'AttributeValue': 'everyone'}})['GroupId'],
+        MaxResults=100,
+    )['GroupMemberships']) == 100
+
+    writes.clear()
+    again = provision(client, identity_store_id, _org(120), requests_per_second=1000)
+
+    assert again.plan.writes == 0
+    assert again.results == []
+    assert writes == []
+
+
+def test_provision_prune_and_existing(moto_identitystore, identity_store_id):
+    """Pruning deletes surplus entities; pre-existing ones are left untouched."""
+    client, writes = moto_identitystore
+    create_user(client, identity_store_id, "user0", "user0@example.com", "Test", "User0", "Test User0")
+    create_user(client, identity_store_id, "leaver", "leaver@example.com", "Old", "Timer", "Old Timer")
+    writes.clear()
+
+    report = provision(client, identity_store_id, _org(3), prune=True, requests_per_second=1000)
+
+    statuses = {(r.kind, r.name, r.action): r.status for r in report.results}
+    assert ('user', 'user0', 'create') not in statuses
+    assert statuses[('user', 'leaver', 'delete')] == 'ok'
+    assert statuses[('membership', 'engineering/user0', 'create')] == 'ok'
+    assert not report.failed
+
+
+def test_plan_changes_updates_and_load_csv(tmp_path):
+    """Changed attributes become updates, and CSV rows carry group memberships."""
+    path = tmp_path / 'org.csv'
+    path.write_text("username,email,given_name,family_name,groups\n"
+                    "ana,ana@example.com,Ana,Silva,eng;everyone\n"
+                    "rui,rui@example.com,Rui,Costa,everyone\n")
+    desired = load_desired_state(str(path))
+    snapshot = DirectorySnapshot(
+        users={'ana': {'UserId': 'u1', 'UserName': 'ana', 'DisplayName': 'Ana Silva',
+                       'Name': {'GivenName': 'Ana', 'FamilyName': 'Sousa'},
+                       'Emails': [{'Value': 'ana@example.com'}]}},
+        groups={'everyone': {'GroupId': 'g1', 'DisplayName': 'everyone'}},
+        memberships={'g1': {'u1': 'm1'}},
+    )
+
+    plan = plan_changes(snapshot, desired)
+
+    assert [s.username for s in plan.create_users] == ['rui']
+    assert plan.update_users == [(desired.users[0], 'u1', [{'AttributePath': 'name.familyName', 'AttributeValue': 'Silva'}])]
+    assert [g.display_name for g in plan.create_groups] == ['eng']
+    assert plan.add_memberships == [('eng', 'ana'), ('everyone', 'rui')]
+    assert plan.writes == 5
+
+
+class FlakyClient:
+    """Client proxy whose first create_user call is throttled."""
+
+    def __init__(self, client):
+        """Wrap ``client``."""
+        self.client = client
+        self.throttled = False
+
+    def __getattr__(self, name):
+        """Delegate everything else to the wrapped client."""
+        return getattr(self.client, name)
+
+    def create_user(self, **kwargs):
+        """Throttle the first call, then create the user."""
+        if not self.throttled:
+            self.throttled = True
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'CreateUser')
+        return self.client.create_user(**kwargs)
+
+
+def test_provision_retries_throttling(moto_identitystore, identity_store_id, monkeypatch):
+    """Throttled writes are retried with backoff instead of failing the entity."""
+    client, writes = moto_identitystore
+    monkeypatch.setattr(conf_ops, 'backoff_delay', lambda attempt: 0)
+    flaky = FlakyClient(client)
+
+    report = provision(flaky, identity_store_id, DesiredState(users=[UserSpec("solo", "s@example.com", "So", "Lo")]))
+
+    assert flaky.throttled
+    assert report.counts() == {'ok': 1}
+
+
+class BrokenTransportClient:
+    """Client proxy whose create_user drops one connection for 'retry' and rejects 'bad' locally."""
+
+    def __init__(self, client):
+        """Wrap ``client``."""
+        self.client = client
+        self.dropped = False
+
+    def __getattr__(self, name):
+        """Delegate everything else to the wrapped client."""
+        return getattr(self.client, name)
+
+    def create_user(self, **kwargs):
+        """Reject 'bad', drop the first connection for 'retry', else create the user."""
+        if kwargs['UserName'] == 'bad':
+            raise ParamValidationError(report='Invalid length for parameter UserName')
+        if kwargs['UserName'] == 'retry' and not self.dropped:
+            self.dropped = True
+            raise EndpointConnectionError(endpoint_url='https://identitystore.us-east-1.amazonaws.com')
+        return self.client.create_user(**kwargs)
+
+
+def test_provision_records_botocore_errors_per_entity(moto_identitystore, identity_store_id, monkeypatch):
+    """Transport errors are retried and other botocore errors fail only their entity."""
+    client, writes = moto_identitystore
+    monkeypatch.setattr(conf_ops, 'backoff_delay', lambda attempt: 0)
+    broken = BrokenTransportClient(client)
+    users = [UserSpec(name, f"{name}@example.com", "Test", "User") for name in ("ok1", "bad", "retry", "ok2")]
+
+    report = provision(broken, identity_store_id, DesiredState(users=users), max_workers=1)
+
+    statuses = {r.name: r.status for r in report.results}
+    assert statuses == {'ok1': 'ok', 'bad': 'failed', 'retry': 'ok', 'ok2': 'ok'}
+    assert broken.dropped
+    assert isinstance(report.failed[0].error, ParamValidationError)
+
+
+def test_load_csv_rejects_unexpected_columns():
+    """A CSV header with missing or unknown columns is refused with both listed."""
+    with pytest.raises(ValueError, match='missing columns: family_name; unknown columns: surname'):
+        DesiredState.from_csv(["username,email,given_name,surname", "ana,ana@example.com,Ana,Silva"])
+
+
+def test_identity_store_mirror_lookups_and_warm_start(moto_identitystore, identity_store_id, tmp_path):
+    """The mirror answers lookups locally and reloads from disk without API calls."""
+    client, writes = moto_identitystore
+    provision(client, identity_store_id, _org(150), requests_per_second=1000)
+    path = str(tmp_path / 'mirror.json.gz')
+    mirror = IdentityStoreMirror(client, identity_store_id, path=path)
+
+    changes = mirror.refresh()
+
+    assert changes['users_added'] == 150
+    assert changes['memberships_added'] == 151
+    assert mirror.groups_for_user('user0') == ['engineering', 'everyone']
+    assert mirror.user_by_email('USER7@example.com')['UserName'] == 'user7'
+    assert len(mirror.members_of('everyone')) == 150
+    assert mirror.is_member('user1', 'everyone')
+    assert not mirror.is_member('user1', 'engineering')
+
+    calls = []
+    client.meta.events.register('before-call.identitystore.*', lambda **kwargs: calls.append(1))
+    warm = IdentityStoreMirror(client, identity_store_id, path=path)
+    assert warm.load()
+    assert warm.groups_for_user('user0') == ['engineering', 'everyone']
+    assert warm.snapshot().users['user3']['Emails'][0]['Value'] == 'user3@example.com'
+    assert plan_changes(warm.snapshot(), _org(150)).writes == 0
+    assert calls == []
+
+
+def test_identity_store_mirror_incremental_refresh(moto_identitystore, identity_store_id):
+    """Refreshes report deltas, and a single group can be refreshed on demand."""
+    client, writes = moto_identitystore
+    provision(client, identity_store_id, _org(5), requests_per_second=1000)
+    mirror = IdentityStoreMirror(client, identity_store_id)
+    mirror.refresh()
+    engineering = mirror.group('engineering')['GroupId']
+
+    assign_user_to_group(client, identity_store_id, engineering, mirror.user('user4')['UserId'])
+    mirror.refresh_group('engineering')
+    assert mirror.is_member('user4', 'engineering')
+
+    assert mirror.refresh() == {
+        'users_added': 0, 'users_removed': 0, 'groups_added': 0, 'groups_removed': 0,
+        'memberships_added': 0, 'memberships_removed': 0,
+    }
+
+
+def test_identity_store_mirror_background_refresh(moto_identitystore, identity_store_id):
+    """The background thread picks up new users on its schedule."""
+    client, writes = moto_identitystore
+    mirror = IdentityStoreMirror(client, identity_store_id)
+    mirror.start(interval=0.05)
+    try:
+        create_user(client, identity_store_id, "late", "late@example.com", "Late", "Comer", "Late Comer")
+        for _ in range(100):
+            if mirror.user('late') is not None:
+                break
+            time.sleep(0.02)
+    finally:
+        mirror.stop()
+
+    assert mirror.user('late') is not None
+
+
+def test_identity_store_mirror_evicts_deleted_entities(moto_identitystore, identity_store_id):
+    """Refreshing a group or user that no longer exists drops it, and its memberships, from the mirror."""
+    client, writes = moto_identitystore
+    provision(client, identity_store_id, _org(3), requests_per_second=1000)
+    mirror = IdentityStoreMirror(client, identity_store_id)
+    mirror.refresh()
+
+    client.delete_group(IdentityStoreId=identity_store_id, GroupId=mirror.group('engineering')['GroupId'])
+    client.delete_user(IdentityStoreId=identity_store_id, UserId=mirror.user('user1')['UserId'])
+    mirror.refresh_group('engineering')
+    mirror.refresh_user('user1')
+
+    assert mirror.group('engineering') is None
+    assert mirror.groups_for_user('user0') == ['everyone']
+    assert mirror.user('user1') is None
+    assert len(mirror.members_of('everyone')) == 2
+
+
+def test_identity_store_mirror_background_refresh_survives_errors(moto_identitystore, identity_store_id,
+                                                                    monkeypatch):
+    """A connection error in one background refresh is logged and the next one still runs."""
+    from botocore.exceptions import EndpointConnectionError
+
+    client, writes = moto_identitystore
+    mirror = IdentityStoreMirror(client, identity_store_id)
+    calls = []
+    refresh = mirror.refresh
+
+    def flaky_refresh():
+        calls.append(1)
+        if len(calls) == 1:
+            raise EndpointConnectionError(endpoint_url='https://identitystore.invalid')
+        return refresh()
+
+    monkeypatch.setattr(mirror, 'refresh', flaky_refresh)
+    mirror.start(interval=0.02)
+    try:
+        for _ in range(100):
+            if len(calls) > 2:
+                break
+            time.sleep(0.02)
+    finally:
+        mirror.stop()
+
+    assert len(calls) > 2
+    assert mirror.refreshed_at is not None
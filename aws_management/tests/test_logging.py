@@ -0,0 +1,125 @@
+import io
+import json
+import logging
+import queue
+import threading
+import time
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from aws_management.src.services.s3_ops import create_bucket
+from aws_management.src.utils.config import registry
+from aws_management.src.utils.logging import (
+    Lazy,
+    NonBlockingQueueHandler,
+    SamplingFilter,
+    configure_logging,
+    get_logger,
+    logging_configured,
+    shutdown_logging,
+)
+
+
+@pytest.fixture
+def log_stream():
+    """Routes package logs to a StringIO at DEBUG; yields a function that flushes and parses it."""
+    stream = io.StringIO()
+    configure_logging(level='DEBUG', stream=stream, sample_rate=1.0)
+
+    def lines():
+        shutdown_logging()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield lines
+    shutdown_logging()
+
+
+def test_json_lines_with_context(log_stream):
+    """Records become JSON objects carrying the fields passed with extra."""
+    logger = get_logger('aws_management.tests')
+    logger.info("Invoked %s", 'model-a', extra={
+        'service': 'bedrock-runtime', 'operation': 'InvokeModel', 'request_id': 'req-1',
+        'latency_ms': 12.5, 'retries': 2,
+    })
+
+    [entry] = log_stream()
+    assert entry['message'] == 'Invoked model-a'
+    assert entry['level'] == 'INFO'
+    assert entry['request_id'] == 'req-1'
+    assert entry['latency_ms'] == 12.5
+    assert entry['retries'] == 2
+
+
+def test_formatting_happens_on_listener_thread(log_stream):
+    """Arguments are interpolated by the writer thread, and only for records that are kept."""
+    threads = []
+
+    def render():
+        threads.append(threading.current_thread().name)
+        return 'rendered'
+
+    logger = get_logger('aws_management.tests')
+    logger.debug("value %s", Lazy(render))
+    logger.debug("never %s", Lazy(render), extra={'sample_rate': 0.0})
+    entries = log_stream()
+
+    assert [e['message'] for e in entries] == ['value rendered']
+    assert threads and threads[0] != 'MainThread'
+
+
+def test_sampling_filter_keeps_errors():
+    """DEBUG records are sampled at the configured rate; higher levels always pass."""
+    sampler = SamplingFilter(rate=0.1)
+
+    def record(level):
+        return logging.LogRecord('aws_management', level, '', 0, 'msg', (), None)
+
+    kept = sum(sampler.filter(record(logging.DEBUG)) for _ in range(10000))
+    assert 700 < kept < 1300
+    assert all(sampler.filter(record(logging.ERROR)) for _ in range(100))
+
+
+def test_full_queue_drops_instead_of_blocking():
+    """A stalled writer never blocks the caller."""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=10))
+    logger = logging.getLogger('aws_management.tests.stalled')
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        start = time.perf_counter()
+        for n in range(1000):
+            logger.warning("event %d", n)
+        elapsed = time.perf_counter() - start
+    finally:
+        logger.removeHandler(handler)
+
+    assert handler.queue.qsize() == 10
+    assert handler.dropped == 990
+    assert elapsed < 0.5
+
+
+def test_service_errors_are_logged(log_stream):
+    """Service failures are reported as structured records instead of printed."""
+    client = boto3.client('s3')
+    with registry.override('s3', client), Stubber(client) as stubber:
+        stubber.add_client_error('create_bucket', 'BucketAlreadyExists', http_status_code=409)
+        assert create_bucket('taken', region='us-west-2') is False
+
+    [entry] = log_stream()
+    assert entry['level'] == 'ERROR'
+    assert entry['service'] == 's3'
+    assert entry['operation'] == 'CreateBucket'
+    assert entry['bucket'] == 'taken'
+    assert entry['http_status'] == 409
+
+
+def test_importing_services_leaves_logging_alone(caplog):
+    """Until configure_logging is called, package records propagate to the application's handlers."""
+    from aws_management.src.services import bedrock_ops  # noqa: F401
+
+    assert not logging_configured()
+    assert logging.getLogger('aws_management').propagate
+    get_logger('aws_management.tests').warning("visible")
+    assert [r.getMessage() for r in caplog.records] == ['visible']
@@ -0,0 +1,168 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from moto import mock_aws
+
+from aws_management.src import daemon, main
+from aws_management.src.services import bedrock_ops
+from aws_management.src.utils.config import registry
+from aws_management.src.utils.logging import shutdown_logging
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODELS = [
+    {'modelArn': 'arn:aws:bedrock:us-east-1::foundation-model/anthropic.claude-v2', 'modelId': 'anthropic.claude-v2',
+     'providerName': 'Anthropic', 'inputModalities': ['TEXT'], 'outputModalities': ['TEXT'],
+     'responseStreamingSupported': True},
+    {'modelArn': 'arn:aws:bedrock:us-east-1::foundation-model/amazon.titan-embed-text-v1',
+     'modelId': 'amazon.titan-embed-text-v1', 'providerName': 'Amazon', 'inputModalities': ['TEXT'],
+     'outputModalities': ['EMBEDDING']},
+]
+
+
+@pytest.fixture(autouse=True)
+def _reset_logging():
+    """Undoes the logging setup that ``run`` performs in-process."""
+    yield
+    shutdown_logging()
+
+
+@pytest.fixture
+def cache_env(monkeypatch):
+    """Points the CLI's cache and daemon socket at a fresh short temporary directory."""
+    directory = tempfile.mkdtemp(prefix='bk-', dir='/tmp')
+    monkeypatch.setenv('BEDROCK_K_CACHE_DIR', directory)
+    monkeypatch.setenv('BEDROCK_K_SOCKET', os.path.join(directory, 'd.sock'))
+    return directory
+
+
+def _python(code, env=None):
+    start = time.perf_counter()
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=REPO_ROOT, env=env or os.environ.copy(), capture_output=True, text=True, check=False,
+    )
+    return result, time.perf_counter() - start
+
+
+def test_help_starts_without_boto3():
+    """--help never imports boto3 and beats a bare `import boto3`."""
+    help_run, help_time = _python("from aws_management.src.main import main; main(['--help'])")
+    boto_run, boto_time = _python("import boto3")
+
+    assert 'usage: bedrock-k' in help_run.stdout
+    assert 'boto3' not in help_run.stderr
+    assert 'boto3' in boto_run.stderr
+    assert help_time < boto_time
+
+
+def test_cached_models_lookup_skips_boto3(cache_env):
+    """A fresh on-disk catalog answers `models` without importing boto3 or calling Bedrock."""
+    main.write_models_cache(MODELS)
+
+    result, _ = _python(
+        "from aws_management.src.main import main; main(['--no-daemon', 'models', '--provider', 'anthropic'])"
+    )
+
+    assert result.stdout.splitlines() == ['anthropic.claude-v2\tAnthropic\tTEXT->TEXT\tstream']
+    assert 'boto3' not in result.stderr
+
+
+def test_models_fetches_once_then_uses_cache(cache_env, monkeypatch, capsys):
+    """A cold cache fetches the catalog once and stores it; the next run reads the file instead."""
+    client = boto3.client('bedrock', region_name='us-east-1')
+    monkeypatch.setattr(bedrock_ops, 'model_catalog', bedrock_ops.ModelCatalog())
+    with registry.override('bedrock', client), Stubber(client) as stubber:
+        stubber.add_response('list_foundation_models', {'modelSummaries': MODELS})
+        assert main.main(['--no-daemon', 'models', '--modality', 'embedding']) == 0
+        assert main.main(['--no-daemon', 'models', '--json']) == 0
+        stubber.assert_no_pending_responses()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith('amazon.titan-embed-text-v1\tAmazon')
+    assert [m['modelId'] for m in json.loads(lines[1])] == ['anthropic.claude-v2', 'amazon.titan-embed-text-v1']
+    assert main.read_models_cache(ttl=-1) is None
+
+
+def test_daemon_serves_forwarded_commands(cache_env, capsys):
+    """With a daemon listening, commands run in it, output is relayed and bad requests are refused."""
+    main.write_models_cache(MODELS)
+    path = main.socket_path()
+    server = threading.Thread(target=daemon.serve, args=(path, main.run), daemon=True)
+    server.start()
+    deadline = time.monotonic() + 10
+    while not daemon.ping(path) and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    try:
+        assert main.main(['models', '--provider', 'amazon']) == 0
+        assert main.main(['invoke', 'hi', '--model', 'missing.model']) == 1
+        assert main.main(['daemon', 'status']) == 0
+        assert daemon._request(path, {'args': ['models']})['status'] == 2
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            sock.sendall(b"not json\n")
+            assert json.loads(sock.makefile('rb').readline())['stderr'].startswith('Error: malformed')
+        assert daemon.ping(path)
+    finally:
+        assert main.main(['daemon', 'stop']) == 0
+        server.join(timeout=5)
+
+    out = capsys.readouterr().out
+    assert out.startswith('amazon.titan-embed-text-v1\tAmazon')
+    assert 'running' in out
+    assert not server.is_alive()
+    assert not os.path.exists(path)
+
+
+def test_daemon_resolves_paths_in_callers_cwd_and_refuses_other_identities(cache_env, tmp_path, monkeypatch, capsys):
+    """Relative paths resolve in the caller's directory; a different AWS environment runs locally."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    caller_dir = tmp_path / 'caller'
+    caller_dir.mkdir()
+    monkeypatch.chdir(tmp_path)
+    path = main.socket_path()
+    with mock_aws():
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='corpus')
+        s3.put_object(Bucket='corpus', Key='data.bin', Body=b'payload')
+        with registry.override('s3', s3):
+            server = threading.Thread(target=daemon.serve, args=(path, main.run), daemon=True)
+            server.start()
+            deadline = time.monotonic() + 10
+            while not daemon.ping(path) and time.monotonic() < deadline:
+                time.sleep(0.02)
+            try:
+                reply = daemon._request(path, {
+                    'argv': ['s3', 'get', 'corpus', 'data.bin', 'out.bin'],
+                    'cwd': str(caller_dir), 'identity': daemon.identity_digest(),
+                })
+                other = daemon.identity_digest({'AWS_PROFILE': 'someone-else'})
+                refused = daemon._request(path, {'argv': ['daemon', 'status'], 'cwd': '/', 'identity': other})
+            finally:
+                assert main.main(['daemon', 'stop']) == 0
+                server.join(timeout=5)
+
+    assert reply['status'] == 0
+    assert (caller_dir / 'out.bin').read_bytes() == b'payload'
+    assert not (tmp_path / 'out.bin').exists()
+    assert refused['refused'] and 'status' not in refused
+
+
+def test_streaming_invoke_runs_locally(cache_env, monkeypatch):
+    """Streaming invokes are never forwarded, since the daemon relays output only at the end."""
+    open(main.socket_path(), 'w').close()
+    monkeypatch.setattr(daemon, 'forward', lambda path, argv: pytest.fail("forwarded"))
+    monkeypatch.setattr(main, 'run', lambda argv: 0)
+
+    assert main.main(['invoke', 'hi', '--stream']) == 0
@@ -0,0 +1,123 @@
+import json
+import time
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from moto import mock_aws
+
+from aws_management.src.utils import config
+from aws_management.src.utils.config import ClientRegistry, get_client
+from aws_management.src.utils.metrics import Instrumentation, LatencyHistogram
+
+
+@pytest.fixture
+def instrumented(monkeypatch):
+    """Moto-backed registry whose clients report to a fresh Instrumentation."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    instrumentation = Instrumentation()
+    with mock_aws():
+        monkeypatch.setattr(config, 'registry', ClientRegistry(instrumentation=instrumentation))
+        yield instrumentation
+
+
+def test_histogram_percentiles_within_resolution():
+    """Percentiles are within the 1/16 sub-bucket resolution of the true values."""
+    histogram = LatencyHistogram()
+    for micros in range(1, 100_001):
+        histogram.record(micros)
+
+    for q in (50, 90, 99):
+        expected = q / 100 * 100_000
+        assert abs(histogram.percentile(q) - expected) / expected < 1 / 16
+    assert histogram.max == 100_000
+    assert histogram.cumulative([1_000, 200_000]) == [pytest.approx(1_000, rel=1 / 16), 100_000]
+
+
+def test_records_latency_and_bytes_per_operation(instrumented):
+    """Calls through registry clients are counted per service and operation."""
+    s3 = get_client('s3')
+    s3.create_bucket(Bucket='metrics')
+    for n in range(3):
+        s3.put_object(Bucket='metrics', Key=f'k{n}', Body=b'x' * 1000)
+    s3.get_object(Bucket='metrics', Key='k0')['Body'].read()
+
+    snapshot = instrumented.snapshot()['s3']
+    assert snapshot['PutObject']['calls'] == 3
+    assert snapshot['PutObject']['request_bytes'] == 3000
+    assert snapshot['GetObject']['response_bytes'] == 1000
+    assert snapshot['CreateBucket']['errors'] == 0
+    assert 0 < snapshot['PutObject']['p50_ms'] <= snapshot['PutObject']['max_ms']
+
+
+def test_counts_throttles_retries_and_errors(instrumented):
+    """A throttled attempt that is retried counts as one throttle and one retry."""
+    dynamodb = get_client('dynamodb')
+    throttled = []
+
+    def throttle_first(request, **kwargs):
+        if not throttled:
+            throttled.append(request)
+            body = json.dumps({'__type': 'ThrottlingException', 'message': 'Rate exceeded'}).encode()
+            return AWSResponse(request.url, 400, {'Content-Type': 'application/x-amz-json-1.0'}, FakeRaw(body))
+        return None
+
+    dynamodb.meta.events.register_first('before-send.dynamodb.ListTables', throttle_first)
+    dynamodb.list_tables()
+    with pytest.raises(dynamodb.exceptions.ResourceNotFoundException):
+        dynamodb.describe_table(TableName='missing')
+
+    stats = instrumented.snapshot()['dynamodb']
+    assert stats['ListTables']['throttles'] == 1
+    assert stats['ListTables']['retries'] == 1
+    assert stats['ListTables']['errors'] == 0
+    assert stats['DescribeTable']['errors'] == 1
+
+
+class FakeRaw:
+    """urllib3-like raw response holding a fixed body."""
+
+    def __init__(self, body):
+        """Hold ``body`` as the whole response."""
+        self.body = body
+
+    def stream(self, *args, **kwargs):
+        """Yield the body in one chunk."""
+        yield self.body
+
+
+def test_prometheus_exposition(instrumented):
+    """The exposition holds a histogram and counters per operation."""
+    s3 = get_client('s3')
+    s3.create_bucket(Bucket='metrics')
+    s3.list_objects_v2(Bucket='metrics')
+
+    text = instrumented.render_prometheus()
+
+    assert '# TYPE aws_client_request_duration_seconds histogram' in text
+    assert 'aws_client_request_duration_seconds_bucket{service="s3",operation="ListObjectsV2",le="+Inf"} 1' in text
+    assert 'aws_client_requests_total{service="s3",operation="CreateBucket"} 1' in text
+    assert text.endswith('\n')
+
+
+def test_hook_overhead_is_microseconds():
+    """The before/after-call handlers add only a few microseconds per call."""
+    instrumentation = Instrumentation()
+    client = boto3.client('s3', region_name='us-east-1')
+    model = client.meta.service_model.operation_model('PutObject')
+    http_response = AWSResponse('https://example.com', 200, {'content-length': '0'}, None)
+    parsed = {'ResponseMetadata': {'RetryAttempts': 0, 'HTTPHeaders': {'content-length': '0'}}}
+    params = {'body': b'payload'}
+    calls = 20_000
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        context = {}
+        instrumentation._before_call(model=model, params=params, context=context)
+        instrumentation._after_call(http_response=http_response, parsed=parsed, model=model, context=context)
+    per_call = (time.perf_counter() - start) / calls
+
+    assert instrumentation.snapshot()['s3']['PutObject']['calls'] == calls
+    assert per_call < 10e-6
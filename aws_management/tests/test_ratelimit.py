@@ -0,0 +1,82 @@
+import pytest
+
+from aws_management.src.utils.ratelimit import (
+    AdaptiveRateLimiter,
+    TokenBucket,
+    backoff_delay,
+)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+def test_token_bucket_reserves_into_debt():
+    """Callers past the burst are told to wait in arrival order."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+    clock.now = 1.0
+    assert bucket.reserve() == 0
+
+
+def test_adaptive_rate_limiter_aimd():
+    """Throttles halve the rate once per cooldown; successes add it back linearly."""
+    clock = FakeClock()
+    limiter = AdaptiveRateLimiter(120, tokens_per_minute=6000, increase=10, cooldown=1.0, clock=clock)
+
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.requests_per_minute == 60
+    assert limiter.throttles == 2
+
+    clock.now = 2.0
+    limiter.on_throttle()
+    assert limiter.requests_per_minute == 30
+
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.requests_per_minute == 120
+
+
+def test_adaptive_rate_limiter_token_budget():
+    """A request larger than the token budget waits for the tokens to accrue."""
+    clock = FakeClock()
+    limiter = AdaptiveRateLimiter(6000, tokens_per_minute=600, clock=clock)
+
+    assert limiter.reserve(10) == 0
+    assert limiter.reserve(20) == pytest.approx(2.0)
+
+
+def test_adaptive_rate_limiter_new_maximums():
+    """Lower maximums apply at once; a backed-off limiter keeps climbing towards a raised one."""
+    clock = FakeClock()
+    limiter = AdaptiveRateLimiter(120, clock=clock)
+
+    limiter.set_maximums(60, tokens_per_minute=600)
+    assert (limiter.requests_per_minute, limiter.max_tokens_per_minute) == (60, 600)
+    assert limiter.reserve(10) == 0
+    assert limiter.reserve(20) == pytest.approx(2.0)
+
+    limiter.on_throttle()
+    limiter.set_maximums(240)
+    assert limiter.requests_per_minute == 30
+    assert limiter.max_requests_per_minute == 240
+    assert limiter.max_tokens_per_minute is None
+
+
+def test_backoff_delay_is_capped():
+    """Backoff grows exponentially but never exceeds the cap."""
+    assert all(0 <= backoff_delay(attempt, base=1, cap=5) <= 5 for attempt in range(1, 20))
@@ -0,0 +1,191 @@
+import datetime
+import logging
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from aws_management.src.services.rds_ops import (
+    copy_snapshots,
+    get_instance_metrics,
+    inventory,
+)
+from aws_management.src.utils import config
+from aws_management.src.utils.config import ClientRegistry
+
+REGIONS = ['us-east-1', 'eu-west-1']
+
+
+@pytest.fixture
+def moto_rds(monkeypatch):
+    """Moto RDS with three instances, a cluster and a snapshot per instance in each region."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        for region in REGIONS:
+            client = boto3.client('rds', region_name=region)
+            for n in range(3):
+                client.create_db_instance(
+                    DBInstanceIdentifier=f'db{n}', DBInstanceClass='db.t3.micro', Engine='postgres',
+                    AllocatedStorage=20, MasterUsername='admin', MasterUserPassword='password123',
+                )
+                client.create_db_snapshot(DBInstanceIdentifier=f'db{n}', DBSnapshotIdentifier=f'snap{n}')
+            client.create_db_cluster(
+                DBClusterIdentifier='cluster', Engine='aurora-postgresql',
+                MasterUsername='admin', MasterUserPassword='password123',
+            )
+        monkeypatch.setattr(config, 'registry', ClientRegistry())
+        yield
+
+
+def test_inventory_across_regions(moto_rds):
+    """Every resource type, cluster snapshots included, is listed from every region and tagged with it."""
+    result = inventory(REGIONS)
+
+    assert len(result['instances']) == 6
+    assert len(result['clusters']) == 2
+    assert {s['Region'] for s in result['snapshots']} == set(REGIONS)
+    assert {s['DBSnapshotIdentifier'] for s in result['snapshots']} >= {'snap0', 'snap1', 'snap2'}
+    assert 'cluster_snapshots' in result
+
+
+class DeniedRDS:
+    """RDS stand-in whose every listing is denied."""
+
+    def get_paginator(self, name):
+        """Return this client as the paginator."""
+        return self
+
+    def paginate(self, **kwargs):
+        """Fail like an IAM denial."""
+        raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'no'}}, 'DescribeDBClusters')
+
+
+def test_inventory_logs_failed_listings_with_operation(monkeypatch, caplog):
+    """The default error handler logs which describe operation failed."""
+    registry = ClientRegistry()
+    registry.register('rds', DeniedRDS())
+    monkeypatch.setattr(config, 'registry', registry)
+
+    with caplog.at_level(logging.ERROR, logger='aws_management'):
+        result = inventory(['us-east-1'], resources=('clusters',))
+
+    assert result == {'clusters': []}
+    [record] = caplog.records
+    assert (record.service, record.operation, record.region) == ('rds', 'DescribeDBClusters', 'us-east-1')
+
+
+def test_copy_snapshots_cross_region(moto_rds):
+    """Snapshots are copied into the destination region under the derived name."""
+    arns = [f'arn:aws:rds:us-east-1:123456789012:snapshot:snap{n}' for n in range(3)]
+
+    report = copy_snapshots(arns, 'us-west-2', source_region='us-east-1', sleep=lambda s: None)
+
+    assert not report.failed
+    copied = boto3.client('rds', region_name='us-west-2').describe_db_snapshots()['DBSnapshots']
+    assert {s['DBSnapshotIdentifier'] for s in copied} == {'snap0-copy', 'snap1-copy', 'snap2-copy'}
+
+
+class SlowCopyClient:
+    """RDS stand-in whose copies become available after a fixed number of polls."""
+
+    def __init__(self, polls_to_finish):
+        """Finish each copy after ``polls_to_finish`` describe calls."""
+        self.polls_to_finish = polls_to_finish
+        self.copies = {}
+        self.max_running = 0
+        self.describe_calls = 0
+
+    def copy_db_snapshot(self, SourceDBSnapshotIdentifier, TargetDBSnapshotIdentifier, **kwargs):  # noqa: N803
+        """Start a copy and track the peak number running."""
+        self.copies[TargetDBSnapshotIdentifier] = 0
+        running = sum(1 for polls in self.copies.values() if polls < self.polls_to_finish)
+        self.max_running = max(self.max_running, running)
+        return {'DBSnapshot': {'Status': 'creating'}}
+
+    def describe_db_snapshots(self, Filters):  # noqa: N803
+        """Advance each requested copy by one poll and report its status."""
+        self.describe_calls += 1
+        snapshots = []
+        for name in Filters[0]['Values']:
+            self.copies[name] += 1
+            status = 'available' if self.copies[name] >= self.polls_to_finish else 'copying'
+            snapshots.append({'DBSnapshotIdentifier': name, 'Status': status})
+        return {'DBSnapshots': snapshots}
+
+
+def test_copy_snapshots_bounded_with_backoff(monkeypatch):
+    """No more than max_in_flight copies run, one describe covers all of them, and polling backs off."""
+    client = SlowCopyClient(polls_to_finish=4)
+    registry = ClientRegistry()
+    registry.register('rds', client)
+    monkeypatch.setattr(config, 'registry', registry)
+    sleeps = []
+    arns = [f'arn:aws:rds:us-east-1:123456789012:snapshot:snap{n}' for n in range(12)]
+
+    report = copy_snapshots(arns, 'us-west-2', 'us-east-1', max_in_flight=3,
+                            poll_interval=1.0, max_poll_interval=4.0, sleep=sleeps.append)
+
+    assert all(copy.ok for copy in report.copies)
+    assert client.max_running == 3
+    assert report.polls == client.describe_calls == 16
+    assert max(sleeps) <= 4.0 * 1.2
+    assert sleeps[2] > sleeps[0] * 2
+
+
+class CountingCloudWatch:
+    """CloudWatch stand-in that answers every GetMetricData query with one point."""
+
+    def __init__(self):
+        """Start with no recorded batches."""
+        self.batch_sizes = []
+
+    def get_paginator(self, name):
+        """Return this client as the GetMetricData paginator."""
+        return self
+
+    def paginate(self, MetricDataQueries, StartTime, EndTime):  # noqa: N803
+        """Record the batch size and answer each query with one point."""
+        self.batch_sizes.append(len(MetricDataQueries))
+        yield {'MetricDataResults': [
+            {'Id': q['Id'], 'Timestamps': [StartTime], 'Values': [float(len(q['Id']))]}
+            for q in MetricDataQueries
+        ]}
+
+
+def test_get_instance_metrics_batches_queries(monkeypatch):
+    """800 instance/metric pairs take two GetMetricData calls, not 800."""
+    cloudwatch = CountingCloudWatch()
+    registry = ClientRegistry()
+    registry.register('cloudwatch', cloudwatch)
+    monkeypatch.setattr(config, 'registry', registry)
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    instance_ids = [f'db{n}' for n in range(100)]
+
+    series = get_instance_metrics(instance_ids, start, start + datetime.timedelta(hours=1))
+
+    assert sorted(cloudwatch.batch_sizes) == [300, 500]
+    assert len(series) == 100
+    assert all(len(points) == 1 for metrics in series.values() for points in metrics.values())
+
+
+def test_get_instance_metrics_with_moto(moto_rds):
+    """Results are mapped back to the instance and metric they were queried for."""
+    now = datetime.datetime.now(datetime.timezone.utc).replace(second=0, microsecond=0)
+    cloudwatch = boto3.client('cloudwatch', region_name='us-east-1')
+    for n, value in enumerate((10.0, 90.0)):
+        cloudwatch.put_metric_data(Namespace='AWS/RDS', MetricData=[{
+            'MetricName': 'CPUUtilization', 'Value': value, 'Timestamp': now,
+            'Dimensions': [{'Name': 'DBInstanceIdentifier', 'Value': f'db{n}'}],
+        }])
+
+    series = get_instance_metrics(
+        ['db0', 'db1'], now - datetime.timedelta(minutes=5), now + datetime.timedelta(minutes=5),
+        metrics=['CPUUtilization', 'FreeableMemory'], period=60, region='us-east-1',
+    )
+
+    assert [v for _, v in series['db0']['CPUUtilization']] == [10.0]
+    assert [v for _, v in series['db1']['CPUUtilization']] == [90.0]
+    assert series['db0']['FreeableMemory'] == []
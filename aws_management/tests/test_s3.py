@@ -1,18 +1,34 @@
-import pytest
-import boto3
+import io
 import uuid
-from botocore.stub import Stubber
+import warnings
+
+import boto3
+import pytest
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
-from aws_management.src.services.s3_ops import create_bucket, upload_file
+from botocore.response import StreamingBody
+from botocore.stub import ANY, Stubber
+from moto import mock_aws
+
+from aws_management.src.services.s3_ops import (
+    cached_download,
+    create_bucket,
+    download_ranged,
+    iter_lines,
+    mmap_object,
+    sync_to_s3,
+    upload_directory,
+    upload_file,
+)
+from aws_management.src.utils.config import registry
 
-import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning, module="botocore.auth")
 
 @pytest.fixture
 def s3_client():
     """Fixture for mocked AWS S3 client."""
     client = boto3.client('s3')
-    with Stubber(client) as stubber:
+    with registry.override('s3', client), Stubber(client) as stubber:
         yield stubber, client
         stubber.assert_no_pending_responses()
 
@@ -29,17 +45,180 @@ def test_create_bucket(s3_client):
     # Assert the result
     assert result is True
 
-def test_upload_file(s3_client):
+def test_upload_file(s3_client, tmp_path):
     stubber, client = s3_client
     bucket_name = 'test-bucket'
-    file_name = 'test.txt'
+    file_name = str(tmp_path / 'test.txt')
     object_name = 'test.txt'
+    with open(file_name, 'w') as f:
+        f.write('hello')
     
     # Stub the upload_file response
-    stubber.add_response('put_object', {}, {'Bucket': bucket_name, 'Key': object_name})
+    stubber.add_response('put_object', {}, {'Bucket': bucket_name, 'Key': object_name, 'Body': ANY})
     
     # Call the function
     result = upload_file(file_name, bucket_name, object_name)
     
     # Assert the result
-    assert result is True
\ No newline at end of file
+    assert result is True
+
+@pytest.fixture
+def moto_s3(monkeypatch):
+    """Moto-backed S3 client installed in the client registry, with a test bucket."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='corpus')
+        with registry.override('s3', client):
+            yield client
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    """A small local tree with nested directories and one multipart-sized file."""
+    (tmp_path / 'docs' / 'nested').mkdir(parents=True)
+    for i in range(20):
+        (tmp_path / 'docs' / f'doc{i}.jsonl').write_text(f'{{"id": {i}}}\n' * (i + 1))
+    (tmp_path / 'docs' / 'nested' / 'model.bin').write_bytes(uuid.uuid4().bytes * (6 * 1024 * 1024 // 16 + 1))
+    return tmp_path / 'docs'
+
+
+def _small_parts():
+    return TransferConfig(multipart_threshold=5 * 1024 * 1024, multipart_chunksize=5 * 1024 * 1024, max_concurrency=4)
+
+
+def test_upload_directory(moto_s3, corpus_dir):
+    """Every file is uploaded under the prefix with progress and throughput reported."""
+    seen = set()
+    report = upload_directory(str(corpus_dir), 'corpus', prefix='rag/', transfer_config=_small_parts(),
+                              max_workers=4, progress=lambda key, amount: seen.add(key))
+
+    keys = {obj['Key'] for obj in moto_s3.list_objects_v2(Bucket='corpus')['Contents']}
+    assert len(report.uploaded) == 21
+    assert 'rag/nested/model.bin' in keys
+    assert seen == keys
+    assert report.bytes_transferred == sum(f.stat().st_size for f in corpus_dir.rglob('*') if f.is_file())
+    assert report.throughput_mbps > 0
+    assert not report.failed
+
+
+def test_sync_to_s3_skips_unchanged(moto_s3, corpus_dir):
+    """A re-sync uploads only files whose size or ETag changed, multipart ones included."""
+    config = _small_parts()
+    sync_to_s3(str(corpus_dir), 'corpus', transfer_config=config)
+    (corpus_dir / 'doc3.jsonl').write_text('{"id": 99}\n' * 4)
+
+    report = sync_to_s3(str(corpus_dir), 'corpus', transfer_config=config)
+
+    assert report.uploaded == ['doc3.jsonl']
+    assert len(report.skipped) == 20
+    assert 'nested/model.bin' in report.skipped
+
+
+def test_iter_lines(moto_s3):
+    """iter_lines yields each line of an object as decoded text."""
+    moto_s3.put_object(Bucket='corpus', Key='data.jsonl', Body=''.join(f'{{"id": {i}}}\n' for i in range(1000)))
+
+    lines = list(iter_lines('corpus', 'data.jsonl', chunk_size=1024))
+
+    assert len(lines) == 1000
+    assert lines[-1] == '{"id": 999}'
+
+
+class RepeatingBlockStream(io.RawIOBase):
+    """Raw stream over a byte range of an object made of one repeated block."""
+
+    def __init__(self, block, start, end):
+        """Read bytes ``start`` to ``end`` of the repeated ``block``."""
+        self.block, self.pos, self.end = block, start, end
+
+    def readable(self):
+        """Report the stream as readable."""
+        return True
+
+    def readinto(self, buffer):
+        """Fill ``buffer`` from the current position, at most to the end of a block."""
+        n = min(len(buffer), self.end - self.pos, len(self.block) - self.pos % len(self.block))
+        offset = self.pos % len(self.block)
+        buffer[:n] = self.block[offset:offset + n]
+        self.pos += n
+        return n
+
+
+class RangedS3:
+    """S3 stand-in serving ranged GETs of a large synthetic object without materializing it."""
+
+    def __init__(self, block, repeats):
+        """Describe an object of ``repeats`` copies of ``block``."""
+        self.block, self.size = block, len(block) * repeats
+
+    def head_object(self, Bucket, Key):  # noqa: N803
+        """Return the object's size and ETag."""
+        return {'ContentLength': self.size, 'ETag': '"synthetic"'}
+
+    def get_object(self, Bucket, Key, Range, IfMatch):  # noqa: N803
+        """Serve the requested byte range, checking the ETag precondition."""
+        assert IfMatch == '"synthetic"'
+        start, end = (int(x) for x in Range.split('=')[1].split('-'))
+        raw = RepeatingBlockStream(self.block, start, end + 1)
+        return {'Body': StreamingBody(raw, end + 1 - start)}
+
+
+@pytest.mark.parametrize("repeats", [8, 64])
+def test_download_ranged_bounded_memory(tmp_path, repeats):
+    """Peak memory of a ranged download does not grow with object size."""
+    import os
+    import tracemalloc
+
+    block = os.urandom(1024 * 1024)
+    target = tmp_path / 'shard.bin'
+
+    with registry.override('s3', RangedS3(block, repeats)):
+        tracemalloc.start()
+        download_ranged('corpus', 'shard.bin', str(target), part_size=4 * 1024 * 1024, max_workers=4, chunk_size=64 * 1024)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    assert target.stat().st_size == len(block) * repeats
+    with open(target, 'rb') as f:
+        assert all(f.read(len(block)) == block for _ in range(repeats))
+    assert peak < 1024 * 1024
+
+
+def test_download_ranged_reassembles_object(moto_s3, tmp_path):
+    """Parallel ranges are written back into place byte for byte."""
+    payload = uuid.uuid4().bytes * (3 * 1024 * 1024 // 16 + 7)
+    moto_s3.put_object(Bucket='corpus', Key='shard.bin', Body=payload)
+    target = tmp_path / 'shard.bin'
+
+    etag = download_ranged('corpus', 'shard.bin', str(target), part_size=512 * 1024, max_workers=4)
+
+    assert target.read_bytes() == payload
+    assert etag == moto_s3.head_object(Bucket='corpus', Key='shard.bin')['ETag'].strip('"')
+
+
+def test_cached_download_keyed_by_etag(moto_s3, tmp_path):
+    """Unchanged objects are served from the local cache; a new ETag refetches."""
+    moto_s3.put_object(Bucket='corpus', Key='emb.npy', Body=b'v1' * 1000)
+    gets = []
+    moto_s3.meta.events.register('before-call.s3.GetObject', lambda **kwargs: gets.append(1))
+    cache_dir = str(tmp_path / 'cache')
+
+    first = cached_download('corpus', 'emb.npy', cache_dir)
+    again = cached_download('corpus', 'emb.npy', cache_dir)
+    moto_s3.put_object(Bucket='corpus', Key='emb.npy', Body=b'v2' * 1000)
+    mapped = mmap_object('corpus', 'emb.npy', cache_dir)
+
+    assert first == again
+    assert len(gets) == 2
+    assert mapped[:2] == b'v2'
+    mapped.close()
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+
+def test_mmap_object_empty(moto_s3, tmp_path):
+    """A zero-byte object is returned as b'' instead of failing to map."""
+    moto_s3.put_object(Bucket='corpus', Key='empty.bin', Body=b'')
+
+    assert mmap_object('corpus', 'empty.bin', str(tmp_path / 'cache')) == b''
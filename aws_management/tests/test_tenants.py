@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+
+import boto3
+import pytest
+from botocore.exceptions import ProfileNotFound
+from moto import mock_aws
+
+from aws_management.src.utils import config
+from aws_management.src.utils.config import ClientRegistry, get_client
+from aws_management.src.utils.tenants import TenantPool
+
+
+@pytest.fixture
+def users(monkeypatch):
+    """Moto STS/IAM/S3 with two key-based tenants and one AssumeRole tenant in USERS."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        role = boto3.client('iam').create_role(RoleName='tenant-admin', AssumeRolePolicyDocument='{}')['Role']['Arn']
+        monkeypatch.setenv('USERS', json.dumps({
+            'user1': {'AWS_ACCESS_KEY_ID': 'AKIAUSER1', 'AWS_SECRET_ACCESS_KEY': 's1', 'AWS_DEFAULT_REGION': 'us-east-1'},
+            'user2': {'AWS_ACCESS_KEY_ID': 'AKIAUSER2', 'AWS_SECRET_ACCESS_KEY': 's2', 'AWS_DEFAULT_REGION': 'eu-west-1',
+                      'MAX_CONCURRENCY': 1},
+            'admin': {'AWS_ROLE_ARN': role, 'AWS_DEFAULT_REGION': 'us-west-2'},
+        }))
+        monkeypatch.setattr(config, 'registry', ClientRegistry())
+        yield
+
+
+def test_pool_registers_one_session_per_tenant(users):
+    """Each tenant's clients are shared and act with its own keys or assumed role, in its region."""
+    pool = TenantPool()
+
+    assert pool.client('s3', 'user1') is get_client('s3', 'us-east-1', profile='user1')
+    assert pool.client('s3', 'user2').meta.region_name == 'eu-west-1'
+    identity = pool.client('sts', 'admin').get_caller_identity()
+    assert identity['Arn'].endswith(':assumed-role/tenant-admin/bedrock-k')
+    assert pool.tenants['user1'].session.get_credentials().access_key == 'AKIAUSER1'
+    assert pool.tenants['user2'].max_concurrency == 1
+
+
+def test_assumed_credentials_renew_in_background(users):
+    """Credentials close to expiry are renewed by the refresher, so client calls never hit STS inline."""
+    # 15-minute credentials are always inside this margin, and inside botocore's
+    # advisory window (margin / 2), but never inside the mandatory one (margin / 4).
+    with TenantPool(refresh_margin=2000, check_interval=0.02, duration_seconds=900) as pool:
+        admin = pool.tenants['admin']
+        first = admin.latest['access_key']
+        deadline = time.monotonic() + 5
+        while pool.background_refreshes < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pool.client('sts', 'admin').get_caller_identity()
+
+        assert pool.background_refreshes >= 2
+        assert admin.credentials.get_frozen_credentials().access_key != first
+        assert pool.inline_refreshes == 0
+
+
+def test_run_across_tenants_respects_quotas(users):
+    """TenantPool.run fans out across tenants, keeps each within its quota and reports failures per tenant."""
+    pool = TenantPool(max_concurrency=2)
+    for tenant in pool.tenants:
+        pool.client('s3', tenant).create_bucket(
+            Bucket=f'bucket-{tenant}',
+            **({} if pool.tenants[tenant].region == 'us-east-1' else
+               {'CreateBucketConfiguration': {'LocationConstraint': pool.tenants[tenant].region}}),
+        )
+    lock = threading.Lock()
+    active = {name: 0 for name in pool.tenants}
+    peak = dict(active)
+
+    def upload(tenant):
+        if tenant == 'admin':
+            raise RuntimeError('boom')
+        with lock:
+            active[tenant] += 1
+            peak[tenant] = max(peak[tenant], active[tenant])
+        time.sleep(0.05)
+        with lock:
+            active[tenant] -= 1
+        pool.client('s3', tenant).put_object(Bucket=f'bucket-{tenant}', Key='k', Body=b'x')
+        return tenant
+
+    threads = [threading.Thread(target=lambda: results.append(pool.run(upload))) for _ in range(4)]
+    results = []
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == {'user1': 2, 'user2': 1, 'admin': 0}
+    assert all(r['user1'].value == 'user1' and not r['admin'].ok for r in results)
+    assert str(results[0]['admin'].error) == 'boom'
+
+
+def test_register_users_keeps_a_started_pool(users, monkeypatch):
+    """register_users keeps its pool and starts the refresher; a second call replaces the old pool."""
+    monkeypatch.setattr(config, 'tenant_pool', None)
+
+    assert sorted(config.register_users()) == ['admin', 'user1', 'user2']
+    first = config.tenant_pool
+    assert first._thread is not None and first._thread.is_alive()
+
+    config.register_users()
+    assert config.tenant_pool is not first
+    assert first._thread is None
+    config.tenant_pool.close()
+
+
+def test_register_users_again_drops_stale_sessions(users, monkeypatch):
+    """Re-registering uses the new credentials and forgets users that are no longer listed."""
+    monkeypatch.setattr(config, 'tenant_pool', None)
+    config.register_users()
+    old_client = get_client('s3', 'us-east-1', profile='user1')
+
+    config.register_users({'user1': {'AWS_ACCESS_KEY_ID': 'AKIANEW1', 'AWS_SECRET_ACCESS_KEY': 'n1'}})
+    config.tenant_pool.close()
+
+    assert get_client('s3', 'us-east-1', profile='user1') is not old_client
+    assert config.registry.session('user1').get_credentials().access_key == 'AKIANEW1'
+    with pytest.raises(ProfileNotFound):
+        config.registry.session('user2')
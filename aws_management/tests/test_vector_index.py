@@ -0,0 +1,107 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from aws_management.src.utils.vector_index import VectorIndex  # noqa: E402
+
+
+def _clustered(n, dim, clusters=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def _recall(found, expected):
+    return np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected, strict=True)])
+
+
+def test_exact_search_matches_brute_force():
+    """Exact search returns the same top-k as a full sort of cosine similarities."""
+    data = _clustered(2000, 32)
+    queries = _clustered(20, 32, seed=1)
+    index = VectorIndex(32, capacity=16)
+    index.add([f'v{i}' for i in range(len(data))], data)
+
+    ids, scores = index.search(queries, k=5)
+
+    normed = data / np.linalg.norm(data, axis=1, keepdims=True)
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    expected = np.argsort(-(q @ normed.T), axis=1)[:, :5]
+    assert ids == [[f'v{i}' for i in row] for row in expected]
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+
+def test_ivf_and_quantization_keep_recall():
+    """IVF with a few probes, and int8 scoring with re-ranking, find nearly all exact neighbours."""
+    data = _clustered(5000, 64)
+    queries = _clustered(50, 64, seed=2)
+    index = VectorIndex(64)
+    index.add([str(i) for i in range(len(data))], data)
+    exact, _ = index.search(queries, k=10)
+
+    index.quantize()
+    quantized, _ = index.search(queries, k=10)
+    index.build_ivf(nlist=32, nprobe=8)
+    approximate, _ = index.search(queries, k=10)
+
+    assert _recall(quantized, exact) >= 0.95
+    assert _recall(approximate, exact) >= 0.9
+
+
+def test_pinecone_style_api_and_persistence(tmp_path):
+    """upsert/query/delete follow Pinecone's shapes, and a saved index reloads memory-mapped."""
+    index = VectorIndex(3, metric='dotproduct')
+    index.upsert([('a', [1, 0, 0], {'doc': 1}), {'id': 'b', 'values': [0, 2, 0]}, ('c', [0, 0, 3])])
+    index.upsert([('a', [4, 0, 0], {'doc': 2})])
+    index.delete(ids=['c'])
+
+    result = index.query([1, 1, 1], top_k=5, include_metadata=True)
+
+    assert result['matches'] == [
+        {'id': 'a', 'score': 4.0, 'metadata': {'doc': 2}},
+        {'id': 'b', 'score': 2.0, 'metadata': {}},
+    ]
+    assert index.describe_index_stats()['total_vector_count'] == 2
+
+    index.save(str(tmp_path))
+    loaded = VectorIndex.load(str(tmp_path))
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.query([0, 1, 0], top_k=1)['matches'][0]['id'] == 'b'
+    loaded.upsert([('d', [0, 9, 0])])
+    assert loaded.query([0, 1, 0], top_k=1)['matches'][0]['id'] == 'd'
+
+
+def test_namespaces_are_separate_indexes(tmp_path):
+    """Upserts, queries and deletes only touch their namespace, and namespaces survive save/load."""
+    index = VectorIndex(2, metric='dotproduct')
+    index.upsert([('a', [1, 0])])
+    index.upsert([('a', [0, 5]), ('b', [2, 0])], namespace='other')
+    index.delete(delete_all=True)
+
+    assert index.query([1, 0], top_k=5)['matches'] == []
+    assert [m['id'] for m in index.query([1, 0], top_k=5, namespace='other')['matches']] == ['b', 'a']
+    assert index.query([1, 0], namespace='missing') == {'matches': [], 'namespace': 'missing'}
+    assert index.describe_index_stats() == {
+        'dimension': 2, 'total_vector_count': 2,
+        'namespaces': {'': {'vector_count': 0}, 'other': {'vector_count': 2}},
+    }
+
+    index.save(str(tmp_path))
+    loaded = VectorIndex.load(str(tmp_path))
+    assert loaded.query([0, 1], top_k=1, namespace='other')['matches'][0]['id'] == 'a'
+    assert len(loaded) == 0
+
+
+def test_add_quantizes_only_new_rows():
+    """Vectors added after quantize() get the same codes a full re-quantization would produce."""
+    data = _clustered(300, 16)
+    index = VectorIndex(16, capacity=8)
+    index.add([str(i) for i in range(100)], data[:100])
+    index.quantize()
+    index.add([str(i) for i in range(50, 300)], data[50:])
+    codes, scales = index._codes[:len(index)].copy(), index._scales[:len(index)].copy()
+
+    index.quantize()
+
+    assert np.array_equal(codes, index._codes[:len(index)])
+    assert np.array_equal(scales, index._scales[:len(index)])